@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the fused column profiler behind dataset analysis
+Times detect_column_type against the previous one-pass-per-statistic version
+on a synthetic frame (5M rows x 100 columns by default) and checks that both
+return the same column_analysis entries.
+
+Columns are generated and profiled one at a time with a fixed seed, so the
+whole frame never has to fit in memory at once.
+
+Usage: python analysis_benchmark.py [rows] [columns]
+"""
+
+import os
+import sys
+import math
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from routes.analysis import detect_column_type
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+COLUMNS = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+def detect_column_type_per_statistic(series: pd.Series) -> dict:
+    """detect_column_type as it was before the fused profiler, for comparison"""
+    non_null = series.dropna()
+    total = len(series)
+    missing = series.isna().sum()
+    missing_pct = (missing / total) * 100 if total > 0 else 0
+
+    result = {
+        "name": series.name,
+        "dtype": str(series.dtype),
+        "missing_count": int(missing),
+        "missing_pct": round(missing_pct, 2),
+        "unique_count": int(non_null.nunique()),
+        "unique_pct": round((non_null.nunique() / len(non_null)) * 100, 2) if len(non_null) > 0 else 0,
+    }
+
+    if pd.api.types.is_numeric_dtype(series):
+        result["semantic_type"] = "numeric"
+        result["min"] = float(non_null.min()) if len(non_null) > 0 else None
+        result["max"] = float(non_null.max()) if len(non_null) > 0 else None
+        result["mean"] = float(non_null.mean()) if len(non_null) > 0 else None
+        result["std"] = float(non_null.std()) if len(non_null) > 0 else None
+        result["median"] = float(non_null.median()) if len(non_null) > 0 else None
+        if len(non_null) > 4:
+            q1 = non_null.quantile(0.25)
+            q3 = non_null.quantile(0.75)
+            iqr = q3 - q1
+            outliers = ((non_null < (q1 - 1.5 * iqr)) | (non_null > (q3 + 1.5 * iqr))).sum()
+            result["outlier_count"] = int(outliers)
+            result["outlier_pct"] = round((outliers / len(non_null)) * 100, 2)
+        else:
+            result["outlier_count"] = 0
+            result["outlier_pct"] = 0
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        result["semantic_type"] = "datetime"
+        result["min"] = str(non_null.min()) if len(non_null) > 0 else None
+        result["max"] = str(non_null.max()) if len(non_null) > 0 else None
+    else:
+        unique_ratio = non_null.nunique() / len(non_null) if len(non_null) > 0 else 0
+        if unique_ratio < 0.05 or non_null.nunique() <= 20:
+            result["semantic_type"] = "categorical"
+            value_counts = non_null.value_counts().head(10).to_dict()
+            result["top_values"] = {str(k): int(v) for k, v in value_counts.items()}
+        else:
+            result["semantic_type"] = "text"
+            if non_null.dtype == object:
+                lengths = non_null.astype(str).str.len()
+                result["avg_length"] = float(lengths.mean())
+                result["max_length"] = int(lengths.max())
+
+    return result
+
+def make_column(index: int, rows: int) -> pd.Series:
+    """Column `index` of the synthetic frame: mostly floats and ints, some categories and free text"""
+    rng = np.random.default_rng(index)
+    kind = index % 20
+    if kind < 12:
+        values = rng.lognormal(mean=3, sigma=1, size=rows)
+        values[rng.random(rows) < 0.05] = np.nan
+    elif kind < 16:
+        values = rng.integers(0, 100_000, size=rows)
+    elif kind < 19:
+        labels = np.array([f"category_{i}" for i in range(12)], dtype=object)
+        values = labels[rng.integers(0, len(labels), size=rows)]
+        values[rng.random(rows) < 0.02] = np.nan
+    else:
+        values = pd.Series(rng.integers(0, 10 ** 9, size=rows)).map("user-{}@example.com".format).to_numpy(dtype=object)
+    return pd.Series(values, name=f"col_{index}")
+
+def same_result(a: dict, b: dict) -> bool:
+    if a.keys() != b.keys():
+        return False
+    for key in a:
+        x, y = a[key], b[key]
+        if isinstance(x, float) and isinstance(y, float) and math.isnan(x) and math.isnan(y):
+            continue
+        if x != y:
+            return False
+    return True
+
+def main():
+    print(f"Profiling a {ROWS:,} x {COLUMNS} frame")
+    per_statistic_time = 0.0
+    fused_time = 0.0
+    mismatches = []
+
+    for index in range(COLUMNS):
+        series = make_column(index, ROWS)
+
+        start = time.perf_counter()
+        expected = detect_column_type_per_statistic(series)
+        per_statistic_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = detect_column_type(series)
+        fused_time += time.perf_counter() - start
+
+        if not same_result(expected, actual):
+            mismatches.append(series.name)
+
+    print(f"One pass per statistic: {per_statistic_time:8.2f}s")
+    print(f"Fused profiler:         {fused_time:8.2f}s")
+    print(f"Speedup:                {per_statistic_time / fused_time:8.2f}x")
+
+    if mismatches:
+        print(f"❌ Results differ for {len(mismatches)} columns: {', '.join(mismatches)}")
+        return False
+    print("✅ column_analysis is identical")
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
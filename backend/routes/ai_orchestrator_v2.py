@@ -18,6 +18,9 @@ load_dotenv()
 # Use emergentintegrations for LLM
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 
+from services.columnar import load_dataframe
+from services.lineage import is_lazy, load_frame
+
 router = APIRouter()
 db = None
 
@@ -76,10 +79,15 @@ async def run_automated_workflow(project_id: str, user_prompt: str):
         
         # Get dataset path - check multiple possible field names
         dataset_path = dataset.get("path") or dataset.get("file_path") or dataset.get("filepath")
-        if not dataset_path or not os.path.exists(dataset_path):
+        if is_lazy(dataset):
+            # Derived datasets have no file; replay their preprocessing steps
+            df = await load_frame(db, dataset)
+        elif not dataset_path or not os.path.exists(dataset_path):
             raise Exception(f"Dataset file not found at path: {dataset_path}")
-        
-        df = pd.read_csv(dataset_path)
+        elif dataset.get("file_path") and dataset.get("type"):
+            df = load_dataframe(dataset)
+        else:
+            df = pd.read_csv(dataset_path)
         workflow_log.append({"step": "initialization", "status": "complete", "details": f"Loaded {len(df)} rows"})
         
         # Update progress
@@ -1,6 +1,7 @@
 import os
 import uuid
 import json
+import asyncio
 import pandas as pd
 import numpy as np
 from datetime import datetime, timezone
@@ -8,6 +9,14 @@ from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel
 
+from services.column_pool import column_pool
+from services.columnar import ColumnarTable
+from services.fingerprints import count_duplicates, count_repeats
+from services.lineage import resolve_table
+from services.profiler import distinct_counts, merge_sketches, sketch_series, sorted_numeric_summary
+from services.sketches import DistinctSketch, Moments, QuantileSketch, TopKSketch
+from services.sampling import proportion_interval, sample_rows
+
 router = APIRouter()
 
 # Will be set from server.py
@@ -15,10 +24,26 @@ db = None
 
 UPLOAD_DIR = "/app/backend/uploads"
 
+# Datasets with at least this many rows get a sample-based result before the full pass
+PROGRESSIVE_ANALYSIS_MIN_ROWS = int(os.environ.get("PROGRESSIVE_ANALYSIS_MIN_ROWS", 1_000_000))
+
+# Rows in the first-stage sample
+ANALYSIS_SAMPLE_ROWS = int(os.environ.get("ANALYSIS_SAMPLE_ROWS", 100_000))
+
+# Confidence level of the intervals reported with sample-based results
+CONFIDENCE_LEVEL = 0.95
+
 # ==================== MODELS ====================
 
 class AnalysisRequest(BaseModel):
     project_id: str
+    # None: progressive for datasets of PROGRESSIVE_ANALYSIS_MIN_ROWS rows and up
+    progressive: Optional[bool] = None
+    seed: int = 42
+
+class AppendRequest(BaseModel):
+    # Dataset holding only the new rows, with the analyzed dataset's columns
+    dataset_id: str
 
 class AnalysisResult(BaseModel):
     task_type: str
@@ -34,10 +59,30 @@ class AnalysisResult(BaseModel):
 # ==================== HELPER FUNCTIONS ====================
 
 def detect_column_type(series: pd.Series) -> Dict[str, Any]:
-    """Analyze a single column and return its characteristics"""
-    non_null = series.dropna()
+    """Analyze a single column and return its characteristics.
+
+    Numeric columns are profiled from one sort and text columns from one
+    hash pass, rather than one pass per statistic.
+    """
     total = len(series)
-    missing = series.isna().sum()
+    is_numeric = pd.api.types.is_numeric_dtype(series)
+    is_datetime = pd.api.types.is_datetime64_any_dtype(series)
+    
+    if is_numeric:
+        values = series.to_numpy()
+        if values.dtype.kind == "f":
+            values = values[~np.isnan(values)]
+        missing = total - len(values)
+        summary = sorted_numeric_summary(values) if len(values) else None
+        unique_count = summary["unique_count"] if summary else 0
+    elif is_datetime:
+        non_null = series.dropna()
+        missing = total - len(non_null)
+        unique_count = non_null.nunique()
+    else:
+        uniques, counts, missing = distinct_counts(series.to_numpy())
+        unique_count = len(uniques)
+    non_null_count = total - missing
     missing_pct = (missing / total) * 100 if total > 0 else 0
     
     result = {
@@ -45,57 +90,114 @@ def detect_column_type(series: pd.Series) -> Dict[str, Any]:
         "dtype": str(series.dtype),
         "missing_count": int(missing),
         "missing_pct": round(missing_pct, 2),
-        "unique_count": int(non_null.nunique()),
-        "unique_pct": round((non_null.nunique() / len(non_null)) * 100, 2) if len(non_null) > 0 else 0,
+        "unique_count": int(unique_count),
+        "unique_pct": round((unique_count / non_null_count) * 100, 2) if non_null_count > 0 else 0,
     }
     
     # Determine semantic type
-    if pd.api.types.is_numeric_dtype(series):
+    if is_numeric:
         result["semantic_type"] = "numeric"
-        result["min"] = float(non_null.min()) if len(non_null) > 0 else None
-        result["max"] = float(non_null.max()) if len(non_null) > 0 else None
-        result["mean"] = float(non_null.mean()) if len(non_null) > 0 else None
-        result["std"] = float(non_null.std()) if len(non_null) > 0 else None
-        result["median"] = float(non_null.median()) if len(non_null) > 0 else None
+        for stat in ("min", "max", "mean", "std", "median"):
+            result[stat] = summary[stat] if summary else None
         
         # Check for outliers using IQR
-        if len(non_null) > 4:
-            q1 = non_null.quantile(0.25)
-            q3 = non_null.quantile(0.75)
-            iqr = q3 - q1
-            outliers = ((non_null < (q1 - 1.5 * iqr)) | (non_null > (q3 + 1.5 * iqr))).sum()
-            result["outlier_count"] = int(outliers)
-            result["outlier_pct"] = round((outliers / len(non_null)) * 100, 2)
+        if non_null_count > 4:
+            result["outlier_count"] = summary["outlier_count"]
+            result["outlier_pct"] = round((summary["outlier_count"] / non_null_count) * 100, 2)
         else:
             result["outlier_count"] = 0
             result["outlier_pct"] = 0
             
-    elif pd.api.types.is_datetime64_any_dtype(series):
+    elif is_datetime:
         result["semantic_type"] = "datetime"
         result["min"] = str(non_null.min()) if len(non_null) > 0 else None
         result["max"] = str(non_null.max()) if len(non_null) > 0 else None
         
     else:
         # Categorical or text
-        unique_ratio = non_null.nunique() / len(non_null) if len(non_null) > 0 else 0
+        unique_ratio = unique_count / non_null_count if non_null_count > 0 else 0
         
-        if unique_ratio < 0.05 or non_null.nunique() <= 20:
+        if unique_ratio < 0.05 or unique_count <= 20:
             result["semantic_type"] = "categorical"
-            # Get value counts
-            value_counts = non_null.value_counts().head(10).to_dict()
+            # Top values, ordered as Series.value_counts orders them
+            value_counts = pd.Series(counts, index=uniques).sort_values(ascending=False).head(10).to_dict()
             result["top_values"] = {str(k): int(v) for k, v in value_counts.items()}
         else:
             result["semantic_type"] = "text"
-            # Calculate average text length
-            if non_null.dtype == object:
-                lengths = non_null.astype(str).str.len()
-                result["avg_length"] = float(lengths.mean())
+            # Calculate average text length from the distinct values, weighted by count
+            if series.dtype == object:
+                lengths = pd.Series(uniques, dtype=object).astype(str).str.len().to_numpy()
+                result["avg_length"] = float((lengths * counts).sum() / non_null_count)
                 result["max_length"] = int(lengths.max())
     
     return result
 
-def detect_task_type(df: pd.DataFrame, description: str = "") -> Dict[str, Any]:
-    """Auto-detect the ML task type based on data characteristics and description"""
+def column_from_sketch(name: str, sketch: Dict) -> Dict[str, Any]:
+    """detect_column_type's entry for a column, derived from its merged sketch.
+
+    Counts, min/max, mean and std are exact; distinct counts come from the
+    HyperLogLog estimate (exact while small), the median and IQR outliers
+    from the quantile sketch, and top values from the top-k summary.
+    """
+    total = sketch["count"]
+    missing = sketch["missing"]
+    non_null_count = total - missing
+    unique_count = DistinctSketch.from_dict(sketch["distinct"]).estimate()
+    
+    result = {
+        "name": name,
+        "dtype": sketch["dtype"],
+        "missing_count": missing,
+        "missing_pct": round((missing / total) * 100, 2) if total > 0 else 0,
+        "unique_count": unique_count,
+        "unique_pct": round((unique_count / non_null_count) * 100, 2) if non_null_count > 0 else 0,
+    }
+    
+    if sketch["kind"] == "numeric":
+        result["semantic_type"] = "numeric"
+        moments = Moments.from_dict(sketch["moments"])
+        quantiles = QuantileSketch.from_dict(sketch["quantiles"])
+        result["min"] = moments.low
+        result["max"] = moments.high
+        result["mean"] = moments.mean if non_null_count else None
+        result["std"] = moments.std() if non_null_count else None
+        result["median"] = quantiles.interpolated_quantile(0.5) if non_null_count else None
+        
+        if non_null_count > 4:
+            q1, q3 = quantiles.interpolated_quantile(0.25), quantiles.interpolated_quantile(0.75)
+            iqr = q3 - q1
+            outliers = quantiles.rank(q1 - 1.5 * iqr) + non_null_count - quantiles.rank(q3 + 1.5 * iqr, inclusive=True)
+            result["outlier_count"] = outliers
+            result["outlier_pct"] = round((outliers / non_null_count) * 100, 2)
+        else:
+            result["outlier_count"] = 0
+            result["outlier_pct"] = 0
+            
+    elif sketch["kind"] == "datetime":
+        result["semantic_type"] = "datetime"
+        result["min"] = str(pd.Timestamp(sketch["min"])) if sketch["min"] is not None else None
+        result["max"] = str(pd.Timestamp(sketch["max"])) if sketch["max"] is not None else None
+        
+    else:
+        unique_ratio = unique_count / non_null_count if non_null_count > 0 else 0
+        
+        if unique_ratio < 0.05 or unique_count <= 20:
+            result["semantic_type"] = "categorical"
+            result["top_values"] = dict(TopKSketch.from_dict(sketch["top"]).top(10))
+        else:
+            result["semantic_type"] = "text"
+            if "length_sum" in sketch and non_null_count > 0:
+                result["avg_length"] = sketch["length_sum"] / non_null_count
+                result["max_length"] = sketch["length_max"]
+    
+    return result
+
+def detect_task_type(column_analysis: List[Dict], row_count: int, description: str = "") -> Dict[str, Any]:
+    """Auto-detect the ML task type based on data characteristics and description.
+
+    Works from the column profiles alone, so it applies equally to results
+    derived from merged sketches.
+    """
     
     description_lower = description.lower()
     
@@ -121,11 +223,12 @@ def detect_task_type(df: pd.DataFrame, description: str = "") -> Dict[str, Any]:
     # Analyze potential target columns (last column or columns with specific patterns)
     target_candidates = []
     
-    for col in df.columns:
+    for info in column_analysis:
+        col = info["name"]
         col_lower = col.lower()
-        series = df[col]
-        unique_count = series.nunique()
-        unique_ratio = unique_count / len(series) if len(series) > 0 else 0
+        unique_count = info["unique_count"]
+        unique_ratio = unique_count / row_count if row_count > 0 else 0
+        is_numeric = info["semantic_type"] == "numeric"
         
         candidate = {
             "column": col,
@@ -145,13 +248,13 @@ def detect_task_type(df: pd.DataFrame, description: str = "") -> Dict[str, Any]:
             scores["classification"] += 1
             
         # Low cardinality categorical suggests classification
-        elif unique_count <= 10 and not pd.api.types.is_numeric_dtype(series):
+        elif unique_count <= 10 and not is_numeric:
             candidate["score"] += 1
             candidate["suggested_task"] = "classification"
             scores["classification"] += 0.5
             
         # Continuous numeric with high cardinality suggests regression
-        elif pd.api.types.is_numeric_dtype(series) and unique_ratio > 0.5:
+        elif is_numeric and unique_ratio > 0.5:
             candidate["score"] += 1
             candidate["suggested_task"] = "regression"
             scores["regression"] += 0.5
@@ -182,7 +285,7 @@ def detect_task_type(df: pd.DataFrame, description: str = "") -> Dict[str, Any]:
         "target_candidates": target_candidates[:5]  # Top 5 candidates
     }
 
-def calculate_quality_score(df: pd.DataFrame, column_analysis: List[Dict]) -> float:
+def calculate_quality_score(column_analysis: List[Dict], row_count: int, duplicate_count: int) -> float:
     """Calculate overall data quality score (0-100)"""
     scores = []
     
@@ -202,7 +305,7 @@ def calculate_quality_score(df: pd.DataFrame, column_analysis: List[Dict]) -> fl
     scores.append(validity * 0.25)  # 25% weight
     
     # Uniqueness score (check for potential duplicates)
-    duplicate_ratio = df.duplicated().sum() / len(df) if len(df) > 0 else 0
+    duplicate_ratio = duplicate_count / row_count if row_count > 0 else 0
     uniqueness = max(0, 100 - duplicate_ratio * 100)
     scores.append(uniqueness * 0.2)  # 20% weight
     
@@ -215,7 +318,6 @@ def calculate_quality_score(df: pd.DataFrame, column_analysis: List[Dict]) -> fl
     scores.append(consistency * 0.15)  # 15% weight
     
     # Size adequacy (based on row count for ML)
-    row_count = len(df)
     if row_count >= 10000:
         size_score = 100
     elif row_count >= 1000:
@@ -228,7 +330,7 @@ def calculate_quality_score(df: pd.DataFrame, column_analysis: List[Dict]) -> fl
     
     return round(sum(scores), 1)
 
-def generate_issues(df: pd.DataFrame, column_analysis: List[Dict]) -> List[Dict]:
+def generate_issues(column_analysis: List[Dict], row_count: int, duplicate_count: int) -> List[Dict]:
     """Generate list of data issues"""
     issues = []
     
@@ -285,27 +387,27 @@ def generate_issues(df: pd.DataFrame, column_analysis: List[Dict]) -> List[Dict]
             })
     
     # Check dataset size
-    if len(df) < 100:
+    if row_count < 100:
         issues.append({
             "type": "small_dataset",
             "severity": "high",
             "column": None,
-            "message": f"Dataset has only {len(df)} rows",
+            "message": f"Dataset has only {row_count} rows",
             "suggestion": "Consider collecting more data or using data augmentation"
         })
-    elif len(df) < 1000:
+    elif row_count < 1000:
         issues.append({
             "type": "moderate_dataset",
             "severity": "medium",
             "column": None,
-            "message": f"Dataset has {len(df)} rows which may be insufficient for complex models",
+            "message": f"Dataset has {row_count} rows which may be insufficient for complex models",
             "suggestion": "Simple models like Logistic Regression or Decision Trees recommended"
         })
     
     # Check for duplicates
-    dup_count = df.duplicated().sum()
+    dup_count = duplicate_count
     if dup_count > 0:
-        dup_pct = round((dup_count / len(df)) * 100, 1)
+        dup_pct = round((dup_count / row_count) * 100, 1)
         issues.append({
             "type": "duplicates",
             "severity": "medium" if dup_pct > 5 else "low",
@@ -316,7 +418,7 @@ def generate_issues(df: pd.DataFrame, column_analysis: List[Dict]) -> List[Dict]
     
     return issues
 
-def generate_suggestions(df: pd.DataFrame, column_analysis: List[Dict], task_type: str, issues: List[Dict]) -> List[Dict]:
+def generate_suggestions(column_analysis: List[Dict], row_count: int, task_type: str, issues: List[Dict]) -> List[Dict]:
     """Generate actionable suggestions for data improvement"""
     suggestions = []
     
@@ -383,12 +485,12 @@ def generate_suggestions(df: pd.DataFrame, column_analysis: List[Dict], task_typ
         })
     
     # Data quantity suggestions
-    if len(df) < 1000:
+    if row_count < 1000:
         suggestions.append({
             "type": "data_collection",
             "priority": "recommended",
             "title": "Collect more data",
-            "description": f"Current dataset has {len(df)} rows. More data would improve model reliability",
+            "description": f"Current dataset has {row_count} rows. More data would improve model reliability",
             "columns": []
         })
     
@@ -420,86 +522,316 @@ async def analyze_dataset(request: AnalysisRequest, background_tasks: Background
     )
     
     # Run analysis in background
-    background_tasks.add_task(run_analysis, request.project_id, dataset, project.get("description", ""))
+    background_tasks.add_task(
+        run_analysis, request.project_id, dataset, project.get("description", ""), request.progressive, request.seed
+    )
     
     return {"message": "Analysis started", "project_id": request.project_id}
 
-async def run_analysis(project_id: str, dataset: Dict, description: str):
-    """Background task to run the actual analysis"""
+def analyze_column(table: ColumnarTable, name: str, rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """detect_column_type for one column of a table (or of the rows at indices); runs in the column pool"""
+    return detect_column_type(table.typed(name, rows))
+
+def sketch_column(table: ColumnarTable, name: str, rows: Optional[np.ndarray] = None) -> tuple:
+    """(detect_column_type entry, mergeable sketch) for one column from a single read; runs in the column pool"""
+    series = table.typed(name, rows)
+    return detect_column_type(series), sketch_series(series)
+
+def summarize_analysis(column_analysis: List[Dict], row_count: int, duplicate_count: int, description: str) -> Dict[str, Any]:
+    """Derive the task, quality score, issues and suggestions from column profiles and the dataset's row and duplicate counts"""
+    # Detect task type
+    task_detection = detect_task_type(column_analysis, row_count, description)
+    
+    # Calculate quality score
+    quality_score = calculate_quality_score(column_analysis, row_count, duplicate_count)
+    
+    # Generate issues
+    issues = generate_issues(column_analysis, row_count, duplicate_count)
+    
+    # Generate suggestions
+    suggestions = generate_suggestions(column_analysis, row_count, task_detection["task_type"], issues)
+    
+    # Build analysis result
+    return {
+        "analyzed_at": datetime.now(timezone.utc).isoformat(),
+        "task_type": task_detection["task_type"],
+        "task_confidence": task_detection["confidence"],
+        "data_quality_score": quality_score,
+        "total_rows": row_count,
+        "total_columns": len(column_analysis),
+        "column_analysis": column_analysis,
+        "target_candidates": task_detection["target_candidates"],
+        "issues": issues,
+        "suggestions": suggestions,
+        "issue_summary": {
+            "high": len([i for i in issues if i["severity"] == "high"]),
+            "medium": len([i for i in issues if i["severity"] == "medium"]),
+            "low": len([i for i in issues if i["severity"] == "low"])
+        }
+    }
+
+def sample_estimates(col_info: Dict, sample_size: int, total_rows: int) -> Dict:
+    """Scale a column's sample counts to the whole dataset and attach confidence intervals.
+
+    Percentages stay as observed in the sample; counts become estimates for
+    all total_rows rows. Distinct counts are what the sample contains, so
+    they are lower bounds.
+    """
+    info = dict(col_info)
+    missing = col_info["missing_count"]
+    low, high = proportion_interval(missing, sample_size, total_rows, CONFIDENCE_LEVEL)
+    info["missing_count"] = round(missing * total_rows / sample_size)
+    intervals = {
+        "missing_pct": [round(low * 100, 2), round(high * 100, 2)],
+        "missing_count": [round(low * total_rows), round(high * total_rows)]
+    }
+    
+    non_null = sample_size - missing
+    if col_info.get("outlier_count") is not None and non_null > 0:
+        # Outliers are a share of the non-missing cells
+        population = max(total_rows - info["missing_count"], non_null)
+        low, high = proportion_interval(col_info["outlier_count"], non_null, population, CONFIDENCE_LEVEL)
+        info["outlier_count"] = round(col_info["outlier_count"] * population / non_null)
+        intervals["outlier_pct"] = [round(low * 100, 2), round(high * 100, 2)]
+        intervals["outlier_count"] = [round(low * population), round(high * population)]
+    
+    if "top_values" in col_info:
+        info["top_values"] = {k: round(v * total_rows / sample_size) for k, v in col_info["top_values"].items()}
+        intervals["top_values"] = {}
+        for k, v in col_info["top_values"].items():
+            low, high = proportion_interval(v, sample_size, total_rows, CONFIDENCE_LEVEL)
+            intervals["top_values"][k] = [round(low * total_rows), round(high * total_rows)]
+    
+    info["confidence_intervals"] = intervals
+    return info
+
+async def analyze_table(table: ColumnarTable, description: str, rows: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Full analysis result for a table (or the rows at indices).
+
+    Columns are profiled across the column pool and duplicates are counted
+    from the table's persisted row fingerprints.
+    """
+    column_analysis = await column_pool.map_columns(table, analyze_column, rows)
+    duplicate_count = await asyncio.to_thread(count_duplicates, table, rows)
+    row_count = table.row_count if rows is None else len(rows)
+    return summarize_analysis(column_analysis, row_count, duplicate_count, description)
+
+async def sketch_table(table: ColumnarTable, description: str) -> tuple:
+    """(analysis result, per-column sketches) for a whole table, each column read once.
+
+    The result also records the exact duplicate count, which later appends add to.
+    """
+    profiles = await column_pool.map_columns(table, sketch_column)
+    duplicate_count = await asyncio.to_thread(count_duplicates, table)
+    column_analysis = [info for info, sketch in profiles]
+    result = summarize_analysis(column_analysis, table.row_count, duplicate_count, description)
+    result["duplicate_count"] = duplicate_count
+    return result, [sketch for info, sketch in profiles]
+
+async def analyze_sample(table: ColumnarTable, description: str, sample_size: int, seed: int) -> Dict[str, Any]:
+    """First-stage result from a seeded uniform sample of rows, with counts scaled to the whole table"""
+    rows = sample_rows(table.row_count, sample_size, seed)
+    result = await analyze_table(table, description, rows)
+    result["column_analysis"] = [sample_estimates(c, len(rows), table.row_count) for c in result["column_analysis"]]
+    result["total_rows"] = table.row_count
+    result["sample"] = {
+        "method": "uniform",
+        "rows": len(rows),
+        "seed": seed,
+        "confidence_level": CONFIDENCE_LEVEL
+    }
+    return result
+
+async def store_sketches(project_id: str, analysis_id: str, column_analysis: List[Dict], sketches: List[Dict]) -> None:
+    """Save an analysis's column sketches, one document per column.
+
+    They live in their own collection rather than in analysis_results,
+    since a wide table's sketches would outgrow a project document.
+    """
+    await db.analysis_sketches.insert_many([
+        {"project_id": project_id, "analysis_id": analysis_id, "position": i, "column": info["name"], "sketch": sketch}
+        for i, (info, sketch) in enumerate(zip(column_analysis, sketches))
+    ])
+
+async def replace_results(project_filter: Dict, update: Dict) -> bool:
+    """Apply a project update that replaces its analysis_results, dropping the sketches of the results replaced.
+
+    Returns False, changing nothing, if no project matches project_filter.
+    """
+    previous = await db.projects.find_one_and_update(
+        project_filter, {"$set": update}, projection={"_id": 0, "analysis_results.analysis_id": 1}
+    )
+    if previous is None:
+        return False
+    old_id = (previous.get("analysis_results") or {}).get("analysis_id")
+    if old_id and old_id != update["analysis_results"].get("analysis_id"):
+        await db.analysis_sketches.delete_many({"project_id": project_filter["id"], "analysis_id": old_id})
+    return True
+
+async def run_analysis(project_id: str, dataset: Dict, description: str,
+                       progressive: Optional[bool] = None, seed: int = 42):
+    """Background task to run the actual analysis.
+
+    Large datasets (PROGRESSIVE_ANALYSIS_MIN_ROWS rows and up, unless
+    progressive says otherwise) are analyzed in two stages: a sample-based
+    result is saved first so the project is usable right away, then the
+    full pass replaces it. "analysis_stage" on the project, and "stage" in
+    the results, say which one is stored. The full pass also stores each
+    column's mergeable sketch, which appended data is merged into later.
+    """
+    analysis_id = str(uuid.uuid4())
+    stage = None
     try:
-        # Load the dataset
-        file_path = os.path.join(UPLOAD_DIR, dataset["stored_filename"])
-        
-        if dataset["category"] == "csv":
-            df = pd.read_csv(file_path)
-        elif dataset["category"] == "json":
-            df = pd.read_json(file_path)
-        else:
+        # Load the dataset from its column store
+        if dataset["category"] not in ("csv", "json", "tabular"):
             raise ValueError(f"Unsupported file type: {dataset['category']}")
         
-        # Analyze columns
-        column_analysis = []
-        for col in df.columns:
-            col_info = detect_column_type(df[col])
-            column_analysis.append(col_info)
-        
-        # Detect task type
-        task_detection = detect_task_type(df, description)
-        
-        # Calculate quality score
-        quality_score = calculate_quality_score(df, column_analysis)
-        
-        # Generate issues
-        issues = generate_issues(df, column_analysis)
-        
-        # Generate suggestions
-        suggestions = generate_suggestions(df, column_analysis, task_detection["task_type"], issues)
-        
-        # Build analysis result
-        analysis_result = {
-            "analyzed_at": datetime.now(timezone.utc).isoformat(),
-            "task_type": task_detection["task_type"],
-            "task_confidence": task_detection["confidence"],
-            "data_quality_score": quality_score,
-            "total_rows": len(df),
-            "total_columns": len(df.columns),
-            "column_analysis": column_analysis,
-            "target_candidates": task_detection["target_candidates"],
-            "issues": issues,
-            "suggestions": suggestions,
-            "issue_summary": {
-                "high": len([i for i in issues if i["severity"] == "high"]),
-                "medium": len([i for i in issues if i["severity"] == "medium"]),
-                "low": len([i for i in issues if i["severity"] == "low"])
-            }
-        }
+        table = await resolve_table(db, dataset)
+        if progressive is None:
+            progressive = table.row_count >= PROGRESSIVE_ANALYSIS_MIN_ROWS
         
-        # Update project with results
-        await db.projects.update_one(
-            {"id": project_id},
-            {
-                "$set": {
+        if progressive:
+            analysis_result = await analyze_sample(table, description, ANALYSIS_SAMPLE_ROWS, seed)
+            analysis_result.update({"analysis_id": analysis_id, "stage": "sample"})
+            await replace_results(
+                {"id": project_id},
+                {
                     "status": "analyzed",
-                    "task_type": task_detection["task_type"],
+                    "task_type": analysis_result["task_type"],
                     "analysis_results": analysis_result,
+                    "analysis_stage": "sample",
                     "updated_at": datetime.now(timezone.utc).isoformat()
                 }
-            }
-        )
+            )
+            stage = "sample"
+        
+        analysis_result, sketches = await sketch_table(table, description)
+        analysis_result.update({"analysis_id": analysis_id, "stage": "full", "dataset_id": dataset["id"]})
+        
+        # Update project with results; a refinement only replaces its own
+        # sample result and leaves the project status alone
+        update = {
+            "task_type": analysis_result["task_type"],
+            "analysis_results": analysis_result,
+            "analysis_stage": "full",
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+        await store_sketches(project_id, analysis_id, analysis_result["column_analysis"], sketches)
+        if stage:
+            stored = await replace_results({"id": project_id, "analysis_results.analysis_id": analysis_id}, update)
+        else:
+            stored = await replace_results({"id": project_id}, {"status": "analyzed", **update})
+        if not stored:
+            # Superseded by a newer analysis (or the project is gone)
+            await db.analysis_sketches.delete_many({"project_id": project_id, "analysis_id": analysis_id})
         
     except Exception as e:
+        if stage:
+            # Keep the sample result and record why it was not refined
+            await db.projects.update_one(
+                {"id": project_id, "analysis_results.analysis_id": analysis_id},
+                {"$set": {"analysis_results.refinement_error": str(e)}}
+            )
+            return
+        
         # Update project with error
-        await db.projects.update_one(
+        await replace_results(
             {"id": project_id},
             {
-                "$set": {
-                    "status": "analysis_failed",
-                    "analysis_results": {"error": str(e)},
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
+                "status": "analysis_failed",
+                "analysis_results": {"error": str(e)},
+                "updated_at": datetime.now(timezone.utc).isoformat()
             }
         )
 
+@router.post("/{project_id}/append")
+async def append_to_analysis(project_id: str, request: AppendRequest):
+    """Fold a dataset of newly appended rows into a project's analysis.
+
+    Only the new rows are read: their column sketches are merged into the
+    ones stored with the current analysis and the results are derived from
+    the merged state, so the history is never rescanned. Duplicates stay
+    exact by matching the new rows' fingerprints against every dataset
+    already in the analysis and confirming each match cell by cell. A new
+    full analysis starts over from the project's dataset.
+    """
+    
+    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    results = project.get("analysis_results") or {}
+    if results.get("stage") not in ("full", "incremental") or "dataset_id" not in results:
+        raise HTTPException(status_code=400, detail="Run a full analysis before appending data")
+    
+    history_ids = [results["dataset_id"]] + results.get("appended_datasets", [])
+    if request.dataset_id in history_ids:
+        raise HTTPException(status_code=400, detail="Dataset is already part of this analysis")
+    
+    dataset = await db.datasets.find_one({"id": request.dataset_id}, {"_id": 0})
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    table = await resolve_table(db, dataset)
+    names = [c["name"] for c in results["column_analysis"]]
+    if table.columns != names:
+        raise HTTPException(status_code=400, detail="Dataset columns don't match the analyzed dataset")
+    
+    stored = await db.analysis_sketches.find(
+        {"project_id": project_id, "analysis_id": results["analysis_id"]}, {"_id": 0}
+    ).sort("position", 1).to_list(None)
+    if len(stored) != len(names):
+        raise HTTPException(status_code=400, detail="No sketches stored for this analysis; run it again")
+    
+    history = []
+    for version_id in history_ids:
+        version = await db.datasets.find_one({"id": version_id}, {"_id": 0})
+        if not version:
+            raise HTTPException(status_code=400, detail=f"Dataset {version_id} of this analysis no longer exists")
+        history.append(await resolve_table(db, version))
+    
+    profiles = await column_pool.map_columns(table, sketch_column)
+    
+    def merge_all():
+        merged = []
+        for doc, (info, sketch) in zip(stored, profiles):
+            try:
+                merged.append(merge_sketches(doc["sketch"], sketch))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Column '{doc['column']}': {e}")
+        return merged, [column_from_sketch(name, sketch) for name, sketch in zip(names, merged)]
+    
+    sketches, column_analysis = await asyncio.to_thread(merge_all)
+    new_duplicates = await asyncio.to_thread(count_repeats, table, history)
+    
+    row_count = results["total_rows"] + table.row_count
+    duplicate_count = results["duplicate_count"] + new_duplicates
+    analysis_result = summarize_analysis(column_analysis, row_count, duplicate_count, project.get("description", ""))
+    analysis_id = str(uuid.uuid4())
+    analysis_result.update({
+        "analysis_id": analysis_id,
+        "stage": "incremental",
+        "dataset_id": results["dataset_id"],
+        "appended_datasets": history_ids[1:] + [request.dataset_id],
+        "duplicate_count": duplicate_count
+    })
+    
+    await store_sketches(project_id, analysis_id, column_analysis, sketches)
+    replaced = await replace_results(
+        {"id": project_id, "analysis_results.analysis_id": results["analysis_id"]},
+        {
+            "task_type": analysis_result["task_type"],
+            "analysis_results": analysis_result,
+            "analysis_stage": "incremental",
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+    )
+    if not replaced:
+        await db.analysis_sketches.delete_many({"project_id": project_id, "analysis_id": analysis_id})
+        raise HTTPException(status_code=409, detail="The analysis changed while appending; try again")
+    
+    return {"project_id": project_id, "stage": "incremental", "analysis": analysis_result}
+
 @router.get("/{project_id}/analysis")
 async def get_analysis_results(project_id: str):
     """Get analysis results for a project"""
@@ -515,6 +847,7 @@ async def get_analysis_results(project_id: str):
         "project_id": project_id,
         "status": project["status"],
         "task_type": project.get("task_type"),
+        "stage": project.get("analysis_stage"),
         "analysis": project["analysis_results"]
     }
 
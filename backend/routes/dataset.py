@@ -1,13 +1,37 @@
 import os
 import uuid
 import json
-import csv
+import shutil
+import asyncio
 from datetime import datetime, timezone
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request, BackgroundTasks
 from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import aiofiles
-from io import StringIO
+import numpy as np
+from pymongo.errors import BulkWriteError
+
+from services.columnar import COLUMNAR_EXTENSIONS, ColumnarTable, build_columnar
+from services.fingerprints import diff_tables, load_fingerprints
+from services.histogram import build_histogram_bases
+from services.lineage import is_lazy, replays_from, resolve_table, store_dir
+from services.pagination import paginate
+from services.profiler import profile_table
+from services.row_index import ROW_INDEX_SUFFIX, load_row_index, read_rows
+from services.search_index import SEARCH_INDEX_SUFFIX
+from services.table_cache import table_cache
+from services.storage import (
+    ChunkSizeMismatchError,
+    FileTooLargeError,
+    hash_file,
+    iter_upload_chunks,
+    preallocate_file,
+    release_blob,
+    store_blob,
+    stream_to_disk,
+    write_at_offset,
+)
 
 router = APIRouter()
 
@@ -23,6 +47,37 @@ IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
 ALLOWED_EXTENSIONS = DATA_EXTENSIONS | IMAGE_EXTENSIONS
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 
+# Uploads are stored once per distinct content hash; staging files live in TMP_DIR
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+os.makedirs(BLOB_DIR, exist_ok=True)
+os.makedirs(TMP_DIR, exist_ok=True)
+
+# Typed column stores built from tabular uploads, keyed by content hash
+COLUMNAR_DIR = os.path.join(UPLOAD_DIR, "columnar")
+os.makedirs(COLUMNAR_DIR, exist_ok=True)
+
+# Files /upload-multiple streams to disk at once; bounds memory to this many chunks
+UPLOAD_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", 4))
+
+# Bump when the stats payload changes so stored stats are recomputed on read
+STATS_VERSION = 3
+
+# Resumable uploads bypass MAX_FILE_SIZE and are assembled on disk chunk by chunk
+SESSION_DIR = os.path.join(UPLOAD_DIR, "sessions")
+os.makedirs(SESSION_DIR, exist_ok=True)
+RESUMABLE_MAX_FILE_SIZE = int(os.environ.get("RESUMABLE_MAX_FILE_SIZE", 50 * 1024 * 1024 * 1024))  # 50GB
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB
+MIN_CHUNK_SIZE = 256 * 1024  # 256KB
+MAX_CHUNK_SIZE = 64 * 1024 * 1024  # 64MB
+
+# ==================== MODELS ====================
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1)
+    total_size: int = Field(..., gt=0)
+    chunk_size: int = Field(DEFAULT_CHUNK_SIZE, ge=MIN_CHUNK_SIZE, le=MAX_CHUNK_SIZE)
+
 def get_file_extension(filename: str) -> str:
     return os.path.splitext(filename)[1].lower()
 
@@ -39,56 +94,10 @@ def get_file_category(ext: str) -> str:
         return "tabular"
     return "unknown"
 
-async def get_csv_stats(file_path: str) -> dict:
-    """Get statistics for CSV file"""
+async def get_csv_stats(dataset: dict) -> dict:
+    """Get statistics for a CSV or other tabular dataset"""
     try:
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        
-        reader = csv.DictReader(StringIO(content))
-        rows = list(reader)
-        
-        if not rows:
-            return {"row_count": 0, "columns": [], "column_stats": {}}
-        
-        columns = list(rows[0].keys())
-        row_count = len(rows)
-        
-        # Calculate column statistics
-        column_stats = {}
-        for col in columns:
-            values = [row.get(col, "") for row in rows]
-            non_null = [v for v in values if v and v.strip()]
-            null_count = len(values) - len(non_null)
-            
-            # Try to detect numeric columns
-            numeric_values = []
-            for v in non_null:
-                try:
-                    numeric_values.append(float(v))
-                except:
-                    pass
-            
-            stats = {
-                "null_count": null_count,
-                "non_null_count": len(non_null),
-                "unique_count": len(set(non_null)),
-                "type": "numeric" if len(numeric_values) == len(non_null) and numeric_values else "string"
-            }
-            
-            if stats["type"] == "numeric" and numeric_values:
-                stats["min"] = min(numeric_values)
-                stats["max"] = max(numeric_values)
-                stats["mean"] = sum(numeric_values) / len(numeric_values)
-            
-            column_stats[col] = stats
-        
-        return {
-            "row_count": row_count,
-            "column_count": len(columns),
-            "columns": columns,
-            "column_stats": column_stats
-        }
+        return profile_table(await resolve_table(db, dataset))
     except Exception as e:
         return {"error": str(e)}
 
@@ -117,10 +126,107 @@ async def get_json_stats(file_path: str) -> dict:
     except Exception as e:
         return {"error": str(e)}
 
+def build_dataset_doc(file_id: str, filename: str, ext: str, file_path: str, size: int, sha256: str) -> dict:
+    """Build the db.datasets document for a freshly uploaded file"""
+    return {
+        "id": file_id,
+        "filename": filename,
+        "stored_filename": os.path.relpath(file_path, UPLOAD_DIR),
+        "file_path": file_path,
+        "size": size,
+        "sha256": sha256,
+        "type": ext,
+        "category": get_file_category(ext),
+        "uploaded_at": datetime.now(timezone.utc).isoformat(),
+        "status": "uploaded"
+    }
+
+async def store_upload(file_id: str, filename: str, ext: str, tmp_path: str, size: int, sha256: str) -> dict:
+    """Move a staged upload into the blob store and build its dataset document.
+
+    A duplicate of already stored content only gets a new metadata record
+    pointing at the existing blob. The document is not inserted yet.
+    """
+    file_path, deduplicated = await store_blob(db, BLOB_DIR, tmp_path, sha256, size, ext)
+    
+    dataset_doc = build_dataset_doc(file_id, filename, ext, file_path, size, sha256)
+    dataset_doc["deduplicated"] = deduplicated
+    if ext in COLUMNAR_EXTENSIONS:
+        dataset_doc["columnar"] = {"status": "pending"}
+    dataset_doc["stats"] = {"version": STATS_VERSION, "status": "pending"}
+    return dataset_doc
+
+async def register_upload(file_id: str, filename: str, ext: str, tmp_path: str, size: int, sha256: str) -> dict:
+    """Store a staged upload and record it in db.datasets"""
+    dataset_doc = await store_upload(file_id, filename, ext, tmp_path, size, sha256)
+    
+    try:
+        await db.datasets.insert_one(dataset_doc)
+    except Exception:
+        await release_blob(db, sha256)
+        raise
+    
+    dataset_doc.pop("_id", None)
+    return dataset_doc
+
+def columnar_path(dataset: dict) -> str:
+    """Column store location; shared by every dataset with the same content"""
+    return os.path.join(COLUMNAR_DIR, dataset.get("sha256") or dataset["id"])
+
+async def ingest_columnar(dataset_id: str):
+    """Background task: parse a tabular upload once into its typed column store"""
+    dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
+    if not dataset:
+        return
+    
+    path = columnar_path(dataset)
+    try:
+        schema = await asyncio.to_thread(build_columnar, dataset["file_path"], dataset["type"], path)
+        columnar = {
+            "status": "ready",
+            "path": path,
+            "format": schema["format"],
+            "row_count": schema["row_count"],
+            "schema": [{"name": c["name"], "kind": c["kind"]} for c in schema["columns"]],
+            "built_at": datetime.now(timezone.utc).isoformat()
+        }
+    except Exception as e:
+        columnar = {"status": "failed", "error": str(e)}
+    
+    if columnar["status"] == "ready":
+        try:
+            await asyncio.to_thread(build_histogram_bases, ColumnarTable.open(path))
+        except Exception:
+            pass  # Built lazily on the first histogram request instead
+        try:
+            await asyncio.to_thread(load_fingerprints, ColumnarTable.open(path))
+        except Exception:
+            pass  # Built lazily on the first duplicate count or diff instead
+    
+    await db.datasets.update_one({"id": dataset_id}, {"$set": {"columnar": columnar}})
+
+async def post_upload(dataset_id: str):
+    """Background task: build the column store and CSV row index, then precompute stats"""
+    dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
+    if not dataset:
+        return
+    if dataset["type"] in COLUMNAR_EXTENSIONS:
+        await ingest_columnar(dataset_id)
+    if dataset["category"] == "csv":
+        try:
+            await asyncio.to_thread(load_row_index, dataset["file_path"])
+        except Exception:
+            pass  # Built lazily on the first preview instead
+    await refresh_dataset_stats(dataset_id)
+
+def schedule_post_upload(background_tasks: BackgroundTasks, dataset_doc: dict) -> None:
+    """Queue the post-upload processing for a newly registered dataset"""
+    background_tasks.add_task(post_upload, dataset_doc["id"])
+
 # ==================== UPLOAD ENDPOINTS ====================
 
 @router.post("/upload")
-async def upload_dataset(file: UploadFile = File(...)):
+async def upload_dataset(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     """Upload a single dataset file and store metadata in MongoDB"""
     
     ext = get_file_extension(file.filename)
@@ -131,94 +237,123 @@ async def upload_dataset(file: UploadFile = File(...)):
         )
     
     file_id = str(uuid.uuid4())
-    safe_filename = f"{file_id}{ext}"
-    file_path = os.path.join(UPLOAD_DIR, safe_filename)
+    tmp_path = os.path.join(TMP_DIR, f"{file_id}{ext}")
     
     try:
-        content = await file.read()
-        
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size is {MAX_FILE_SIZE // (1024*1024)}MB"
-            )
+        # Stream to disk in fixed-size chunks so memory stays constant per upload
+        written = await stream_to_disk(iter_upload_chunks(file), tmp_path, MAX_FILE_SIZE)
         
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(content)
-        
-        # Create dataset document
-        dataset_doc = {
-            "id": file_id,
-            "filename": file.filename,
-            "stored_filename": safe_filename,
-            "file_path": file_path,
-            "size": len(content),
-            "type": ext,
-            "category": get_file_category(ext),
-            "uploaded_at": datetime.now(timezone.utc).isoformat(),
-            "status": "uploaded"
-        }
-        
-        # Store in MongoDB
-        await db.datasets.insert_one(dataset_doc)
-        
-        # Remove MongoDB _id before returning
-        dataset_doc.pop("_id", None)
+        # Store the blob (or reuse an identical one) and create the dataset document
+        dataset_doc = await register_upload(file_id, file.filename, ext, tmp_path, written["size"], written["sha256"])
+        schedule_post_upload(background_tasks, dataset_doc)
         
         return dataset_doc
         
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
-        # Clean up file if MongoDB fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # Clean up staged file if storing it fails
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+
+@router.post("/upload/stream")
+async def upload_dataset_stream(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    filename: str = Query(..., description="Original filename, used for the extension and metadata")
+):
+    """Upload a single dataset sent as the raw request body.
+
+    Unlike multipart uploads, the body is consumed as it arrives, so an
+    oversized upload is rejected as soon as the limit is crossed.
+    """
+    
+    ext = get_file_extension(filename)
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type '{ext}' not allowed. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=str(FileTooLargeError(MAX_FILE_SIZE)))
+    
+    file_id = str(uuid.uuid4())
+    tmp_path = os.path.join(TMP_DIR, f"{file_id}{ext}")
+    
+    try:
+        written = await stream_to_disk(request.stream(), tmp_path, MAX_FILE_SIZE)
+        dataset_doc = await register_upload(file_id, filename, ext, tmp_path, written["size"], written["sha256"])
+        schedule_post_upload(background_tasks, dataset_doc)
+        
+        return dataset_doc
+        
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
 @router.post("/upload-multiple")
-async def upload_multiple_datasets(files: List[UploadFile] = File(...)):
-    """Upload multiple dataset files"""
-    results = []
-    errors = []
+async def upload_multiple_datasets(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    concurrency: int = Query(UPLOAD_CONCURRENCY, ge=1, le=32, description="Files processed in parallel")
+):
+    """Upload multiple dataset files.
+
+    Files are streamed to disk and hashed concurrently, at most `concurrency`
+    at a time, and all metadata is written with a single insert_many.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def stage(file: UploadFile) -> dict:
+        ext = get_file_extension(file.filename)
+        if ext not in ALLOWED_EXTENSIONS:
+            return {"filename": file.filename, "error": f"File type '{ext}' not allowed"}
+        
+        file_id = str(uuid.uuid4())
+        tmp_path = os.path.join(TMP_DIR, f"{file_id}{ext}")
+        try:
+            async with semaphore:
+                written = await stream_to_disk(iter_upload_chunks(file), tmp_path, MAX_FILE_SIZE)
+                return await store_upload(file_id, file.filename, ext, tmp_path, written["size"], written["sha256"])
+        except FileTooLargeError:
+            return {"filename": file.filename, "error": "File too large"}
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return {"filename": file.filename, "error": str(e)}
+    
+    staged = await asyncio.gather(*(stage(file) for file in files))
     
-    for file in files:
+    docs = [item for item in staged if "error" not in item]
+    insert_errors = {}
+    if docs:
         try:
-            ext = get_file_extension(file.filename)
-            if ext not in ALLOWED_EXTENSIONS:
-                errors.append({"filename": file.filename, "error": f"File type '{ext}' not allowed"})
-                continue
-            
-            file_id = str(uuid.uuid4())
-            safe_filename = f"{file_id}{ext}"
-            file_path = os.path.join(UPLOAD_DIR, safe_filename)
-            
-            content = await file.read()
-            
-            if len(content) > MAX_FILE_SIZE:
-                errors.append({"filename": file.filename, "error": "File too large"})
-                continue
-            
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(content)
-            
-            dataset_doc = {
-                "id": file_id,
-                "filename": file.filename,
-                "stored_filename": safe_filename,
-                "file_path": file_path,
-                "size": len(content),
-                "type": ext,
-                "category": get_file_category(ext),
-                "uploaded_at": datetime.now(timezone.utc).isoformat(),
-                "status": "uploaded"
-            }
-            
-            await db.datasets.insert_one(dataset_doc)
-            dataset_doc.pop("_id", None)
-            results.append(dataset_doc)
-            
+            await db.datasets.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            insert_errors = {docs[err["index"]]["id"]: err.get("errmsg", "Insert failed") for err in e.details.get("writeErrors", [])}
         except Exception as e:
-            errors.append({"filename": file.filename, "error": str(e)})
+            insert_errors = {doc["id"]: str(e) for doc in docs}
+    
+    results = []
+    errors = []
+    for item in staged:
+        if "error" in item:
+            errors.append(item)
+        elif item["id"] in insert_errors:
+            await release_blob(db, item["sha256"])
+            errors.append({"filename": item["filename"], "error": insert_errors[item["id"]]})
+        else:
+            item.pop("_id", None)
+            schedule_post_upload(background_tasks, item)
+            results.append(item)
     
     return {
         "uploaded": results,
@@ -227,30 +362,230 @@ async def upload_multiple_datasets(files: List[UploadFile] = File(...)):
         "total_errors": len(errors)
     }
 
+# ==================== RESUMABLE UPLOAD ENDPOINTS ====================
+
+def session_status(session: dict) -> dict:
+    """Public view of an upload session, including which chunks are still missing"""
+    received = sorted(session.get("received_chunks", []))
+    received_set = set(received)
+    return {
+        "session_id": session["id"],
+        "filename": session["filename"],
+        "total_size": session["total_size"],
+        "chunk_size": session["chunk_size"],
+        "total_chunks": session["total_chunks"],
+        "received_chunks": received,
+        "missing_chunks": [i for i in range(session["total_chunks"]) if i not in received_set],
+        "status": session["status"],
+        "dataset_id": session.get("dataset_id"),
+        "created_at": session["created_at"]
+    }
+
+async def get_open_session(session_id: str) -> dict:
+    """Fetch an upload session that can still accept chunks"""
+    session = await db.upload_sessions.find_one({"id": session_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if session["status"] != "open":
+        raise HTTPException(status_code=409, detail=f"Upload session is {session['status']}")
+    return session
+
+@router.post("/uploads")
+async def create_upload_session(request: UploadSessionCreate):
+    """Start a resumable upload; chunks are then PUT by index in any order"""
+    
+    ext = get_file_extension(request.filename)
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type '{ext}' not allowed. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    
+    if request.total_size > RESUMABLE_MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size is {RESUMABLE_MAX_FILE_SIZE // (1024*1024*1024)}GB"
+        )
+    
+    session_id = str(uuid.uuid4())
+    part_path = os.path.join(SESSION_DIR, f"{session_id}.part")
+    await preallocate_file(part_path, request.total_size)
+    
+    session = {
+        "id": session_id,
+        "filename": request.filename,
+        "type": ext,
+        "part_path": part_path,
+        "total_size": request.total_size,
+        "chunk_size": request.chunk_size,
+        "total_chunks": -(-request.total_size // request.chunk_size),
+        "received_chunks": [],
+        "status": "open",  # open, completed, aborted
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.upload_sessions.insert_one(session)
+    
+    return session_status(session)
+
+@router.get("/uploads/{session_id}")
+async def get_upload_session(session_id: str):
+    """Report which chunks of a resumable upload have been received"""
+    
+    session = await db.upload_sessions.find_one({"id": session_id}, {"_id": 0})
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    
+    return session_status(session)
+
+@router.put("/uploads/{session_id}/chunks/{index}")
+async def upload_chunk(
+    session_id: str,
+    index: int,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Byte offset of this chunk; must equal index * chunk_size")
+):
+    """Receive one chunk as the raw request body and write it in place.
+
+    Re-sending a chunk simply overwrites it, so clients can retry any chunk
+    whose response they did not see. An optional X-Chunk-SHA256 header is
+    verified against the bytes received.
+    """
+    
+    session = await get_open_session(session_id)
+    
+    if index < 0 or index >= session["total_chunks"]:
+        raise HTTPException(status_code=400, detail=f"Chunk index must be between 0 and {session['total_chunks'] - 1}")
+    
+    if offset != index * session["chunk_size"]:
+        raise HTTPException(status_code=400, detail=f"Offset for chunk {index} must be {index * session['chunk_size']}")
+    
+    expected_size = min(session["chunk_size"], session["total_size"] - offset)
+    
+    try:
+        written = await write_at_offset(request.stream(), session["part_path"], offset, expected_size)
+    except ChunkSizeMismatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    checksum = request.headers.get("x-chunk-sha256")
+    if checksum and checksum.lower() != written["sha256"]:
+        raise HTTPException(status_code=400, detail=f"Checksum mismatch for chunk {index}")
+    
+    await db.upload_sessions.update_one(
+        {"id": session_id},
+        {"$addToSet": {"received_chunks": index}}
+    )
+    
+    return {"session_id": session_id, "index": index, "size": written["size"], "sha256": written["sha256"]}
+
+@router.post("/uploads/{session_id}/complete")
+async def complete_upload_session(session_id: str, background_tasks: BackgroundTasks):
+    """Finalize a resumable upload and register it as a dataset.
+
+    The session is claimed by moving it from "open" to "completing" in one
+    update, so a retried or concurrent complete (or an abort) cannot work
+    on the same part file at the same time.
+    """
+    
+    session = await db.upload_sessions.find_one_and_update(
+        {"id": session_id, "status": "open"},
+        {"$set": {"status": "completing"}},
+        projection={"_id": 0}
+    )
+    if not session:
+        session = await db.upload_sessions.find_one({"id": session_id}, {"_id": 0})
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        # Completing twice returns the dataset created the first time
+        if session["status"] == "completed":
+            return await db.datasets.find_one({"id": session["dataset_id"]}, {"_id": 0})
+        raise HTTPException(status_code=409, detail=f"Upload session is {session['status']}")
+    
+    status = session_status(session)
+    if status["missing_chunks"]:
+        await db.upload_sessions.update_one({"id": session_id}, {"$set": {"status": "open"}})
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Upload incomplete", "missing_chunks": status["missing_chunks"]}
+        )
+    
+    file_id = str(uuid.uuid4())
+    
+    try:
+        sha256 = await hash_file(session["part_path"])
+        dataset_doc = await register_upload(
+            file_id, session["filename"], session["type"], session["part_path"], session["total_size"], sha256
+        )
+    except Exception as e:
+        await db.upload_sessions.update_one({"id": session_id}, {"$set": {"status": "open"}})
+        raise HTTPException(status_code=500, detail=f"Failed to finalize upload: {str(e)}")
+    
+    schedule_post_upload(background_tasks, dataset_doc)
+    
+    await db.upload_sessions.update_one(
+        {"id": session_id},
+        {"$set": {"status": "completed", "dataset_id": file_id, "completed_at": datetime.now(timezone.utc).isoformat()}}
+    )
+    
+    return dataset_doc
+
+@router.delete("/uploads/{session_id}")
+async def abort_upload_session(session_id: str):
+    """Abort a resumable upload and discard the chunks received so far.
+
+    Only open sessions can be aborted; one being completed is refused.
+    """
+    
+    session = await db.upload_sessions.find_one_and_update(
+        {"id": session_id, "status": "open"},
+        {"$set": {"status": "aborted"}},
+        projection={"_id": 0}
+    )
+    if not session:
+        session = await db.upload_sessions.find_one({"id": session_id}, {"_id": 0})
+        if not session:
+            raise HTTPException(status_code=404, detail="Upload session not found")
+        raise HTTPException(status_code=409, detail=f"Upload session is {session['status']}")
+    
+    if os.path.exists(session["part_path"]):
+        os.remove(session["part_path"])
+    
+    return {"message": "Upload session aborted", "session_id": session_id}
+
 # ==================== LIST ENDPOINTS ====================
 
 @router.get("/list")
 async def list_datasets(
     category: Optional[str] = Query(None, description="Filter by category: csv, json, image, text, tabular"),
     limit: int = Query(50, ge=1, le=100),
-    skip: int = Query(0, ge=0)
+    skip: int = Query(0, ge=0, description="Offset paging; prefer cursor for deep pages"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    exact_count: bool = Query(True, description="Count matches exactly instead of using the collection estimate")
 ):
-    """List all datasets with optional filtering"""
+    """List all datasets with optional filtering, newest first"""
     
     query = {}
     if category:
         query["category"] = category
     
-    datasets = await db.datasets.find(query, {"_id": 0}).sort("uploaded_at", -1).skip(skip).limit(limit).to_list(limit)
-    total = await db.datasets.count_documents(query)
+    try:
+        page = await paginate(db.datasets, query, "uploaded_at", limit, skip, cursor, exact_count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
-        "datasets": datasets,
-        "total": total,
+        "datasets": page["items"],
+        "total": page["total"],
+        "total_is_estimate": page["total_is_estimate"],
         "limit": limit,
-        "skip": skip
+        "skip": skip,
+        "next_cursor": page["next_cursor"]
     }
 
+@router.get("/cache/stats")
+async def get_table_cache_stats():
+    """Hit, miss and eviction counters of the shared table cache"""
+    return table_cache.stats()
+
 @router.get("/{dataset_id}")
 async def get_dataset(dataset_id: str):
     """Get a single dataset by ID"""
@@ -266,41 +601,43 @@ async def get_dataset(dataset_id: str):
 @router.get("/{dataset_id}/preview/csv")
 async def preview_csv(
     dataset_id: str,
-    rows: int = Query(100, ge=1, le=1000, description="Number of rows to preview")
+    rows: int = Query(100, ge=1, le=1000, description="Number of rows to preview"),
+    offset: int = Query(0, ge=0, description="Index of the first data row to return")
 ):
-    """Preview first N rows of a CSV file"""
+    """Preview a page of rows from a CSV (or other tabular) file.
+
+    CSV pages are read straight from the raw file by seeking through its
+    row-offset index, so any page costs the same regardless of file size.
+    Derived datasets without a file are previewed from their replayed table.
+    """
     
     dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    if dataset["category"] != "csv":
+    if dataset["category"] not in ("csv", "tabular"):
         raise HTTPException(status_code=400, detail="This endpoint is for CSV files only")
     
     file_path = dataset["file_path"]
-    if not os.path.exists(file_path):
+    if not is_lazy(dataset) and not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found on disk")
     
     try:
-        async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-            content = await f.read()
-        
-        reader = csv.DictReader(StringIO(content))
-        data = []
-        for i, row in enumerate(reader):
-            if i >= rows:
-                break
-            data.append(row)
-        
-        columns = list(data[0].keys()) if data else []
+        if dataset["category"] == "csv" and not is_lazy(dataset):
+            page = await asyncio.to_thread(read_rows, file_path, offset, rows)
+        else:
+            table = await resolve_table(db, dataset)
+            data = table.records(np.arange(offset, min(offset + rows, table.row_count)))
+            page = {"columns": table.columns, "rows": data, "total_rows": table.row_count}
         
         return {
             "dataset_id": dataset_id,
             "filename": dataset["filename"],
-            "columns": columns,
-            "rows": data,
-            "row_count": len(data),
-            "total_rows": sum(1 for _ in csv.DictReader(StringIO(content)))
+            "columns": page["columns"],
+            "rows": page["rows"],
+            "row_count": len(page["rows"]),
+            "offset": offset,
+            "total_rows": page["total_rows"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to preview CSV: {str(e)}")
@@ -382,18 +719,70 @@ async def preview_image(dataset_id: str):
 
 # ==================== STATISTICS ENDPOINTS ====================
 
+async def compute_dataset_stats(dataset: dict) -> dict:
+    """Compute the category-specific statistics for a dataset"""
+    file_path = dataset["file_path"]
+    stats = {}
+    
+    if dataset["category"] in ("csv", "tabular"):
+        stats = await get_csv_stats(dataset)
+    elif dataset["category"] == "json":
+        stats = await get_json_stats(file_path)
+    elif dataset["category"] == "image":
+        try:
+            from PIL import Image
+            with Image.open(file_path) as img:
+                stats["width"] = img.width
+                stats["height"] = img.height
+                stats["format"] = img.format
+                stats["mode"] = img.mode
+        except:
+            stats["image_info"] = "Could not read image metadata"
+    
+    return stats
+
+async def refresh_dataset_stats(dataset_id: str) -> dict:
+    """Recompute a dataset's statistics and store them under its versioned 'stats' field"""
+    dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
+    if not dataset:
+        return {}
+    
+    try:
+        data = await compute_dataset_stats(dataset)
+        stats = {"version": STATS_VERSION, "status": "failed" if "error" in data else "ready", "data": data}
+        if "error" in data:
+            stats["error"] = data["error"]
+    except Exception as e:
+        stats = {"version": STATS_VERSION, "status": "failed", "error": str(e), "data": {}}
+    stats["computed_at"] = datetime.now(timezone.utc).isoformat()
+    
+    await db.datasets.update_one({"id": dataset_id}, {"$set": {"stats": stats}})
+    return stats
+
 @router.get("/{dataset_id}/stats")
-async def get_dataset_stats(dataset_id: str):
-    """Get statistics for a dataset"""
+async def get_dataset_stats(
+    dataset_id: str,
+    refresh: bool = Query(False, description="Recompute statistics instead of returning the stored ones")
+):
+    """Get statistics for a dataset.
+
+    Statistics are computed once after upload and served from MongoDB. They
+    are recomputed here only on ?refresh=true, or when the stored ones are
+    missing or from an older STATS_VERSION.
+    """
     
     dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
     file_path = dataset["file_path"]
-    if not os.path.exists(file_path):
+    if not is_lazy(dataset) and not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found on disk")
     
+    stats = dataset.get("stats") or {}
+    if refresh or stats.get("version") != STATS_VERSION:
+        stats = await refresh_dataset_stats(dataset_id)
+    
     base_stats = {
         "dataset_id": dataset_id,
         "filename": dataset["filename"],
@@ -401,29 +790,52 @@ async def get_dataset_stats(dataset_id: str):
         "size_formatted": format_file_size(dataset["size"]),
         "type": dataset["type"],
         "category": dataset["category"],
-        "uploaded_at": dataset["uploaded_at"]
+        "uploaded_at": dataset["uploaded_at"],
+        "stats_status": stats.get("status"),
+        "stats_computed_at": stats.get("computed_at")
     }
     
-    # Get category-specific stats
-    if dataset["category"] == "csv":
-        csv_stats = await get_csv_stats(file_path)
-        base_stats.update(csv_stats)
-    elif dataset["category"] == "json":
-        json_stats = await get_json_stats(file_path)
-        base_stats.update(json_stats)
-    elif dataset["category"] == "image":
-        try:
-            from PIL import Image
-            with Image.open(file_path) as img:
-                base_stats["width"] = img.width
-                base_stats["height"] = img.height
-                base_stats["format"] = img.format
-                base_stats["mode"] = img.mode
-        except:
-            base_stats["image_info"] = "Could not read image metadata"
+    # Category-specific stats are only present once the background step finished
+    base_stats.update(stats.get("data") or {})
+    if stats.get("status") == "failed" and "error" not in base_stats:
+        base_stats["error"] = stats.get("error")
     
     return base_stats
 
+@router.get("/{dataset_id}/diff/{other_id}")
+async def diff_datasets(
+    dataset_id: str,
+    other_id: str,
+    limit: int = Query(100, ge=0, le=10000, description="Row numbers to list for each side")
+):
+    """Compare two versions of a dataset row by row.
+
+    Rows are matched by their persisted content fingerprints, as multisets,
+    so reordered rows count as unchanged. Reports how many rows of dataset_id
+    are missing from other_id (removed) and how many of other_id are new
+    (added), with the first `limit` row numbers of each.
+    """
+    
+    datasets = []
+    for version_id in (dataset_id, other_id):
+        dataset = await db.datasets.find_one({"id": version_id}, {"_id": 0})
+        if not dataset:
+            raise HTTPException(status_code=404, detail=f"Dataset '{version_id}' not found")
+        if dataset["category"] not in ("csv", "json", "tabular"):
+            raise HTTPException(status_code=400, detail="Only tabular datasets can be compared")
+        if not is_lazy(dataset) and not os.path.exists(dataset["file_path"]):
+            raise HTTPException(status_code=404, detail="File not found on disk")
+        datasets.append(dataset)
+    
+    table = await resolve_table(db, datasets[0])
+    other = await resolve_table(db, datasets[1])
+    try:
+        diff = await asyncio.to_thread(diff_tables, table, other, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"dataset_id": dataset_id, "other_id": other_id, **diff}
+
 def format_file_size(size: int) -> str:
     """Format file size in human readable format"""
     if size < 1024:
@@ -436,6 +848,31 @@ def format_file_size(size: int) -> str:
 
 # ==================== DELETE ENDPOINT ====================
 
+def remove_file_indexes(file_path: Optional[str]) -> None:
+    """Drop the CSV row index and search index once their file is gone"""
+    if file_path and not os.path.exists(file_path):
+        if os.path.exists(file_path + ROW_INDEX_SUFFIX):
+            os.remove(file_path + ROW_INDEX_SUFFIX)
+        shutil.rmtree(file_path + SEARCH_INDEX_SUFFIX, ignore_errors=True)
+
+async def release_source(dataset: dict):
+    """Give up a derived dataset's hold on its source file, removing it if that was the last one"""
+    lineage = dataset["lineage"]
+    source = lineage["source"]
+    
+    if lineage.get("retains_blob"):
+        removed = await release_blob(db, source["sha256"])
+    else:
+        # Plain files are kept by their dataset or by any derived dataset replaying from them
+        owner = await db.datasets.find_one({"id": source["dataset_id"], "file_path": source["file_path"]}, {"_id": 0, "id": 1})
+        removed = not owner and not await replays_from(db, source["file_path"], dataset["id"])
+        if removed and os.path.exists(source["file_path"]):
+            os.remove(source["file_path"])
+    
+    if removed:
+        remove_file_indexes(source["file_path"])
+        shutil.rmtree(columnar_path({"id": source["dataset_id"], "sha256": source.get("sha256")}), ignore_errors=True)
+
 @router.delete("/{dataset_id}")
 async def delete_dataset(dataset_id: str):
     """Delete a dataset"""
@@ -444,12 +881,31 @@ async def delete_dataset(dataset_id: str):
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    # Delete file from disk
+    # Release the shared blob; the file is only removed once no dataset references it
+    removed = None
+    if dataset.get("sha256"):
+        removed = await release_blob(db, dataset["sha256"])
+    
+    # Files outside the blob store belong to this dataset alone, unless derived
+    # datasets still replay their operations from them
     file_path = dataset.get("file_path")
-    if file_path and os.path.exists(file_path):
+    if removed is None and file_path and os.path.exists(file_path) and not await replays_from(db, file_path):
         os.remove(file_path)
+    remove_file_indexes(file_path)
+    
+    # The column store is shared the same way as the blob it was built from
+    columnar = dataset.get("columnar") or {}
+    if removed is not False and columnar.get("path") and not (file_path and os.path.exists(file_path)):
+        shutil.rmtree(columnar["path"], ignore_errors=True)
+    
+    # A derived dataset holds on to the file it was derived from
+    if dataset.get("lineage"):
+        await release_source(dataset)
+        if not (file_path and os.path.exists(file_path)):
+            shutil.rmtree(store_dir(dataset_id), ignore_errors=True)
     
     # Delete from MongoDB
     await db.datasets.delete_one({"id": dataset_id})
+    table_cache.invalidate(dataset_id)
     
     return {"message": "Dataset deleted successfully", "id": dataset_id}
@@ -2,13 +2,47 @@ import os
 import json
 import csv
 import uuid
+import asyncio
 from datetime import datetime, timezone
 from io import StringIO
-from typing import Optional, List
+from typing import Optional, List, Union
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 import aiofiles
+import numpy as np
+
+from services.chunked import (
+    count_blank_rows,
+    fit_encoding_chunked,
+    fit_missing_chunked,
+    fit_normalization_chunked,
+    use_chunked,
+)
+from services.columnar import columnar_ready
+from services.export import EXPORT_FORMATS, MEDIA_TYPES, export_chunks
+from services.filters import filter_indices
+from services.histogram import legacy_edges, load_base, merge_base
+from services.lineage import is_lazy, materialize, record_derived, resolve_table
+from services.operations import (
+    encoded_columns,
+    encoding_map,
+    fit_encoding,
+    fit_missing,
+    fit_normalization,
+)
+from services.sampling import SCATTER_MODES, scatter_sample
+from services.value_counts import (
+    APPROX_MIN_ROWS,
+    has_value_counts,
+    load_value_counts,
+    relabel_blank,
+    smallest_labels,
+    space_saving_top,
+    top_values,
+)
+from services.search_index import search_rows
+from services.splitting import SPLIT_NAMES, hash_split
 
 router = APIRouter()
 
@@ -23,21 +57,32 @@ os.makedirs(PROCESSED_DIR, exist_ok=True)
 
 class FilterRequest(BaseModel):
     column: str
-    operator: str  # eq, ne, gt, lt, gte, lte, contains, startswith, endswith
-    value: str
+    operator: str  # eq, ne, gt, lt, gte, lte, contains, startswith, endswith, in, between, isnull, notnull
+    value: Optional[str] = None
+    values: Optional[List[str]] = None  # for in and between
+
+class FilterGroup(BaseModel):
+    op: str  # and, or, not
+    filters: List[Union["FilterGroup", FilterRequest]]
+
+NORMALIZATION_METHODS = ["minmax", "zscore", "robust"]
+ENCODING_METHODS = ["onehot", "label", "ordinal"]
 
 class MissingValuesRequest(BaseModel):
     strategy: str  # drop, fill_mean, fill_median, fill_mode, fill_value
     columns: Optional[List[str]] = None  # None means all columns
     fill_value: Optional[str] = None
+    chunked: Optional[bool] = None  # None: chunked above CHUNKED_MIN_ROWS rows
 
 class NormalizationRequest(BaseModel):
     method: str  # minmax, zscore, robust
     columns: List[str]
+    chunked: Optional[bool] = None  # None: chunked above CHUNKED_MIN_ROWS rows
 
 class EncodingRequest(BaseModel):
     method: str  # onehot, label, ordinal
     columns: List[str]
+    chunked: Optional[bool] = None  # None: chunked above CHUNKED_MIN_ROWS rows
 
 class SplitRequest(BaseModel):
     train_ratio: float = 0.7
@@ -45,106 +90,70 @@ class SplitRequest(BaseModel):
     test_ratio: float = 0.15
     shuffle: bool = True
     random_seed: Optional[int] = 42
+    mode: str = "shuffle"  # shuffle (in memory), hash (streamed, row-order independent)
+    key_column: Optional[str] = None  # hash mode: hash this column instead of the whole row
+    stratify_column: Optional[str] = None  # hash mode: keep the ratios within each of its values
 
 # ==================== HELPER FUNCTIONS ====================
 
-async def load_csv_data(dataset_id: str) -> tuple:
-    """Load CSV data and return (rows, columns)"""
+async def load_table(dataset_id: str) -> tuple:
+    """Open a dataset's typed column store and return (table, dataset).
+
+    Tables are shared through the process-wide cache, so the charts of one
+    dashboard parse a dataset once between them. Derived datasets replay
+    their preprocessing steps on top of the nearest cached ancestor.
+    """
     dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
     
-    if dataset["category"] != "csv":
+    # CSV, Excel and Parquet are always tabular; JSON only once it converted to a column store
+    if dataset["category"] not in ("csv", "tabular") and not columnar_ready(dataset):
         raise HTTPException(status_code=400, detail="Only CSV datasets are supported")
     
-    file_path = dataset["file_path"]
-    if not os.path.exists(file_path):
+    if not is_lazy(dataset) and not os.path.exists(dataset["file_path"]):
         raise HTTPException(status_code=404, detail="File not found on disk")
     
-    async with aiofiles.open(file_path, 'r', encoding='utf-8') as f:
-        content = await f.read()
-    
-    reader = csv.DictReader(StringIO(content))
-    rows = list(reader)
-    columns = list(rows[0].keys()) if rows else []
+    try:
+        table = await resolve_table(db, dataset)
+    except ImportError as e:
+        raise HTTPException(status_code=400, detail=f"Cannot read {dataset['type']} files: {str(e)}")
     
-    return rows, columns, dataset
+    return table, dataset
 
-def apply_filter(rows: list, column: str, operator: str, value: str) -> list:
-    """Apply a single filter to rows"""
-    filtered = []
-    for row in rows:
-        cell = row.get(column, "")
-        try:
-            # Try numeric comparison
-            cell_num = float(cell) if cell else None
-            val_num = float(value)
-            
-            if operator == "eq" and cell_num == val_num:
-                filtered.append(row)
-            elif operator == "ne" and cell_num != val_num:
-                filtered.append(row)
-            elif operator == "gt" and cell_num is not None and cell_num > val_num:
-                filtered.append(row)
-            elif operator == "lt" and cell_num is not None and cell_num < val_num:
-                filtered.append(row)
-            elif operator == "gte" and cell_num is not None and cell_num >= val_num:
-                filtered.append(row)
-            elif operator == "lte" and cell_num is not None and cell_num <= val_num:
-                filtered.append(row)
-        except (ValueError, TypeError):
-            # String comparison
-            cell_str = str(cell).lower()
-            val_str = str(value).lower()
-            
-            if operator == "eq" and cell_str == val_str:
-                filtered.append(row)
-            elif operator == "ne" and cell_str != val_str:
-                filtered.append(row)
-            elif operator == "contains" and val_str in cell_str:
-                filtered.append(row)
-            elif operator == "startswith" and cell_str.startswith(val_str):
-                filtered.append(row)
-            elif operator == "endswith" and cell_str.endswith(val_str):
-                filtered.append(row)
-    
-    return filtered
-
-def get_numeric_values(rows: list, column: str) -> list:
-    """Extract numeric values from a column"""
-    values = []
-    for row in rows:
-        try:
-            val = float(row.get(column, ""))
-            values.append(val)
-        except (ValueError, TypeError):
-            pass
-    return values
+async def load_csv_data(dataset_id: str) -> tuple:
+    """Load CSV data and return (rows, columns)"""
+    table, dataset = await load_table(dataset_id)
+    return table.records(), table.columns, dataset
+
+def select_rows(table, filters) -> np.ndarray:
+    """Row indices matching a filter list (AND) or filter tree"""
+    try:
+        return filter_indices(table, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # ==================== EXPLORATION ENDPOINTS ====================
 
 @router.post("/{dataset_id}/filter")
 async def filter_data(
     dataset_id: str,
-    filters: List[FilterRequest],
+    filters: Union[List[FilterRequest], FilterGroup],
     limit: int = Query(100, ge=1, le=1000)
 ):
-    """Filter dataset based on conditions"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    """Filter dataset based on conditions; a list is ANDed, a group nests and/or/not"""
+    table, dataset = await load_table(dataset_id)
     
-    filtered_rows = rows
-    for f in filters:
-        if f.column not in columns:
-            raise HTTPException(status_code=400, detail=f"Column '{f.column}' not found")
-        filtered_rows = apply_filter(filtered_rows, f.column, f.operator, f.value)
+    tree = [f.dict() for f in filters] if isinstance(filters, list) else filters.dict()
+    matches = select_rows(table, tree)
     
     return {
         "dataset_id": dataset_id,
-        "original_count": len(rows),
-        "filtered_count": len(filtered_rows),
-        "columns": columns,
-        "rows": filtered_rows[:limit],
-        "truncated": len(filtered_rows) > limit
+        "original_count": table.row_count,
+        "filtered_count": len(matches),
+        "columns": table.columns,
+        "rows": table.records(matches[:limit]),
+        "truncated": len(matches) > limit
     }
 
 @router.get("/{dataset_id}/search")
@@ -152,50 +161,47 @@ async def search_data(
     dataset_id: str,
     q: str = Query(..., min_length=1),
     column: Optional[str] = None,
-    limit: int = Query(100, ge=1, le=1000)
+    limit: int = Query(100, ge=1, le=1000),
+    use_index: bool = Query(True, description="Use (and on first use build) the dataset's trigram index")
 ):
     """Search for text across all columns or specific column"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    table, dataset = await load_table(dataset_id)
+    columns = table.columns
     
     if column and column not in columns:
         raise HTTPException(status_code=400, detail=f"Column '{column}' not found")
     
     search_columns = [column] if column else columns
-    q_lower = q.lower()
-    
-    matching_rows = []
-    for row in rows:
-        for col in search_columns:
-            if q_lower in str(row.get(col, "")).lower():
-                matching_rows.append(row)
-                break
+    # Derived datasets have no file to keep an index next to
+    use_index = use_index and not is_lazy(dataset)
+    matches = await asyncio.to_thread(search_rows, table, search_columns, q, dataset["file_path"], use_index)
     
     return {
         "dataset_id": dataset_id,
         "query": q,
         "column": column,
-        "match_count": len(matching_rows),
+        "match_count": len(matches),
         "columns": columns,
-        "rows": matching_rows[:limit],
-        "truncated": len(matching_rows) > limit
+        "rows": table.records(matches[:limit]),
+        "truncated": len(matches) > limit
     }
 
 @router.get("/{dataset_id}/unique/{column}")
 async def get_unique_values(dataset_id: str, column: str):
     """Get unique values for a column"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    table, dataset = await load_table(dataset_id)
     
-    if column not in columns:
+    if column not in table.columns:
         raise HTTPException(status_code=400, detail=f"Column '{column}' not found")
     
-    values = [row.get(column, "") for row in rows]
-    unique = list(set(values))
+    value_counts = await asyncio.to_thread(load_value_counts, table, column)
+    unique_count = len(value_counts["labels"])
     
     return {
         "column": column,
-        "unique_count": len(unique),
-        "values": sorted(unique)[:100],  # Limit to 100 unique values
-        "truncated": len(unique) > 100
+        "unique_count": unique_count,
+        "values": smallest_labels(value_counts, 100),  # Limit to 100 unique values
+        "truncated": unique_count > 100
     }
 
 # ==================== CHART DATA ENDPOINTS ====================
@@ -206,25 +212,28 @@ async def get_histogram_data(
     column: str,
     bins: int = Query(10, ge=2, le=50)
 ):
-    """Get histogram data for a numeric column"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    """Get histogram data for a numeric column.
+
+    Any bin count is re-binned from the column's precomputed base
+    histogram, without a pass over the data.
+    """
+    table, dataset = await load_table(dataset_id)
     
-    if column not in columns:
+    if column not in table.columns:
         raise HTTPException(status_code=400, detail=f"Column '{column}' not found")
     
-    values = get_numeric_values(rows, column)
+    # Coarse bins are merged from the column's precomputed base histogram
+    base = await asyncio.to_thread(load_base, table, column)
     
-    if not values:
+    if base is None:
         raise HTTPException(status_code=400, detail=f"Column '{column}' has no numeric values")
     
-    min_val, max_val = min(values), max(values)
-    bin_width = (max_val - min_val) / bins if max_val > min_val else 1
+    min_val, max_val = base["min"], base["max"]
+    counts = merge_base(base, bins)
+    starts, ends = legacy_edges(min_val, max_val, bins)
     
     histogram = []
-    for i in range(bins):
-        bin_start = min_val + i * bin_width
-        bin_end = bin_start + bin_width
-        count = sum(1 for v in values if bin_start <= v < bin_end or (i == bins - 1 and v == max_val))
+    for bin_start, bin_end, count in zip(starts.tolist(), ends.tolist(), counts.tolist()):
         histogram.append({
             "bin": f"{bin_start:.2f}-{bin_end:.2f}",
             "start": bin_start,
@@ -234,7 +243,7 @@ async def get_histogram_data(
     
     return {
         "column": column,
-        "total_values": len(values),
+        "total_values": base["total"],
         "min": min_val,
         "max": max_val,
         "bins": bins,
@@ -245,28 +254,37 @@ async def get_histogram_data(
 async def get_bar_chart_data(
     dataset_id: str,
     column: str,
-    top_n: int = Query(10, ge=1, le=50)
+    top_n: int = Query(10, ge=1, le=50),
+    approximate: Optional[bool] = Query(None, description="Space-Saving top-k instead of exact counts; by default only for very large tables")
 ):
     """Get bar chart data for categorical column (value counts)"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    table, dataset = await load_table(dataset_id)
     
-    if column not in columns:
+    if column not in table.columns:
         raise HTTPException(status_code=400, detail=f"Column '{column}' not found")
     
-    # Count occurrences
-    counts = {}
-    for row in rows:
-        val = row.get(column, "") or "(empty)"
-        counts[val] = counts.get(val, 0) + 1
+    if approximate is None:
+        approximate = table.row_count > APPROX_MIN_ROWS and not has_value_counts(table, column)
+    
+    if approximate:
+        top = await asyncio.to_thread(space_saving_top, table, column, top_n, None, "(empty)")
+        return {
+            "column": column,
+            "total_values": table.row_count,
+            "unique_count": None,
+            "approximate": True,
+            "error_bound": top["error_bound"],
+            "data": top["data"]
+        }
     
-    # Sort by count and take top N
-    sorted_counts = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:top_n]
+    value_counts = relabel_blank(await asyncio.to_thread(load_value_counts, table, column), "(empty)")
     
     return {
         "column": column,
-        "total_values": len(rows),
-        "unique_count": len(counts),
-        "data": [{"name": k, "count": v} for k, v in sorted_counts]
+        "total_values": table.row_count,
+        "unique_count": len(value_counts["labels"]),
+        "approximate": False,
+        "data": [{"name": k, "count": v} for k, v in top_values(value_counts, top_n)]
     }
 
 @router.get("/{dataset_id}/chart/scatter")
@@ -274,307 +292,176 @@ async def get_scatter_data(
     dataset_id: str,
     x_column: str,
     y_column: str,
-    limit: int = Query(500, ge=1, le=1000)
+    limit: int = Query(500, ge=1, le=1000),
+    mode: str = Query("auto", enum=SCATTER_MODES),
+    seed: int = Query(42, description="Random seed for uniform and stratified sampling"),
+    stratify_column: Optional[str] = Query(None, description="Column whose values are sampled proportionally"),
+    grid_size: int = Query(50, ge=5, le=200, description="Cells per axis in density mode")
 ):
-    """Get scatter plot data for two numeric columns"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    """Get scatter plot data for two numeric columns, sampled over the whole dataset"""
+    table, dataset = await load_table(dataset_id)
     
-    if x_column not in columns or y_column not in columns:
+    if x_column not in table.columns or y_column not in table.columns:
         raise HTTPException(status_code=400, detail="Column not found")
+    if stratify_column and stratify_column not in table.columns:
+        raise HTTPException(status_code=400, detail=f"Column '{stratify_column}' not found")
     
-    data = []
-    for row in rows[:limit]:
-        try:
-            x = float(row.get(x_column, ""))
-            y = float(row.get(y_column, ""))
-            data.append({"x": x, "y": y})
-        except (ValueError, TypeError):
-            pass
+    try:
+        sample = await asyncio.to_thread(
+            scatter_sample, table, x_column, y_column, mode, limit, seed, stratify_column, grid_size
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "x_column": x_column,
         "y_column": y_column,
-        "point_count": len(data),
-        "data": data
+        "point_count": len(sample["data"]),
+        **sample
     }
 
 # ==================== PREPROCESSING ENDPOINTS ====================
 
+# Missing values, normalization and encoding only record the step and its
+# fitted parameters on a new derived dataset; reads replay the chain, and
+# only a split, an export or an explicit materialize writes data to disk.
+# Large tables are fitted and replayed a chunk at a time (services/chunked.py).
+
 @router.post("/{dataset_id}/preprocess/missing")
 async def handle_missing_values(dataset_id: str, request: MissingValuesRequest):
     """Handle missing values in dataset"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    table, dataset = await load_table(dataset_id)
+    columns = table.columns
     
     target_columns = request.columns or columns
     for col in target_columns:
         if col not in columns:
             raise HTTPException(status_code=400, detail=f"Column '{col}' not found")
     
-    processed_rows = []
-    removed_count = 0
-    
-    # Calculate fill values if needed
-    fill_values = {}
-    if request.strategy in ["fill_mean", "fill_median", "fill_mode"]:
-        for col in target_columns:
-            numeric_vals = get_numeric_values(rows, col)
-            if request.strategy == "fill_mean" and numeric_vals:
-                fill_values[col] = sum(numeric_vals) / len(numeric_vals)
-            elif request.strategy == "fill_median" and numeric_vals:
-                sorted_vals = sorted(numeric_vals)
-                mid = len(sorted_vals) // 2
-                fill_values[col] = sorted_vals[mid] if len(sorted_vals) % 2 else (sorted_vals[mid-1] + sorted_vals[mid]) / 2
-            elif request.strategy == "fill_mode":
-                vals = [row.get(col, "") for row in rows if row.get(col, "").strip()]
-                if vals:
-                    fill_values[col] = max(set(vals), key=vals.count)
-    
-    for row in rows:
-        has_missing = any(not row.get(col, "").strip() for col in target_columns)
-        
-        if request.strategy == "drop" and has_missing:
-            removed_count += 1
-            continue
-        
-        new_row = row.copy()
-        for col in target_columns:
-            if not new_row.get(col, "").strip():
-                if request.strategy == "fill_value":
-                    new_row[col] = request.fill_value or ""
-                elif col in fill_values:
-                    new_row[col] = str(fill_values[col])
-        
-        processed_rows.append(new_row)
-    
-    # Save processed data
-    processed_id = str(uuid.uuid4())
-    processed_filename = f"{processed_id}_missing.csv"
-    processed_path = os.path.join(PROCESSED_DIR, processed_filename)
-    
-    async with aiofiles.open(processed_path, 'w', encoding='utf-8') as f:
-        if processed_rows:
-            writer_content = StringIO()
-            writer = csv.DictWriter(writer_content, fieldnames=columns)
-            writer.writeheader()
-            writer.writerows(processed_rows)
-            await f.write(writer_content.getvalue())
-    
-    # Store processed dataset in MongoDB
-    processed_doc = {
-        "id": processed_id,
-        "filename": f"{dataset['filename']}_processed",
-        "stored_filename": processed_filename,
-        "file_path": processed_path,
-        "size": os.path.getsize(processed_path),
-        "type": ".csv",
-        "category": "csv",
-        "uploaded_at": datetime.now(timezone.utc).isoformat(),
-        "status": "processed",
-        "source_dataset": dataset_id,
-        "preprocessing": {"type": "missing_values", "strategy": request.strategy}
-    }
-    await db.datasets.insert_one(processed_doc)
-    processed_doc.pop("_id", None)
+    if use_chunked(table, request.chunked):
+        op = await asyncio.to_thread(fit_missing_chunked, table, target_columns, request.strategy, request.fill_value)
+    else:
+        # Fill values are fitted from the target columns; drop and fill_value need no rows
+        fitted = request.strategy in ("fill_mean", "fill_median", "fill_mode")
+        rows = table.records(columns=target_columns) if fitted else []
+        op = await asyncio.to_thread(fit_missing, rows, target_columns, request.strategy, request.fill_value)
+    
+    # Only drop removes rows: exactly those with a blank target cell
+    removed = await asyncio.to_thread(count_blank_rows, table, target_columns) if request.strategy == "drop" else 0
+    
+    processed_doc = await record_derived(
+        db, dataset, op,
+        filename=f"{dataset['filename']}_processed",
+        preprocessing={"type": "missing_values", "strategy": request.strategy}
+    )
     
     return {
-        "original_rows": len(rows),
-        "processed_rows": len(processed_rows),
-        "removed_rows": removed_count,
+        "original_rows": table.row_count,
+        "processed_rows": table.row_count - removed,
+        "removed_rows": removed,
         "strategy": request.strategy,
+        "chunked": use_chunked(table, request.chunked),
         "processed_dataset": processed_doc
     }
 
 @router.post("/{dataset_id}/preprocess/normalize")
 async def normalize_data(dataset_id: str, request: NormalizationRequest):
     """Normalize numeric columns"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    table, dataset = await load_table(dataset_id)
     
+    if request.method not in NORMALIZATION_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown normalization method '{request.method}'")
     for col in request.columns:
-        if col not in columns:
+        if col not in table.columns:
             raise HTTPException(status_code=400, detail=f"Column '{col}' not found")
     
-    # Calculate normalization parameters
-    norm_params = {}
-    for col in request.columns:
-        values = get_numeric_values(rows, col)
-        if not values:
-            raise HTTPException(status_code=400, detail=f"Column '{col}' has no numeric values")
-        
-        if request.method == "minmax":
-            norm_params[col] = {"min": min(values), "max": max(values)}
-        elif request.method == "zscore":
-            mean = sum(values) / len(values)
-            std = (sum((x - mean) ** 2 for x in values) / len(values)) ** 0.5
-            norm_params[col] = {"mean": mean, "std": std if std > 0 else 1}
-        elif request.method == "robust":
-            sorted_vals = sorted(values)
-            q1 = sorted_vals[len(sorted_vals) // 4]
-            q3 = sorted_vals[3 * len(sorted_vals) // 4]
-            median = sorted_vals[len(sorted_vals) // 2]
-            iqr = q3 - q1 if q3 > q1 else 1
-            norm_params[col] = {"median": median, "iqr": iqr}
-    
-    # Apply normalization
-    processed_rows = []
-    for row in rows:
-        new_row = row.copy()
-        for col in request.columns:
-            try:
-                val = float(row.get(col, ""))
-                params = norm_params[col]
-                
-                if request.method == "minmax":
-                    range_val = params["max"] - params["min"]
-                    new_val = (val - params["min"]) / range_val if range_val > 0 else 0
-                elif request.method == "zscore":
-                    new_val = (val - params["mean"]) / params["std"]
-                elif request.method == "robust":
-                    new_val = (val - params["median"]) / params["iqr"]
-                
-                new_row[col] = f"{new_val:.6f}"
-            except (ValueError, TypeError):
-                pass
-        processed_rows.append(new_row)
-    
-    # Save processed data
-    processed_id = str(uuid.uuid4())
-    processed_filename = f"{processed_id}_normalized.csv"
-    processed_path = os.path.join(PROCESSED_DIR, processed_filename)
-    
-    async with aiofiles.open(processed_path, 'w', encoding='utf-8') as f:
-        writer_content = StringIO()
-        writer = csv.DictWriter(writer_content, fieldnames=columns)
-        writer.writeheader()
-        writer.writerows(processed_rows)
-        await f.write(writer_content.getvalue())
-    
-    processed_doc = {
-        "id": processed_id,
-        "filename": f"{dataset['filename']}_normalized",
-        "stored_filename": processed_filename,
-        "file_path": processed_path,
-        "size": os.path.getsize(processed_path),
-        "type": ".csv",
-        "category": "csv",
-        "uploaded_at": datetime.now(timezone.utc).isoformat(),
-        "status": "processed",
-        "source_dataset": dataset_id,
-        "preprocessing": {"type": "normalization", "method": request.method, "columns": request.columns}
-    }
-    await db.datasets.insert_one(processed_doc)
-    processed_doc.pop("_id", None)
+    try:
+        if use_chunked(table, request.chunked):
+            op = await asyncio.to_thread(fit_normalization_chunked, table, request.columns, request.method)
+        else:
+            op = await asyncio.to_thread(fit_normalization, table.records(), request.columns, request.method)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    processed_doc = await record_derived(
+        db, dataset, op,
+        filename=f"{dataset['filename']}_normalized",
+        preprocessing={"type": "normalization", "method": request.method, "columns": request.columns}
+    )
     
     return {
         "method": request.method,
         "columns": request.columns,
-        "parameters": norm_params,
+        "parameters": dict(op["parameters"]),
+        "chunked": use_chunked(table, request.chunked),
         "processed_dataset": processed_doc
     }
 
 @router.post("/{dataset_id}/preprocess/encode")
 async def encode_data(dataset_id: str, request: EncodingRequest):
     """Encode categorical columns"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    table, dataset = await load_table(dataset_id)
     
+    if request.method not in ENCODING_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown encoding method '{request.method}'")
     for col in request.columns:
-        if col not in columns:
+        if col not in table.columns:
             raise HTTPException(status_code=400, detail=f"Column '{col}' not found")
     
-    new_columns = list(columns)
-    processed_rows = []
-    encoding_info = {}
+    if use_chunked(table, request.chunked):
+        op = await asyncio.to_thread(fit_encoding_chunked, table, request.columns, request.method)
+    else:
+        op = await asyncio.to_thread(fit_encoding, table.records(), request.columns, request.method)
     
-    if request.method == "label":
-        # Label encoding
-        for col in request.columns:
-            unique_vals = sorted(set(row.get(col, "") for row in rows))
-            encoding_info[col] = {val: idx for idx, val in enumerate(unique_vals)}
-        
-        for row in rows:
-            new_row = row.copy()
-            for col in request.columns:
-                new_row[col] = str(encoding_info[col].get(row.get(col, ""), 0))
-            processed_rows.append(new_row)
-    
-    elif request.method == "onehot":
-        # One-hot encoding
-        for col in request.columns:
-            unique_vals = sorted(set(row.get(col, "") for row in rows))
-            encoding_info[col] = unique_vals
-            for val in unique_vals:
-                new_col = f"{col}_{val}"
-                if new_col not in new_columns:
-                    new_columns.append(new_col)
-        
-        for row in rows:
-            new_row = {k: v for k, v in row.items() if k not in request.columns}
-            for col in request.columns:
-                val = row.get(col, "")
-                for unique_val in encoding_info[col]:
-                    new_row[f"{col}_{unique_val}"] = "1" if val == unique_val else "0"
-            processed_rows.append(new_row)
-        
-        # Remove original columns from new_columns
-        new_columns = [c for c in new_columns if c not in request.columns]
-    
-    elif request.method == "ordinal":
-        # Same as label encoding but preserves order
-        for col in request.columns:
-            unique_vals = sorted(set(row.get(col, "") for row in rows))
-            encoding_info[col] = {val: idx for idx, val in enumerate(unique_vals)}
-        
-        for row in rows:
-            new_row = row.copy()
-            for col in request.columns:
-                new_row[col] = str(encoding_info[col].get(row.get(col, ""), 0))
-            processed_rows.append(new_row)
-    
-    # Save processed data
-    processed_id = str(uuid.uuid4())
-    processed_filename = f"{processed_id}_encoded.csv"
-    processed_path = os.path.join(PROCESSED_DIR, processed_filename)
-    
-    final_columns = new_columns if request.method == "onehot" else columns
-    
-    async with aiofiles.open(processed_path, 'w', encoding='utf-8') as f:
-        writer_content = StringIO()
-        writer = csv.DictWriter(writer_content, fieldnames=final_columns)
-        writer.writeheader()
-        writer.writerows(processed_rows)
-        await f.write(writer_content.getvalue())
-    
-    processed_doc = {
-        "id": processed_id,
-        "filename": f"{dataset['filename']}_encoded",
-        "stored_filename": processed_filename,
-        "file_path": processed_path,
-        "size": os.path.getsize(processed_path),
-        "type": ".csv",
-        "category": "csv",
-        "uploaded_at": datetime.now(timezone.utc).isoformat(),
-        "status": "processed",
-        "source_dataset": dataset_id,
-        "preprocessing": {"type": "encoding", "method": request.method, "columns": request.columns}
-    }
-    await db.datasets.insert_one(processed_doc)
-    processed_doc.pop("_id", None)
+    processed_doc = await record_derived(
+        db, dataset, op,
+        filename=f"{dataset['filename']}_encoded",
+        preprocessing={"type": "encoding", "method": request.method, "columns": request.columns}
+    )
     
     return {
         "method": request.method,
         "columns": request.columns,
-        "encoding_map": encoding_info,
-        "new_columns": final_columns,
+        "encoding_map": encoding_map(op),
+        "new_columns": encoded_columns(table.columns, op),
+        "chunked": use_chunked(table, request.chunked),
         "processed_dataset": processed_doc
     }
 
+async def record_split(dataset: dict, split_name: str, split_id: str, split_path: str) -> dict:
+    """Insert the dataset document of one written split file"""
+    split_doc = {
+        "id": split_id,
+        "filename": f"{dataset['filename']}_{split_name}",
+        "stored_filename": os.path.basename(split_path),
+        "file_path": split_path,
+        "size": os.path.getsize(split_path),
+        "type": ".csv",
+        "category": "csv",
+        "uploaded_at": datetime.now(timezone.utc).isoformat(),
+        "status": "processed",
+        "source_dataset": dataset["id"],
+        "preprocessing": {"type": "split", "split_name": split_name}
+    }
+    await db.datasets.insert_one(split_doc)
+    split_doc.pop("_id", None)
+    return split_doc
+
 @router.post("/{dataset_id}/preprocess/split")
 async def split_data(dataset_id: str, request: SplitRequest):
     """Split dataset into train/val/test sets"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
-    
     if abs(request.train_ratio + request.val_ratio + request.test_ratio - 1.0) > 0.01:
         raise HTTPException(status_code=400, detail="Ratios must sum to 1.0")
     
+    if request.mode == "hash":
+        return await hash_split_data(dataset_id, request)
+    if request.mode != "shuffle":
+        raise HTTPException(status_code=400, detail=f"Unknown split mode '{request.mode}'")
+    if request.key_column or request.stratify_column:
+        raise HTTPException(status_code=400, detail="key_column and stratify_column need mode 'hash'")
+    
+    rows, columns, dataset = await load_csv_data(dataset_id)
+    
     import random
     if request.shuffle:
         random.seed(request.random_seed)
@@ -606,29 +493,14 @@ async def split_data(dataset_id: str, request: SplitRequest):
             writer.writerows(split_rows)
             await f.write(writer_content.getvalue())
         
-        split_doc = {
-            "id": split_id,
-            "filename": f"{dataset['filename']}_{split_name}",
-            "stored_filename": split_filename,
-            "file_path": split_path,
-            "size": os.path.getsize(split_path),
-            "type": ".csv",
-            "category": "csv",
-            "uploaded_at": datetime.now(timezone.utc).isoformat(),
-            "status": "processed",
-            "source_dataset": dataset_id,
-            "preprocessing": {"type": "split", "split_name": split_name}
-        }
-        await db.datasets.insert_one(split_doc)
-        split_doc.pop("_id", None)
-        
         results[split_name] = {
             "rows": len(split_rows),
-            "dataset": split_doc
+            "dataset": await record_split(dataset, split_name, split_id, split_path)
         }
     
     return {
         "original_rows": n,
+        "mode": "shuffle",
         "ratios": {
             "train": request.train_ratio,
             "val": request.val_ratio,
@@ -637,66 +509,130 @@ async def split_data(dataset_id: str, request: SplitRequest):
         "splits": results
     }
 
+async def hash_split_data(dataset_id: str, request: SplitRequest) -> dict:
+    """Split by hashing each row's key with the seed, streaming all three files in one pass"""
+    table, dataset = await load_table(dataset_id)
+    
+    for col in (request.key_column, request.stratify_column):
+        if col and col not in table.columns:
+            raise HTTPException(status_code=400, detail=f"Column '{col}' not found")
+    
+    split_ids = {name: str(uuid.uuid4()) for name in SPLIT_NAMES}
+    paths = {name: os.path.join(PROCESSED_DIR, f"{split_ids[name]}_{name}.csv") for name in SPLIT_NAMES}
+    ratios = (request.train_ratio, request.val_ratio, request.test_ratio)
+    
+    try:
+        counts = await asyncio.to_thread(
+            hash_split, table, paths, ratios, request.random_seed, request.key_column, request.stratify_column
+        )
+    except ValueError as e:
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    results = {}
+    for split_name in SPLIT_NAMES:
+        if not counts[split_name]:
+            os.remove(paths[split_name])
+            continue
+        results[split_name] = {
+            "rows": counts[split_name],
+            "dataset": await record_split(dataset, split_name, split_ids[split_name], paths[split_name])
+        }
+    
+    return {
+        "original_rows": table.row_count,
+        "mode": "hash",
+        "key_column": request.key_column,
+        "stratify_column": request.stratify_column,
+        "random_seed": request.random_seed,
+        "ratios": {
+            "train": request.train_ratio,
+            "val": request.val_ratio,
+            "test": request.test_ratio
+        },
+        "splits": results
+    }
+
+@router.post("/{dataset_id}/materialize")
+async def materialize_dataset(dataset_id: str):
+    """Write a derived dataset's replayed rows to disk as a regular CSV dataset"""
+    dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    if not is_lazy(dataset):
+        return {"materialized": False, "dataset": dataset}
+    
+    dataset = await materialize(db, dataset, PROCESSED_DIR)
+    return {"materialized": True, "dataset": dataset}
+
 # ==================== EXPORT ENDPOINTS ====================
 
+def export_response(table, format: str, filename: str, indices: Optional[np.ndarray] = None) -> StreamingResponse:
+    """Stream a table export chunk by chunk as rows are rendered"""
+    try:
+        chunks = export_chunks(table, format, indices)
+    except ImportError as e:
+        raise HTTPException(status_code=400, detail=f"Cannot export {format}: {str(e)}")
+    
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 @router.get("/{dataset_id}/export")
 async def export_dataset(
     dataset_id: str,
-    format: str = Query("csv", enum=["csv", "json"])
+    format: str = Query("csv", enum=EXPORT_FORMATS)
 ):
     """Export dataset in specified format"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    dataset = await db.datasets.find_one({"id": dataset_id}, {"_id": 0})
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    # A CSV file exported as CSV needs no transform: send the stored file as is
+    if format == "csv" and dataset["type"] == ".csv" and not is_lazy(dataset) and os.path.exists(dataset["file_path"]):
+        return FileResponse(dataset["file_path"], media_type=MEDIA_TYPES["csv"], filename=dataset["filename"])
+    
+    table, dataset = await load_table(dataset_id)
     
     if format == "csv":
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=columns)
-        writer.writeheader()
-        writer.writerows(rows)
-        content = output.getvalue()
-        media_type = "text/csv"
         filename = f"{dataset['filename']}"
     else:
-        content = json.dumps(rows, indent=2)
-        media_type = "application/json"
-        filename = f"{os.path.splitext(dataset['filename'])[0]}.json"
+        filename = f"{os.path.splitext(dataset['filename'])[0]}.{format}"
     
-    return StreamingResponse(
-        iter([content]),
-        media_type=media_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    return export_response(table, format, filename)
 
 @router.get("/{dataset_id}/export/filtered")
 async def export_filtered_data(
     dataset_id: str,
-    column: str,
-    operator: str,
-    value: str,
-    format: str = Query("csv", enum=["csv", "json"])
+    column: Optional[str] = None,
+    operator: Optional[str] = None,
+    value: Optional[str] = None,
+    filter: Optional[str] = Query(None, description="JSON filter tree, as accepted by /filter; replaces column/operator/value"),
+    format: str = Query("csv", enum=EXPORT_FORMATS)
 ):
     """Export filtered dataset"""
-    rows, columns, dataset = await load_csv_data(dataset_id)
+    table, dataset = await load_table(dataset_id)
     
-    if column not in columns:
-        raise HTTPException(status_code=400, detail=f"Column '{column}' not found")
+    if filter:
+        try:
+            tree = json.loads(filter)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="filter must be valid JSON")
+    elif column and operator:
+        tree = {"column": column, "operator": operator, "value": value}
+    else:
+        raise HTTPException(status_code=400, detail="Provide column and operator, or a filter tree")
     
-    filtered_rows = apply_filter(rows, column, operator, value)
+    matches = select_rows(table, tree)
     
     if format == "csv":
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=columns)
-        writer.writeheader()
-        writer.writerows(filtered_rows)
-        content = output.getvalue()
-        media_type = "text/csv"
         filename = f"{dataset['filename']}_filtered.csv"
     else:
-        content = json.dumps(filtered_rows, indent=2)
-        media_type = "application/json"
-        filename = f"{os.path.splitext(dataset['filename'])[0]}_filtered.json"
+        filename = f"{os.path.splitext(dataset['filename'])[0]}_filtered.{format}"
     
-    return StreamingResponse(
-        iter([content]),
-        media_type=media_type,
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
-    )
+    return export_response(table, format, filename, matches)
@@ -2,6 +2,7 @@ import os
 import uuid
 import json
 import pickle
+import asyncio
 import pandas as pd
 import numpy as np
 from datetime import datetime, timezone
@@ -12,6 +13,9 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, MinMaxScaler, LabelEncoder, OneHotEncoder
 from sklearn.impute import SimpleImputer
 
+from services.fingerprints import duplicate_mask
+from services.lineage import resolve_table
+
 router = APIRouter()
 
 # Will be set from server.py
@@ -122,8 +126,13 @@ def generate_auto_config(analysis_results: Dict, target_column: str) -> Preproce
         handle_outliers=False
     )
 
-def apply_preprocessing(df: pd.DataFrame, config: PreprocessingConfig, fit: bool = True) -> Dict[str, Any]:
-    """Apply preprocessing transformations to the dataframe"""
+def apply_preprocessing(df: pd.DataFrame, config: PreprocessingConfig, fit: bool = True,
+                        duplicates: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    """Apply preprocessing transformations to the dataframe.
+
+    duplicates, if given, marks the rows that repeat an earlier row (e.g.
+    from the dataset's row fingerprints) so they need not be found again.
+    """
     
     result = {
         "X_train": None,
@@ -143,7 +152,10 @@ def apply_preprocessing(df: pd.DataFrame, config: PreprocessingConfig, fit: bool
     # Remove duplicates
     if config.remove_duplicates:
         initial_rows = len(df_processed)
-        df_processed = df_processed.drop_duplicates()
+        if duplicates is not None:
+            df_processed = df_processed[~duplicates]
+        else:
+            df_processed = df_processed.drop_duplicates()
         result["stats"]["duplicates_removed"] = initial_rows - len(df_processed)
     
     # Identify columns by role
@@ -357,18 +369,16 @@ async def run_preprocessing(project_id: str, config: PreprocessingConfig):
         project = await db.projects.find_one({"id": project_id})
         dataset = await db.datasets.find_one({"id": project["dataset_id"]})
         
-        # Load dataset
-        file_path = os.path.join(UPLOAD_DIR, dataset["stored_filename"])
-        
-        if dataset["category"] == "csv":
-            df = pd.read_csv(file_path)
-        elif dataset["category"] == "json":
-            df = pd.read_json(file_path)
-        else:
+        # Load dataset from its column store
+        if dataset["category"] not in ("csv", "json", "tabular"):
             raise ValueError(f"Unsupported file type: {dataset['category']}")
         
+        table = await resolve_table(db, dataset)
+        df = await asyncio.to_thread(table.to_frame)
+        duplicates = await asyncio.to_thread(duplicate_mask, table) if config.remove_duplicates else None
+        
         # Apply preprocessing
-        result = apply_preprocessing(df, config)
+        result = apply_preprocessing(df, config, duplicates=duplicates)
         
         # Save processed data
         processed_id = str(uuid.uuid4())
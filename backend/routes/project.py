@@ -4,6 +4,8 @@ from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
 
+from services.pagination import paginate
+
 router = APIRouter()
 
 # Will be set from server.py
@@ -64,22 +66,28 @@ async def create_project(project: ProjectCreate):
 async def list_projects(
     status: Optional[str] = Query(None, description="Filter by status"),
     limit: int = Query(50, ge=1, le=100),
-    skip: int = Query(0, ge=0)
+    skip: int = Query(0, ge=0, description="Offset paging; prefer cursor for deep pages"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    exact_count: bool = Query(True, description="Count matches exactly instead of using the collection estimate")
 ):
-    """List all projects with optional filtering"""
+    """List all projects with optional filtering, newest first"""
     
     query = {}
     if status:
         query["status"] = status
     
-    projects = await db.projects.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    total = await db.projects.count_documents(query)
+    try:
+        page = await paginate(db.projects, query, "created_at", limit, skip, cursor, exact_count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
-        "projects": projects,
-        "total": total,
+        "projects": page["items"],
+        "total": page["total"],
+        "total_is_estimate": page["total_is_estimate"],
         "limit": limit,
-        "skip": skip
+        "skip": skip,
+        "next_cursor": page["next_cursor"]
     }
 
 @router.get("/{project_id}")
@@ -117,6 +125,7 @@ async def delete_project(project_id: str):
         raise HTTPException(status_code=404, detail="Project not found")
     
     await db.projects.delete_one({"id": project_id})
+    await db.analysis_sketches.delete_many({"project_id": project_id})
     
     return {"message": "Project deleted successfully", "id": project_id}
 
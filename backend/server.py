@@ -37,7 +37,16 @@ async def lifespan(app: FastAPI):
     ai_module.db = db
     
     print(f"Connected to MongoDB: {DB_NAME}")
+    
+    # Make sure every query the routes issue is index-backed
+    from services.indexes import ensure_indexes, audit_query_plans
+    await ensure_indexes(db)
+    collscans = await audit_query_plans(db)
+    if collscans:
+        print(f"Warning: {len(collscans)} query pattern(s) still plan as COLLSCAN: {', '.join(collscans)}")
     yield
+    from services.column_pool import column_pool
+    column_pool.shutdown()
     db_client.close()
     print("Disconnected from MongoDB")
 
@@ -0,0 +1,212 @@
+import os
+import csv
+import uuid
+from typing import Callable, Iterator, List, Optional
+import numpy as np
+
+from services.columnar import ColumnarTable, build_columnar_chunked
+from services.operations import apply_operation
+from services.sketches import QuantileSketch
+from services.value_counts import load_value_counts
+
+# Tables with at least this many rows are preprocessed a chunk at a time
+CHUNKED_MIN_ROWS = int(os.environ.get("CHUNKED_MIN_ROWS", 1_000_000))
+
+# Rows per chunk; memory is bounded by this rather than the table size
+PREPROCESS_CHUNK_ROWS = int(os.environ.get("PREPROCESS_CHUNK_ROWS", 256 * 1024))
+
+def use_chunked(table: ColumnarTable, chunked: Optional[bool] = None) -> bool:
+    """An explicit choice, or chunked execution for tables of CHUNKED_MIN_ROWS rows and more"""
+    return table.row_count >= CHUNKED_MIN_ROWS if chunked is None else chunked
+
+def chunks(table: ColumnarTable) -> Iterator[slice]:
+    for start in range(0, table.row_count, PREPROCESS_CHUNK_ROWS):
+        yield slice(start, min(start + PREPROCESS_CHUNK_ROWS, table.row_count))
+
+# ==================== CELL TESTS ====================
+
+def parse_float(text: str) -> Optional[float]:
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def numeric_parser(table: ColumnarTable, column: str) -> Callable[[slice], np.ndarray]:
+    """Function from a row chunk to the values of its cells that float() accepts.
+
+    Text cells are parsed once per distinct value; numeric columns without
+    source text render as their values, which float() reads back unchanged.
+    """
+    col = table.column(column)
+    kind = col["kind"]
+    text = table.source_text(column)
+    if text is not None:
+        parsed = [parse_float(v) for v in text["dictionary"]]
+        lookup = np.array([np.nan if v is None else v for v in parsed] + [np.nan])
+        valid = np.array([v is not None for v in parsed] + [False])
+        return lambda rows: lookup[text["codes"][rows]][valid[text["codes"][rows]]]
+    if kind in ("int", "float"):
+        def parse(rows):
+            values = np.asarray(col["values"][rows], dtype=np.float64)
+            return values[~np.isnan(values)]
+        return parse
+    # bool and datetime cells never parse as numbers
+    return lambda rows: np.zeros(0)
+
+def blank_mask(table: ColumnarTable, column: str, rows: slice) -> np.ndarray:
+    """Rows whose rendered cell is empty or whitespace"""
+    col = table.column(column)
+    text = table.source_text(column)
+    if text is not None:
+        lookup = np.array([not v.strip() for v in text["dictionary"]] + [True])
+        return lookup[text["codes"][rows]]
+    values = np.asarray(col["values"][rows])
+    if col["kind"] in ("int", "float"):
+        return np.isnan(values.astype(np.float64))
+    if col["kind"] == "datetime":
+        return values == np.iinfo(np.int64).min
+    return np.zeros(len(values), dtype=bool)
+
+def count_blank_rows(table: ColumnarTable, columns: List[str]) -> int:
+    """Rows with an empty cell in any of columns"""
+    total = 0
+    for rows in chunks(table):
+        blank = np.zeros(rows.stop - rows.start, dtype=bool)
+        for col in columns:
+            blank |= blank_mask(table, col, rows)
+        total += int(blank.sum())
+    return total
+
+# ==================== STREAMING STATISTICS ====================
+
+def column_sketch(table: ColumnarTable, column: str) -> QuantileSketch:
+    parse = numeric_parser(table, column)
+    sketch = QuantileSketch()
+    for rows in chunks(table):
+        sketch.update(parse(rows))
+    return sketch
+
+def column_moments(table: ColumnarTable, column: str) -> tuple:
+    """(count, min, max, mean, population std) of a column's numeric cells, in two passes"""
+    parse = numeric_parser(table, column)
+    count, total = 0, 0.0
+    low, high = np.inf, -np.inf
+    for rows in chunks(table):
+        values = parse(rows)
+        if len(values):
+            count += len(values)
+            total += float(values.sum())
+            low, high = min(low, float(values.min())), max(high, float(values.max()))
+    if not count:
+        return 0, None, None, None, None
+
+    mean = total / count
+    squares = sum(float(((parse(rows) - mean) ** 2).sum()) for rows in chunks(table))
+    return count, low, high, mean, (squares / count) ** 0.5
+
+def sketch_median(sketch: QuantileSketch) -> float:
+    n = sketch.count
+    if n % 2:
+        return sketch.value_at_rank(n // 2)
+    return (sketch.value_at_rank(n // 2 - 1) + sketch.value_at_rank(n // 2)) / 2
+
+# ==================== FITTING ====================
+
+def fit_missing_chunked(table: ColumnarTable, columns: List[str], strategy: str, fill_value: Optional[str] = None) -> dict:
+    """fit_missing over a column store, streaming; medians come from a quantile sketch"""
+    fill_values = {}
+    for col in columns:
+        if strategy == "fill_mean":
+            count, low, high, mean, std = column_moments(table, col)
+            if count:
+                fill_values[col] = mean
+        elif strategy == "fill_median":
+            sketch = column_sketch(table, col)
+            if sketch.count:
+                fill_values[col] = sketch_median(sketch)
+        elif strategy == "fill_mode":
+            # Most frequent non-blank value, ties going to the first to appear
+            value_counts = load_value_counts(table, col)
+            best = None
+            for label, count in zip(value_counts["labels"], value_counts["counts"].tolist()):
+                if label.strip() and (best is None or count > best[1]):
+                    best = (label, count)
+            if best:
+                fill_values[col] = best[0]
+
+    return {
+        "type": "missing_values",
+        "strategy": strategy,
+        "columns": columns,
+        "fill_value": fill_value,
+        "fill_values": [[col, str(val)] for col, val in fill_values.items()]
+    }
+
+def fit_normalization_chunked(table: ColumnarTable, columns: List[str], method: str) -> dict:
+    """fit_normalization over a column store; robust quantiles come from a quantile sketch.
+
+    Raises ValueError for a column without numeric values.
+    """
+    norm_params = {}
+    for col in columns:
+        if method == "robust":
+            sketch = column_sketch(table, col)
+            n = sketch.count
+            if n:
+                q1, q3 = sketch.value_at_rank(n // 4), sketch.value_at_rank(3 * n // 4)
+                iqr = q3 - q1 if q3 > q1 else 1
+                norm_params[col] = {"median": sketch.value_at_rank(n // 2), "iqr": iqr}
+        else:
+            n, low, high, mean, std = column_moments(table, col)
+            if n and method == "minmax":
+                norm_params[col] = {"min": low, "max": high}
+            elif n and method == "zscore":
+                norm_params[col] = {"mean": mean, "std": std if std > 0 else 1}
+        if not n:
+            raise ValueError(f"Column '{col}' has no numeric values")
+
+    return {
+        "type": "normalization",
+        "method": method,
+        "columns": columns,
+        "parameters": [[col, params] for col, params in norm_params.items()]
+    }
+
+def fit_encoding_chunked(table: ColumnarTable, columns: List[str], method: str) -> dict:
+    """fit_encoding from the columns' value counts instead of their rows"""
+    return {
+        "type": "encoding",
+        "method": method,
+        "columns": columns,
+        "categories": [[col, sorted(load_value_counts(table, col)["labels"])] for col in columns]
+    }
+
+# ==================== APPLYING ====================
+
+def replay_chunked(table: ColumnarTable, operations: List[dict], dest_dir: str) -> ColumnarTable:
+    """Apply operations a chunk of rows at a time into an on-disk column store at dest_dir.
+
+    Transformed chunks are appended to a scratch CSV, which is then encoded
+    with build_columnar_chunked; the result reads exactly like the in-memory
+    replay of the same operations.
+    """
+    columns = table.columns
+    for op in operations:
+        _, columns = apply_operation([], columns, op)
+
+    os.makedirs(os.path.dirname(dest_dir), exist_ok=True)
+    spill_path = f"{dest_dir}.{uuid.uuid4().hex}.csv"
+    try:
+        with open(spill_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for rows in chunks(table):
+                records, names = table.records(rows), table.columns
+                for op in operations:
+                    records, names = apply_operation(records, names, op)
+                writer.writerows(records)
+        build_columnar_chunked(spill_path, dest_dir, PREPROCESS_CHUNK_ROWS)
+    finally:
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+    return ColumnarTable.open(dest_dir)
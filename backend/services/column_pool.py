@@ -0,0 +1,146 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, List, Optional
+import numpy as np
+
+from services.columnar import ColumnarTable
+
+# Worker processes for per-column work; 0 or 1 keeps it on a thread in the server process
+COLUMN_WORKERS = int(os.environ.get("COLUMN_WORKERS", os.cpu_count() or 1))
+
+# Columns sent to a worker per task
+COLUMN_BATCH_SIZE = int(os.environ.get("COLUMN_BATCH_SIZE", 32))
+
+# Narrower tables are not worth the round trip to the workers
+PARALLEL_MIN_COLUMNS = int(os.environ.get("PARALLEL_MIN_COLUMNS", 64))
+
+# ==================== SHARED ARRAYS ====================
+
+def share_array(values: np.ndarray, blocks: List[SharedMemory]) -> dict:
+    """Copy an array into a new shared memory block, returning what a worker needs to map it"""
+    values = np.ascontiguousarray(values)
+    block = SharedMemory(create=True, size=max(values.nbytes, 1))
+    blocks.append(block)
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[...] = values
+    return {"block": block.name, "dtype": values.dtype.str, "shape": values.shape}
+
+def attach_array(handle: dict, blocks: List[SharedMemory]) -> np.ndarray:
+    block = SharedMemory(name=handle["block"])
+    blocks.append(block)
+    return np.ndarray(handle["shape"], dtype=np.dtype(handle["dtype"]), buffer=block.buf)
+
+def share_table(table: ColumnarTable, batches: List[List[str]], blocks: List[SharedMemory]) -> List[dict]:
+    """Per batch of columns, a handle workers can open the table from without it being pickled.
+
+    On-disk stores are memory-mapped by each worker, so they already share
+    the page cache; in-memory tables have their arrays copied into shared
+    memory once, and only a batch's own string dictionaries travel with it.
+    """
+    if table.path:
+        return [{"path": table.path} for batch in batches]
+    handles = []
+    for batch in batches:
+        columns = {}
+        for name in batch:
+            col = table.column(name)
+            if col["kind"] == "string":
+                columns[name] = {"kind": "string", "codes": share_array(col["codes"], blocks), "dictionary": col["dictionary"]}
+            else:
+                columns[name] = {"kind": col["kind"], "values": share_array(col["values"], blocks)}
+                if "text" in col:
+                    text = col["text"]
+                    columns[name]["text"] = {"codes": share_array(text["codes"], blocks), "dictionary": text["dictionary"]}
+        handles.append({"schema": table.schema, "columns": columns})
+    return handles
+
+def attach_table(handle: dict, blocks: List[SharedMemory]) -> ColumnarTable:
+    if "path" in handle:
+        return ColumnarTable.open(handle["path"])
+    loaded = {}
+    for name, col in handle["columns"].items():
+        if col["kind"] == "string":
+            loaded[name] = {"kind": "string", "codes": attach_array(col["codes"], blocks), "dictionary": col["dictionary"]}
+        else:
+            loaded[name] = {"kind": col["kind"], "values": attach_array(col["values"], blocks)}
+            if "text" in col:
+                text = col["text"]
+                loaded[name]["text"] = {"codes": attach_array(text["codes"], blocks), "dictionary": text["dictionary"]}
+    return ColumnarTable(handle["schema"], columns=loaded)
+
+def run_batch(func: Callable, handle: dict, names: List[str], rows: Optional[dict]) -> list:
+    """Worker side: func(table, name, rows) for each column of a batch, in order"""
+    blocks: List[SharedMemory] = []
+    try:
+        table = attach_table(handle, blocks)
+        indices = attach_array(rows, blocks) if rows else None
+        results = [func(table, name, indices) for name in names]
+        # Arrays viewing a block must be gone before it can close
+        del table, indices
+        return results
+    finally:
+        for block in blocks:
+            block.close()
+
+# ==================== POOL ====================
+
+class ColumnPool:
+    """Process pool that maps a function over a table's columns.
+
+    func must be a module-level function taking (table, column name, row
+    indices or None). Columns go out in batches of COLUMN_BATCH_SIZE and the
+    results come back in column order whatever order the workers finish in.
+    The caller awaits without blocking the event loop.
+    """
+
+    def __init__(self, workers: int = COLUMN_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers don't inherit the server's threads and locks
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    async def map_columns(self, table: ColumnarTable, func: Callable,
+                          rows: Optional[np.ndarray] = None, columns: Optional[List[str]] = None) -> list:
+        names = list(columns) if columns is not None else table.columns
+        if self.workers <= 1 or len(names) < PARALLEL_MIN_COLUMNS:
+            return await asyncio.to_thread(lambda: [func(table, name, rows) for name in names])
+
+        batches = [names[i:i + COLUMN_BATCH_SIZE] for i in range(0, len(names), COLUMN_BATCH_SIZE)]
+        blocks: List[SharedMemory] = []
+        try:
+            handles = await asyncio.to_thread(share_table, table, batches, blocks)
+            shared_rows = share_array(rows, blocks) if rows is not None else None
+            executor = self.executor()
+            loop = asyncio.get_running_loop()
+            try:
+                results = await asyncio.gather(*[
+                    loop.run_in_executor(executor, run_batch, func, handle, batch, shared_rows)
+                    for handle, batch in zip(handles, batches)
+                ])
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory); start fresh next time
+                self.shutdown()
+                raise
+            return [result for batch in results for result in batch]
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+column_pool = ColumnPool()
@@ -0,0 +1,494 @@
+import os
+import json
+import shutil
+import uuid
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+# Typed column store written once per upload: one .npy array per column,
+# memory-mapped on read so callers only page in the columns they touch.
+COLUMNAR_FORMAT = "npy-columns/2"
+SCHEMA_FILE = "schema.json"
+
+# Extensions that can be converted into the column store
+COLUMNAR_EXTENSIONS = {".csv", ".json", ".xlsx", ".parquet"}
+
+# Tokens pandas.read_csv treats as missing by default
+NA_TOKENS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"
+}
+
+# ==================== PARSING ====================
+
+def read_source_frame(file_path: str, ext: str) -> pd.DataFrame:
+    """Parse a raw tabular upload.
+
+    CSV cells are kept as the exact strings in the file so the encoder can
+    decide column types itself; other formats keep the types their reader
+    infers. Excel and Parquet need the optional openpyxl / pyarrow packages.
+    """
+    if ext == ".csv":
+        return pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    elif ext == ".json":
+        return pd.read_json(file_path)
+    elif ext == ".xlsx":
+        return pd.read_excel(file_path)
+    elif ext == ".parquet":
+        return pd.read_parquet(file_path)
+    raise ValueError(f"Unsupported tabular file type: {ext}")
+
+# ==================== ENCODING ====================
+
+def encode_dictionary(values: List[str]) -> tuple:
+    """Pack a list of strings into (offsets, utf-8 bytes)"""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return offsets, b"".join(encoded)
+
+def decode_dictionary(offsets: np.ndarray, blob: bytes) -> List[str]:
+    """Inverse of encode_dictionary"""
+    bounds = offsets.tolist()
+    return [blob[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+def number_text(value: float, is_int: bool) -> str:
+    """How a cell of an int or float column renders when no source text is kept"""
+    return str(int(value)) if is_int else repr(float(value))
+
+def renders_exactly(dictionary: List[str], numbers: np.ndarray, is_null: np.ndarray, is_int: bool) -> bool:
+    """Whether every distinct text reads back unchanged from its number (missing ones as "")"""
+    for text, number, null in zip(dictionary, numbers.tolist(), is_null.tolist()):
+        if text != ("" if null else number_text(number, is_int)):
+            return False
+    return True
+
+def encode_column(series: pd.Series) -> dict:
+    """Encode one column as a typed array.
+
+    Returns a dict with the column's kind plus either "values" (numeric,
+    bool and datetime kinds) or "codes" and "dictionary" (string kind).
+    Integer columns with missing values are stored as float64 with NaN.
+    Text promoted to numbers also keeps "text" ({"codes", "dictionary"})
+    unless every cell renders back exactly, so "007", "1.50" or "NA" are
+    shown and exported as uploaded.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return {"kind": "bool", "values": series.to_numpy(dtype=np.uint8)}
+
+    if pd.api.types.is_datetime64_any_dtype(series):
+        if getattr(series.dt, "tz", None) is not None:
+            series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+        return {"kind": "datetime", "values": series.to_numpy(dtype="datetime64[ns]").view(np.int64)}
+
+    if pd.api.types.is_integer_dtype(series) and not series.isna().any():
+        return {"kind": "int", "values": series.to_numpy(dtype=np.int64)}
+
+    if pd.api.types.is_numeric_dtype(series):
+        return {"kind": "float", "values": series.to_numpy(dtype=np.float64, na_value=np.nan)}
+
+    # Text (every CSV column arrives here): promote to numeric when all
+    # non-missing cells parse as numbers, deciding once per distinct text
+    text = series.where(series.isna(), series.astype(str))
+    codes, uniques = pd.factorize(text, use_na_sentinel=True)
+    codes = codes.astype(np.int32)
+    dictionary = [str(u) for u in uniques]
+    # One extra slot for code -1, a cell that was already missing
+    is_null = np.array([v in NA_TOKENS for v in dictionary] + [True])
+    present = pd.Series([v for v in dictionary if v not in NA_TOKENS], dtype=object)
+    if len(present) > 0:
+        numeric = pd.to_numeric(present, errors="coerce")
+        if numeric.notna().all():
+            is_int = present.str.fullmatch(r"[+-]?\d+").all() and numeric.abs().max() < 2 ** 53
+            numbers = np.full(len(dictionary) + 1, np.nan)
+            numbers[np.flatnonzero(~is_null)] = numeric.to_numpy(dtype=np.float64)
+            values = numbers[codes]
+            if is_int and not is_null[codes].any():
+                encoded = {"kind": "int", "values": values.astype(np.int64)}
+            else:
+                encoded = {"kind": "int" if is_int else "float", "values": values}
+            if not renders_exactly(dictionary, numbers, is_null, is_int):
+                encoded["text"] = {"codes": codes, "dictionary": dictionary}
+            return encoded
+
+    return {"kind": "string", "codes": codes, "dictionary": dictionary}
+
+def save_dictionary(prefix: str, codes: Optional[np.ndarray], dictionary: List[str]) -> None:
+    """Write {prefix}.npy (codes, unless already written), {prefix}.dict.npy and {prefix}.dict.bin"""
+    if codes is not None:
+        np.save(f"{prefix}.npy", codes)
+    offsets, blob = encode_dictionary(dictionary)
+    np.save(f"{prefix}.dict.npy", offsets)
+    with open(f"{prefix}.dict.bin", "wb") as f:
+        f.write(blob)
+
+def load_dictionary(prefix: str) -> dict:
+    offsets = np.load(f"{prefix}.dict.npy")
+    with open(f"{prefix}.dict.bin", "rb") as f:
+        dictionary = decode_dictionary(offsets, f.read())
+    return {"codes": np.load(f"{prefix}.npy", mmap_mode="r"), "dictionary": dictionary}
+
+def store_format(dest_dir: str) -> Optional[str]:
+    schema_path = os.path.join(dest_dir, SCHEMA_FILE)
+    if not os.path.exists(schema_path):
+        return None
+    with open(schema_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("format")
+
+def publish_store(tmp_dir: str, dest_dir: str) -> None:
+    """Move a finished store into place, replacing one written in an older format"""
+    try:
+        os.rename(tmp_dir, dest_dir)
+        return
+    except OSError:
+        pass
+    if store_format(dest_dir) == COLUMNAR_FORMAT:
+        # Another build of the same content won the race
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+    # Readers holding the old arrays memory-mapped keep them until they close
+    stale_dir = f"{dest_dir}.stale-{uuid.uuid4().hex}"
+    os.rename(dest_dir, stale_dir)
+    os.rename(tmp_dir, dest_dir)
+    shutil.rmtree(stale_dir, ignore_errors=True)
+
+def build_columnar(file_path: str, ext: str, dest_dir: str) -> dict:
+    """Parse a tabular file once and write it as a column store in dest_dir.
+
+    The store is written to a scratch directory and moved into place, so a
+    concurrent build of the same content never exposes a partial store. If
+    dest_dir already holds a store in the current format it is reused as is.
+    """
+    schema_path = os.path.join(dest_dir, SCHEMA_FILE)
+    if store_format(dest_dir) == COLUMNAR_FORMAT:
+        with open(schema_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    df = read_source_frame(file_path, ext)
+
+    tmp_dir = f"{dest_dir}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_dir)
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            encoded = encode_column(df[name])
+            entry = {"name": str(name), "kind": encoded["kind"], "file": f"c{i}"}
+            prefix = os.path.join(tmp_dir, f"c{i}")
+            if encoded["kind"] == "string":
+                save_dictionary(prefix, encoded["codes"], encoded["dictionary"])
+                entry["dtype"] = "int32"
+                entry["cardinality"] = len(encoded["dictionary"])
+            else:
+                np.save(f"{prefix}.npy", encoded["values"])
+                entry["dtype"] = str(encoded["values"].dtype)
+                if "text" in encoded:
+                    save_dictionary(f"{prefix}.text", encoded["text"]["codes"], encoded["text"]["dictionary"])
+                    entry["text"] = True
+            columns.append(entry)
+
+        schema = {"format": COLUMNAR_FORMAT, "row_count": len(df), "columns": columns}
+        with open(os.path.join(tmp_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+            json.dump(schema, f)
+
+        publish_store(tmp_dir, dest_dir)
+        return schema
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def scan_text_chunk(series: pd.Series, stats: dict) -> None:
+    """Fold one chunk of a text column into the facts encode_column decides its kind from"""
+    texts = pd.unique(series)
+    is_null = np.array([v in NA_TOKENS for v in texts], dtype=bool)
+    present = pd.Series(texts[~is_null], dtype=object)
+    stats["has_null"] = stats["has_null"] or bool(is_null.any())
+    stats["blank_nulls"] = stats["blank_nulls"] and all(v == "" for v in texts[is_null])
+    stats["present"] += int((~series.isin(NA_TOKENS)).sum())
+    if len(present) and stats["numeric"]:
+        numeric = pd.to_numeric(present, errors="coerce")
+        stats["numeric"] = bool(numeric.notna().all())
+        if stats["numeric"]:
+            stats["int"] = stats["int"] and bool(present.str.fullmatch(r"[+-]?\d+").all())
+            stats["max_abs"] = max(stats["max_abs"], float(numeric.abs().max()))
+            # Whether the texts render back exactly, for either kind the column may end up as
+            numbers = numeric.to_numpy(dtype=np.float64)
+            no_nulls = np.zeros(len(numbers), dtype=bool)
+            if stats["int_exact"]:
+                stats["int_exact"] = stats["int"] and renders_exactly(present.tolist(), numbers, no_nulls, True)
+            if stats["float_exact"]:
+                stats["float_exact"] = renders_exactly(present.tolist(), numbers, no_nulls, False)
+
+def chunked_kind(stats: dict) -> tuple:
+    """(kind, dtype, whether source text is kept) encode_column would give a whole text column with these facts"""
+    if not stats["present"] or not stats["numeric"]:
+        return "string", "int32", False
+    is_int = stats["int"] and stats["max_abs"] < 2 ** 53
+    exact = stats["blank_nulls"] and (stats["int_exact"] if is_int else stats["float_exact"])
+    if is_int and not stats["has_null"]:
+        return "int", "int64", not exact
+    return "int" if is_int else "float", "float64", not exact
+
+def build_columnar_chunked(csv_path: str, dest_dir: str, chunk_rows: int = 256 * 1024) -> dict:
+    """Like build_columnar for a CSV file, reading it a chunk of rows at a time.
+
+    A first pass settles each column's kind and the row count, a second
+    writes the arrays through memory maps, so memory is bounded by one
+    chunk plus the string dictionaries. The result is identical to
+    build_columnar's.
+    """
+    schema_path = os.path.join(dest_dir, SCHEMA_FILE)
+    if store_format(dest_dir) == COLUMNAR_FORMAT:
+        with open(schema_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    read = lambda: pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+    names = list(pd.read_csv(csv_path, dtype=str, keep_default_na=False, nrows=0).columns)
+    stats = [
+        {"has_null": False, "blank_nulls": True, "present": 0, "numeric": True, "int": True, "max_abs": 0.0,
+         "int_exact": True, "float_exact": True}
+        for _ in names
+    ]
+    row_count = 0
+    for chunk in read():
+        row_count += len(chunk)
+        for i in range(len(names)):
+            scan_text_chunk(chunk.iloc[:, i], stats[i])
+
+    tmp_dir = f"{dest_dir}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_dir)
+    try:
+        columns = []
+        arrays = []
+        # Per column, where its text codes go (a string column's own codes) and its dictionary
+        text_arrays = []
+        dictionaries = []
+        for i, name in enumerate(names):
+            kind, dtype, text = chunked_kind(stats[i])
+            columns.append({"name": str(name), "kind": kind, "file": f"c{i}", "dtype": dtype})
+            arrays.append(np.lib.format.open_memmap(os.path.join(tmp_dir, f"c{i}.npy"), mode="w+",
+                                                    dtype=dtype, shape=(row_count,)))
+            if kind == "string":
+                text_arrays.append(arrays[i])
+            elif text:
+                columns[i]["text"] = True
+                text_arrays.append(np.lib.format.open_memmap(os.path.join(tmp_dir, f"c{i}.text.npy"), mode="w+",
+                                                             dtype=np.int32, shape=(row_count,)))
+            else:
+                text_arrays.append(None)
+            dictionaries.append({} if text_arrays[i] is not None else None)
+
+        start = 0
+        for chunk in read():
+            end = start + len(chunk)
+            for i, dictionary in enumerate(dictionaries):
+                series = chunk.iloc[:, i]
+                if columns[i]["kind"] != "string":
+                    values = np.full(len(series), np.nan)
+                    present = (~series.isin(NA_TOKENS)).to_numpy()
+                    values[present] = pd.to_numeric(series[present]).to_numpy(dtype=np.float64)
+                    arrays[i][start:end] = values.astype(arrays[i].dtype)
+                if dictionary is not None:
+                    codes, uniques = pd.factorize(series)
+                    mapping = np.array([dictionary.setdefault(u, len(dictionary)) for u in uniques], dtype=np.int32)
+                    text_arrays[i][start:end] = mapping[codes] if len(codes) else codes
+            start = end
+
+        for i, dictionary in enumerate(dictionaries):
+            arrays[i].flush()
+            if dictionary is not None:
+                text_arrays[i].flush()
+                if columns[i]["kind"] == "string":
+                    save_dictionary(os.path.join(tmp_dir, f"c{i}"), None, list(dictionary))
+                    columns[i]["cardinality"] = len(dictionary)
+                else:
+                    save_dictionary(os.path.join(tmp_dir, f"c{i}.text"), None, list(dictionary))
+        del arrays, text_arrays
+
+        schema = {"format": COLUMNAR_FORMAT, "row_count": row_count, "columns": columns}
+        with open(os.path.join(tmp_dir, SCHEMA_FILE), "w", encoding="utf-8") as f:
+            json.dump(schema, f)
+
+        publish_store(tmp_dir, dest_dir)
+        return schema
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+# ==================== READING ====================
+
+class ColumnarTable:
+    """Read access to a column store, either on disk or built in memory.
+
+    Columns are loaded lazily and cached on the instance; on-disk arrays are
+    memory-mapped. String accessors reproduce csv.DictReader semantics
+    (missing cells read as ""), while to_frame(typed=True) matches what
+    pandas.read_csv would infer.
+    """
+
+    def __init__(self, schema: dict, path: Optional[str] = None, columns: Optional[Dict[str, dict]] = None):
+        self.schema = schema
+        self.path = path
+        self.row_count = schema["row_count"]
+        self.columns = [c["name"] for c in schema["columns"]]
+        self._meta = {c["name"]: c for c in schema["columns"]}
+        self._loaded = dict(columns or {})
+        self._sizes: Dict[str, int] = {}
+        # Structures other services derive from the columns, e.g. histogram bases
+        self.derived: Dict[tuple, object] = {}
+
+    @classmethod
+    def open(cls, path: str) -> "ColumnarTable":
+        with open(os.path.join(path, SCHEMA_FILE), "r", encoding="utf-8") as f:
+            schema = json.load(f)
+        return cls(schema, path=path)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ColumnarTable":
+        """Encode a parsed frame in memory, for files without a column store yet"""
+        loaded = {}
+        schema_columns = []
+        for name in df.columns:
+            encoded = encode_column(df[name])
+            loaded[str(name)] = encoded
+            schema_columns.append({"name": str(name), "kind": encoded["kind"]})
+            if "text" in encoded:
+                schema_columns[-1]["text"] = True
+        return cls({"format": COLUMNAR_FORMAT, "row_count": len(df), "columns": schema_columns}, columns=loaded)
+
+    def kind(self, name: str) -> str:
+        return self._meta[name]["kind"]
+
+    def sidecar_path(self, name: str, suffix: str) -> Optional[str]:
+        """Where to persist a structure derived from a column, or None for in-memory tables"""
+        if not self.path:
+            return None
+        return os.path.join(self.path, self._meta[name]["file"] + suffix)
+
+    def column(self, name: str) -> dict:
+        """Raw encoded column: {"kind", "values"} (plus "text" if kept) or {"kind", "codes", "dictionary"}"""
+        if name not in self._loaded:
+            meta = self._meta[name]
+            base = os.path.join(self.path, meta["file"])
+            if meta["kind"] == "string":
+                self._loaded[name] = {"kind": "string", **load_dictionary(base)}
+            else:
+                self._loaded[name] = {"kind": meta["kind"], "values": np.load(f"{base}.npy", mmap_mode="r")}
+                if meta.get("text"):
+                    self._loaded[name]["text"] = load_dictionary(f"{base}.text")
+        return self._loaded[name]
+
+    def source_text(self, name: str) -> Optional[dict]:
+        """{"codes", "dictionary"} of a column's cells as uploaded (code -1 for a missing cell).
+
+        None for columns whose values render back to their source text
+        exactly, where strings() is the source text.
+        """
+        col = self.column(name)
+        if col["kind"] == "string":
+            return {"codes": col["codes"], "dictionary": col["dictionary"]}
+        return col.get("text")
+
+    def memory_usage(self) -> int:
+        """Approximate heap bytes held by the columns loaded so far.
+
+        Memory-mapped arrays are left out; the OS page cache owns those pages.
+        """
+        for name, col in self._loaded.items():
+            if name not in self._sizes:
+                text = col.get("text") or {}
+                arrays = [col.get("values"), col.get("codes"), text.get("codes")]
+                size = sum(a.nbytes for a in arrays if a is not None and not isinstance(a, np.memmap))
+                # str objects carry ~50 bytes of header on top of their characters
+                size += sum(len(v) + 50 for v in col.get("dictionary", text.get("dictionary", ())))
+                self._sizes[name] = size
+        derived = sum(
+            v.nbytes for d in self.derived.values() if isinstance(d, dict)
+            for v in d.values() if isinstance(v, np.ndarray)
+        )
+        return sum(self._sizes.values()) + derived
+
+    def numeric(self, name: str, indices=None) -> np.ndarray:
+        """Column (or the rows at indices, e.g. a slice) as float64, NaN wherever a cell is missing or not a number"""
+        col = self.column(name)
+        if col["kind"] == "string":
+            lookup = pd.to_numeric(pd.Series(col["dictionary"] + [""], dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+            return lookup[col["codes"] if indices is None else col["codes"][indices]]
+        values = np.asarray(col["values"] if indices is None else col["values"][indices])
+        if col["kind"] == "datetime":
+            return np.where(values == np.iinfo(np.int64).min, np.nan, values.astype(np.float64))
+        return np.asarray(values, dtype=np.float64)
+
+    def strings(self, name: str, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Column rendered as an object array of strings: the uploaded text where it was text, "" for missing cells"""
+        col = self.column(name)
+        text = self.source_text(name)
+        if text is not None:
+            lookup = np.array(text["dictionary"] + [""], dtype=object)
+            codes = text["codes"] if indices is None else text["codes"][indices]
+            return lookup[codes]
+
+        values = col["values"] if indices is None else col["values"][indices]
+        values = np.asarray(values)
+        if col["kind"] in ("int", "float"):
+            is_int = col["kind"] == "int"
+            return np.array(["" if v != v else number_text(v, is_int) for v in values.tolist()], dtype=object)
+        if col["kind"] == "bool":
+            return np.array(["True" if v else "False" for v in values.tolist()], dtype=object)
+        rendered = pd.Series(values.view("datetime64[ns]")).astype(str).to_numpy(dtype=object)
+        rendered[rendered == "NaT"] = ""
+        return rendered
+
+    def typed(self, name: str, indices=None) -> pd.Series:
+        """Column (or the rows at indices) with the dtype pandas.read_csv would give it"""
+        col = self.column(name)
+        if col["kind"] == "string":
+            lookup = np.array(
+                [np.nan if v in NA_TOKENS else v for v in col["dictionary"]] + [np.nan],
+                dtype=object
+            )
+            return pd.Series(lookup[col["codes"] if indices is None else col["codes"][indices]], name=name)
+        values = np.asarray(col["values"] if indices is None else col["values"][indices])
+        if col["kind"] == "bool":
+            return pd.Series(values.astype(bool), name=name)
+        if col["kind"] == "datetime":
+            return pd.Series(values.view("datetime64[ns]"), name=name)
+        return pd.Series(values, name=name)
+
+    def to_frame(self, columns: Optional[Iterable[str]] = None, typed: bool = True, indices=None) -> pd.DataFrame:
+        """Materialize the requested columns (all by default), or just the rows at indices, as a DataFrame"""
+        names = list(columns) if columns is not None else self.columns
+        if typed:
+            data = {name: self.typed(name, indices) for name in names}
+        else:
+            data = {name: self.strings(name, indices) for name in names}
+        return pd.DataFrame(data, columns=names)
+
+    def records(self, indices: Optional[np.ndarray] = None, columns: Optional[Iterable[str]] = None) -> List[dict]:
+        """Rows as dicts of strings, like csv.DictReader, for the given row indices"""
+        names = list(columns) if columns is not None else self.columns
+        rendered = [self.strings(name, indices).tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*rendered)]
+
+# ==================== DATASET ACCESS ====================
+
+def columnar_ready(dataset: dict) -> bool:
+    columnar = dataset.get("columnar") or {}
+    return columnar.get("status") == "ready" and os.path.exists(os.path.join(columnar.get("path", ""), SCHEMA_FILE))
+
+def open_table(dataset: dict) -> ColumnarTable:
+    """Open a dataset's column store, parsing the raw file if it has none yet.
+
+    Stores written in an older format are rebuilt in place from the raw file.
+    """
+    if columnar_ready(dataset):
+        path = dataset["columnar"]["path"]
+        if store_format(path) != COLUMNAR_FORMAT:
+            build_columnar(dataset["file_path"], dataset["type"], path)
+        return ColumnarTable.open(path)
+    return ColumnarTable.from_frame(read_source_frame(dataset["file_path"], dataset["type"]))
+
+def load_dataframe(dataset: dict, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Typed DataFrame for a dataset, reading only the requested columns from the store"""
+    return open_table(dataset).to_frame(columns)
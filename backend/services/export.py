@@ -0,0 +1,150 @@
+import os
+import csv
+import json
+import textwrap
+from io import StringIO
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+
+from services.columnar import ColumnarTable
+
+# Rows rendered per chunk of a streamed export
+EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 10000))
+
+# Rows per Parquet row group, each sent as soon as it is encoded
+PARQUET_ROW_GROUP_ROWS = int(os.environ.get("PARQUET_ROW_GROUP_ROWS", 128 * 1024))
+
+EXPORT_FORMATS = ["csv", "json", "ndjson", "parquet"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# ==================== ROW CHUNKS ====================
+
+def row_chunks(table: ColumnarTable, indices: Optional[np.ndarray] = None, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator:
+    """Row selectors covering the table (or just indices) a chunk at a time"""
+    total = table.row_count if indices is None else len(indices)
+    for start in range(0, total, chunk_rows):
+        end = min(start + chunk_rows, total)
+        yield slice(start, end) if indices is None else indices[start:end]
+
+# ==================== TEXT FORMATS ====================
+
+def iter_csv(table: ColumnarTable, indices: Optional[np.ndarray] = None) -> Iterator[str]:
+    """CSV text as csv.DictWriter writes it, header first, with cells as uploaded"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table.columns)
+    for rows in row_chunks(table, indices):
+        writer.writerows(zip(*[table.strings(name, rows).tolist() for name in table.columns]))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def iter_json(table: ColumnarTable, indices: Optional[np.ndarray] = None) -> Iterator[str]:
+    """A JSON array of row objects, formatted exactly like json.dumps(rows, indent=2)"""
+    first = True
+    for rows in row_chunks(table, indices):
+        parts = []
+        for record in table.records(rows):
+            parts.append(("[\n" if first else ",\n") + textwrap.indent(json.dumps(record, indent=2), "  "))
+            first = False
+        yield "".join(parts)
+    yield "[]" if first else "\n]"
+
+def iter_ndjson(table: ColumnarTable, indices: Optional[np.ndarray] = None) -> Iterator[str]:
+    """One JSON object per line"""
+    for rows in row_chunks(table, indices):
+        yield "".join(json.dumps(record) + "\n" for record in table.records(rows))
+
+# ==================== PARQUET ====================
+
+class ChunkSink:
+    """Write-only file object that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def arrow_schema(table: ColumnarTable):
+    """Arrow types matching the columns' typed pandas dtypes"""
+    import pyarrow as pa
+
+    fields = []
+    for name in table.columns:
+        kind = table.kind(name)
+        if kind == "string":
+            arrow_type = pa.string()
+        elif kind == "bool":
+            arrow_type = pa.bool_()
+        elif kind == "datetime":
+            arrow_type = pa.timestamp("ns")
+        elif kind == "int" and table.column(name)["values"].dtype.kind == "i":
+            arrow_type = pa.int64()
+        else:
+            # Integer columns with missing cells are stored as floats
+            arrow_type = pa.float64()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+def iter_parquet(table: ColumnarTable, indices: Optional[np.ndarray] = None) -> Iterator[bytes]:
+    """A Parquet file with the columns' types, one row group at a time.
+
+    Unlike the text formats, which write cells as uploaded, Parquet holds
+    the typed values: "007" and "1.50" are written as 7 and 1.5.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema(table)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in row_chunks(table, indices, PARQUET_ROW_GROUP_ROWS):
+            frame = pd.DataFrame({name: table.typed(name, rows) for name in table.columns}, columns=table.columns)
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+# ==================== DISPATCH ====================
+
+def export_chunks(table: ColumnarTable, format: str, indices: Optional[np.ndarray] = None) -> Iterator:
+    """Chunks of a table (or of the rows at indices) in an export format.
+
+    Parquet needs the optional pyarrow package; without it this raises
+    ImportError here, before any part of a response has been sent.
+    """
+    if format == "parquet":
+        import pyarrow.parquet  # noqa: F401
+        return iter_parquet(table, indices)
+    return {"csv": iter_csv, "json": iter_json, "ndjson": iter_ndjson}[format](table, indices)
@@ -0,0 +1,190 @@
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+
+from services.columnar import ColumnarTable
+
+LOGICAL_OPERATORS = {"and", "or", "not"}
+
+NUMERIC_OPERATORS = {"eq", "ne", "gt", "lt", "gte", "lte"}
+
+# ==================== SCALAR SEMANTICS ====================
+
+def parse_number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+def match_cell(cell: str, operator: str, value: str) -> bool:
+    """Whether one rendered cell satisfies a comparison.
+
+    This is the endpoint's long-standing rule: when both the cell and the
+    operand parse as numbers (an empty cell counting as a missing number)
+    the comparison is numeric and the text operators never match; otherwise
+    it is a case-insensitive string comparison where ordering operators
+    never match.
+    """
+    val_num = parse_number(value)
+    cell_num = parse_number(cell) if cell else None
+    if val_num is not None and (not cell or cell_num is not None):
+        if operator == "eq":
+            return cell_num == val_num
+        if operator == "ne":
+            return cell_num != val_num
+        if cell_num is None:
+            return False
+        if operator == "gt":
+            return cell_num > val_num
+        if operator == "lt":
+            return cell_num < val_num
+        if operator == "gte":
+            return cell_num >= val_num
+        if operator == "lte":
+            return cell_num <= val_num
+        return False
+
+    cell_str = str(cell).lower()
+    val_str = str(value).lower()
+    if operator == "eq":
+        return cell_str == val_str
+    if operator == "ne":
+        return cell_str != val_str
+    if operator == "contains":
+        return val_str in cell_str
+    if operator == "startswith":
+        return cell_str.startswith(val_str)
+    if operator == "endswith":
+        return cell_str.endswith(val_str)
+    return False
+
+# ==================== COLUMN MASKS ====================
+
+def column_codes(table: ColumnarTable, column: str) -> tuple:
+    """(codes, distinct rendered values) so a predicate runs once per distinct cell"""
+    text = table.source_text(column)
+    if text is not None:
+        # Missing cells (code -1) index the trailing "" entry
+        return np.asarray(text["codes"]), text["dictionary"] + [""]
+    codes, uniques = pd.factorize(table.strings(column))
+    return codes, list(uniques)
+
+def numeric_mask(values: np.ndarray, operator: str, operand: float) -> np.ndarray:
+    """Numeric comparison over a typed column, NaN standing in for an empty cell"""
+    with np.errstate(invalid="ignore"):
+        if operator == "eq":
+            return values == operand
+        if operator == "ne":
+            return values != operand
+        if operator == "gt":
+            return values > operand
+        if operator == "lt":
+            return values < operand
+        if operator == "gte":
+            return values >= operand
+        return values <= operand
+
+def comparison_mask(table: ColumnarTable, column: str, operator: str, value: str) -> np.ndarray:
+    kind = table.kind(column)
+    operand = parse_number(value)
+
+    # Every cell of an int/float column is a number or empty, so the
+    # numeric branch applies to all of them at once
+    if kind in ("int", "float") and operand is not None:
+        if operator not in NUMERIC_OPERATORS:
+            return np.zeros(table.row_count, dtype=bool)
+        return numeric_mask(np.asarray(table.column(column)["values"], dtype=np.float64), operator, operand)
+
+    codes, uniques = column_codes(table, column)
+    lookup = np.fromiter((match_cell(u, operator, value) for u in uniques), dtype=bool, count=len(uniques))
+    return lookup[codes]
+
+def null_mask(table: ColumnarTable, column: str) -> np.ndarray:
+    codes, uniques = column_codes(table, column)
+    lookup = np.fromiter((not u.strip() for u in uniques), dtype=bool, count=len(uniques))
+    return lookup[codes]
+
+# ==================== COMPILATION ====================
+
+Mask = Callable[[], np.ndarray]
+
+def compile_condition(table: ColumnarTable, node: dict) -> Mask:
+    column = node.get("column")
+    operator = node.get("operator")
+    if column not in table.columns:
+        raise ValueError(f"Column '{column}' not found")
+
+    if operator == "isnull":
+        return lambda: null_mask(table, column)
+    if operator == "notnull":
+        return lambda: ~null_mask(table, column)
+
+    if operator in ("in", "between"):
+        values = node.get("values")
+        if values is None:
+            raise ValueError(f"Operator '{operator}' needs a 'values' list")
+        values = [str(v) for v in values]
+        if operator == "between":
+            if len(values) != 2:
+                raise ValueError("Operator 'between' needs exactly two values")
+            low, high = values
+            return lambda: comparison_mask(table, column, "gte", low) & comparison_mask(table, column, "lte", high)
+        return lambda: any_mask([comparison_mask(table, column, "eq", v) for v in values], table.row_count)
+
+    value = node.get("value")
+    if value is None:
+        raise ValueError(f"Operator '{operator}' needs a value")
+    # Unknown operators keep matching nothing, as they always have
+    return lambda: comparison_mask(table, column, operator, str(value))
+
+def any_mask(masks: List[np.ndarray], row_count: int) -> np.ndarray:
+    result = np.zeros(row_count, dtype=bool)
+    for mask in masks:
+        result |= mask
+    return result
+
+def compile_filter(table: ColumnarTable, node) -> Mask:
+    """Compile a filter tree into a function returning a boolean row mask.
+
+    A node is either a condition {"column", "operator", "value" | "values"}
+    or a group {"op": "and" | "or" | "not", "filters": [...]}; a bare list
+    is an "and" group. Columns and arities are checked here, raising
+    ValueError, before any data is touched.
+    """
+    if isinstance(node, list):
+        node = {"op": "and", "filters": node}
+    if not isinstance(node, dict):
+        raise ValueError("Malformed filter")
+
+    op = node.get("op")
+    if op is None:
+        return compile_condition(table, node)
+    if op not in LOGICAL_OPERATORS:
+        raise ValueError(f"Unknown logical operator '{op}'")
+
+    children = [compile_filter(table, child) for child in node.get("filters") or []]
+    if op == "not":
+        if len(children) != 1:
+            raise ValueError("'not' takes exactly one filter")
+        child = children[0]
+        return lambda: ~child()
+
+    def evaluate() -> np.ndarray:
+        result = np.full(table.row_count, op == "and")
+        for child in children:
+            # Stop early once the outcome can no longer change
+            if op == "and":
+                result &= child()
+                if not result.any():
+                    break
+            else:
+                result |= child()
+                if result.all():
+                    break
+        return result
+
+    return evaluate
+
+def filter_indices(table: ColumnarTable, node) -> np.ndarray:
+    """Row indices matching a filter tree, in file order"""
+    return np.flatnonzero(compile_filter(table, node)())
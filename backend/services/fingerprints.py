@@ -0,0 +1,220 @@
+import os
+import uuid
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+from services.columnar import NA_TOKENS, ColumnarTable
+
+FINGERPRINT_FILE = "row_fingerprints.npy"
+
+# Rows hashed per step while building fingerprints
+FINGERPRINT_CHUNK_ROWS = int(os.environ.get("FINGERPRINT_CHUNK_ROWS", 1024 * 1024))
+
+# Hash every missing cell gets, whatever the column's kind
+MISSING_HASH = pd.util.hash_array(np.array([np.nan]))[0]
+
+# ==================== CELL KEYS ====================
+
+def cell_hasher(table: ColumnarTable, name: str):
+    """Function from row indices to a 64-bit hash of each cell's typed value.
+
+    Hashes depend on content only (text for string columns, the number for
+    numeric ones), never on a store's dictionary codes, so fingerprints of
+    two versions of a dataset can be compared.
+    """
+    col = table.column(name)
+    kind = col["kind"]
+    if kind == "string":
+        hashes = pd.util.hash_array(np.array(col["dictionary"], dtype=object), categorize=False)
+        lookup = np.append(hashes, MISSING_HASH)
+        lookup[[i for i, v in enumerate(col["dictionary"]) if v in NA_TOKENS]] = MISSING_HASH
+        return lambda rows: lookup[col["codes"][rows]]
+
+    def hash_values(rows):
+        values = np.asarray(col["values"][rows])
+        if kind == "datetime":
+            hashes = pd.util.hash_array(values.astype(np.int64))
+            missing = values == np.iinfo(np.int64).min
+        else:
+            # -0.0 and 0.0 are the same value to pandas, as are all NaNs
+            numbers = values.astype(np.float64) + 0.0
+            missing = np.isnan(numbers)
+            hashes = pd.util.hash_array(np.where(missing, 0.0, numbers))
+        return np.where(missing, MISSING_HASH, hashes)
+    return hash_values
+
+def cell_keys(table: ColumnarTable, name: str, rows: np.ndarray) -> np.ndarray:
+    """Exact int64 key per cell, equal exactly when DataFrame.duplicated would call the cells equal"""
+    col = table.column(name)
+    if col["kind"] == "string":
+        missing = np.array([v in NA_TOKENS for v in col["dictionary"]] + [True])
+        codes = np.asarray(col["codes"][rows]).astype(np.int64)
+        return np.where(missing[codes], -1, codes)
+    values = np.asarray(col["values"][rows])
+    if values.dtype.kind == "f":
+        return np.where(np.isnan(values), np.nan, values + 0.0).view(np.int64)
+    return values.astype(np.int64)
+
+def cell_values(table: ColumnarTable, name: str, rows: np.ndarray) -> tuple:
+    """(family, missing mask, values) of cells, comparable across tables the way cell_hasher hashes them"""
+    col = table.column(name)
+    kind = col["kind"]
+    if kind == "string":
+        codes = np.asarray(col["codes"][rows])
+        lookup = np.array(col["dictionary"] + [""], dtype=object)
+        missing = np.array([v in NA_TOKENS for v in col["dictionary"]] + [True])
+        return "text", missing[codes], lookup[codes]
+    values = np.asarray(col["values"][rows])
+    if kind == "datetime":
+        return "datetime", values == np.iinfo(np.int64).min, values
+    numbers = values.astype(np.float64) + 0.0
+    return "number", np.isnan(numbers), numbers
+
+def same_rows(table: ColumnarTable, rows: np.ndarray, other: ColumnarTable, other_rows: np.ndarray) -> np.ndarray:
+    """Whether each row of table equals the paired row of other in every cell, like DataFrame.duplicated"""
+    same = np.ones(len(rows), dtype=bool)
+    for name in table.columns:
+        family, missing, values = cell_values(table, name, rows)
+        other_family, other_missing, other_values = cell_values(other, name, other_rows)
+        equal = missing & other_missing
+        if family == other_family:
+            equal |= ~missing & ~other_missing & (values == other_values)
+        same &= equal
+    return same
+
+# ==================== FINGERPRINTS ====================
+
+def compute_fingerprints(table: ColumnarTable) -> np.ndarray:
+    """A 64-bit hash per row over all its cells, in column order, combined like pandas.util.hash_pandas_object"""
+    hashers = [cell_hasher(table, name) for name in table.columns]
+    fingerprints = np.empty(table.row_count, dtype=np.uint64)
+    for start in range(0, table.row_count, FINGERPRINT_CHUNK_ROWS):
+        rows = slice(start, min(start + FINGERPRINT_CHUNK_ROWS, table.row_count))
+        combined = np.full(rows.stop - rows.start, 0x345678, dtype=np.uint64)
+        multiplier = np.uint64(1000003)
+        for i, hasher in enumerate(hashers):
+            combined = (combined ^ hasher(rows)) * multiplier
+            multiplier += np.uint64(82520 + 2 * (len(hashers) - i))
+        fingerprints[rows] = combined + np.uint64(97531)
+    return fingerprints
+
+def save_fingerprints(path: str, fingerprints: np.ndarray) -> None:
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npy"
+    np.save(tmp_path, fingerprints)
+    os.replace(tmp_path, path)
+
+def load_fingerprints(table: ColumnarTable) -> np.ndarray:
+    """A table's row fingerprints, computed once and kept in its column store"""
+    key = ("row_fingerprints",)
+    if key in table.derived:
+        return table.derived[key]
+
+    path = os.path.join(table.path, FINGERPRINT_FILE) if table.path else None
+    if path and os.path.exists(path):
+        fingerprints = np.load(path, mmap_mode="r")
+    else:
+        fingerprints = compute_fingerprints(table)
+        if path:
+            save_fingerprints(path, fingerprints)
+    table.derived[key] = fingerprints
+    return fingerprints
+
+# ==================== DUPLICATES ====================
+
+def duplicate_mask(table: ColumnarTable, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Rows (of the table, or of the rows at indices) that repeat an earlier row, like DataFrame.duplicated().
+
+    Fingerprints find the candidates; each one is then checked cell by cell
+    against the first row with its fingerprint, so a hash collision can
+    never make distinct rows count as duplicates.
+    """
+    fingerprints = load_fingerprints(table)
+    positions = np.arange(table.row_count) if rows is None else np.asarray(rows)
+    fingerprints = np.asarray(fingerprints[positions])
+
+    _, first, inverse = np.unique(fingerprints, return_index=True, return_inverse=True)
+    duplicated = np.ones(len(fingerprints), dtype=bool)
+    duplicated[first] = False
+
+    candidates = np.flatnonzero(duplicated)
+    originals = first[inverse[candidates]]
+    for name in table.columns:
+        if not len(candidates):
+            break
+        if (cell_keys(table, name, positions[candidates]) != cell_keys(table, name, positions[originals])).any():
+            # A collision: fall back to comparing every cell of every row
+            keys = pd.DataFrame({i: cell_keys(table, c, positions) for i, c in enumerate(table.columns)})
+            return keys.duplicated().to_numpy()
+    return duplicated
+
+def count_duplicates(table: ColumnarTable, rows: Optional[np.ndarray] = None) -> int:
+    return int(duplicate_mask(table, rows).sum())
+
+def count_repeats(table: ColumnarTable, history: List[ColumnarTable]) -> int:
+    """Rows of table that repeat an earlier row of it or any row of the history tables.
+
+    This is how many more duplicates DataFrame.duplicated would find with
+    table's rows appended after the history. Fingerprint matches against
+    the history are confirmed cell by cell, trying the next history row
+    with the same fingerprint after a collision.
+    """
+    duplicated = duplicate_mask(table)
+    fresh_rows = np.flatnonzero(~duplicated)
+    fresh = np.asarray(load_fingerprints(table))[fresh_rows]
+    seen = np.zeros(len(fresh), dtype=bool)
+    for other in history:
+        theirs = np.asarray(load_fingerprints(other))
+        order = np.argsort(theirs, kind="stable")
+        low = np.searchsorted(theirs[order], fresh, side="left")
+        high = np.searchsorted(theirs[order], fresh, side="right")
+        pending = np.flatnonzero((high > low) & ~seen)
+        offset = 0
+        while len(pending):
+            same = same_rows(table, fresh_rows[pending], other, order[low[pending] + offset])
+            seen[pending[same]] = True
+            offset += 1
+            pending = pending[~same]
+            pending = pending[low[pending] + offset < high[pending]]
+    return int(duplicated.sum() + seen.sum())
+
+# ==================== DIFFING ====================
+
+def unmatched_rows(fingerprints: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """Rows with no counterpart in other, pairing equal rows one to one (the k-th copy needs a k-th copy)"""
+    values, counts = np.unique(other, return_counts=True)
+    order = np.argsort(fingerprints, kind="stable")
+    ordered = fingerprints[order]
+    # Occurrence number of each row among the rows sharing its fingerprint
+    starts = np.searchsorted(ordered, ordered, side="left")
+    occurrence = np.empty(len(fingerprints), dtype=np.int64)
+    occurrence[order] = np.arange(len(ordered)) - starts
+
+    slot = np.searchsorted(values, fingerprints)
+    found = slot < len(values)
+    found[found] = values[slot[found]] == fingerprints[found]
+    available = np.zeros(len(fingerprints), dtype=np.int64)
+    available[found] = counts[slot[found]]
+    return occurrence >= available
+
+def diff_tables(table: ColumnarTable, other: ColumnarTable, limit: int = 100) -> dict:
+    """Rows removed from table and added in other, compared by content fingerprint.
+
+    Rows are compared as multisets, so reordering is not a change. Raises
+    ValueError when the two tables have different columns.
+    """
+    if table.columns != other.columns:
+        raise ValueError("Datasets have different columns")
+    fingerprints = np.asarray(load_fingerprints(table))
+    other_fingerprints = np.asarray(load_fingerprints(other))
+    removed = np.flatnonzero(unmatched_rows(fingerprints, other_fingerprints))
+    added = np.flatnonzero(unmatched_rows(other_fingerprints, fingerprints))
+    return {
+        "rows": {
+            "removed": len(removed),
+            "added": len(added),
+            "unchanged": table.row_count - len(removed)
+        },
+        "removed_rows": removed[:limit].tolist(),
+        "added_rows": added[:limit].tolist()
+    }
@@ -0,0 +1,124 @@
+import os
+import uuid
+from typing import List, Optional
+import numpy as np
+
+from services.columnar import ColumnarTable
+
+# Fine bins of the base histogram. 25200 = 2^4 * 3^2 * 5^2 * 7, so every
+# common coarse size (2-10, 12, 15, 16, 20, 24, 25, 30, 40, 50, ...)
+# divides it and merges whole base bins; other sizes split some base bins.
+BASE_BINS = 25200
+
+# Columns with at most this many distinct numbers keep exact value counts instead
+EXACT_DISTINCT_LIMIT = 4096
+
+HISTOGRAM_SUFFIX = ".hist.npz"
+
+# ==================== EXACT BINNING ====================
+
+def legacy_edges(min_val: float, max_val: float, bins: int) -> tuple:
+    """Bin starts and ends exactly as the chart endpoint has always computed them"""
+    bin_width = (max_val - min_val) / bins if max_val > min_val else 1
+    starts = np.array([min_val + i * bin_width for i in range(bins)])
+    return starts, starts + bin_width
+
+def count_sorted(values: np.ndarray, weights: np.ndarray, min_val: float, max_val: float, bins: int) -> np.ndarray:
+    """Histogram of sorted distinct values with multiplicities.
+
+    Bin i holds start <= v < end, and the last bin also holds the maximum,
+    reproducing the endpoint's original per-bin comparisons exactly.
+    """
+    starts, ends = legacy_edges(min_val, max_val, bins)
+    cumulative = np.concatenate(([0], np.cumsum(weights)))
+    below = lambda x: cumulative[np.searchsorted(values, x, side="left")]
+    counts = below(ends) - below(starts)
+    if not (starts[-1] <= max_val < ends[-1]):
+        counts[-1] += cumulative[-1] - below(max_val)
+    return counts.astype(np.int64)
+
+# ==================== BASE HISTOGRAM ====================
+
+def build_base(values: np.ndarray) -> Optional[dict]:
+    """Summarize a column's non-missing numbers for later histogram queries.
+
+    Low-cardinality columns keep (distinct value, count) pairs, from which
+    any bin count is exact. Others keep BASE_BINS equal-width counts, which
+    merge_base re-bins to any coarser count; a value near a coarse bin edge
+    may land in the neighbouring bin compared to binning the raw values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+
+    min_val, max_val = float(values.min()), float(values.max())
+    distinct, counts = np.unique(values, return_counts=True)
+    if len(distinct) <= EXACT_DISTINCT_LIMIT:
+        return {"mode": "exact", "min": min_val, "max": max_val, "total": len(values),
+                "values": distinct, "counts": counts.astype(np.int64)}
+
+    position = (distinct - min_val) / (max_val - min_val) * BASE_BINS
+    fine = np.minimum(position.astype(np.int64), BASE_BINS - 1)
+    return {"mode": "fine", "min": min_val, "max": max_val, "total": len(values),
+            "counts": np.bincount(fine, weights=counts, minlength=BASE_BINS).astype(np.int64)}
+
+def merge_base(base: dict, bins: int) -> np.ndarray:
+    """Coarse counts for any number of bins from a base histogram.
+
+    Each fine base bin goes to the coarse bin holding its midpoint, so when
+    bins doesn't divide BASE_BINS a value within one fine bin width of a
+    coarse edge may land in the neighbouring bin.
+    """
+    if base["mode"] == "exact":
+        return count_sorted(base["values"], base["counts"], base["min"], base["max"], bins)
+    coarse = ((2 * np.arange(BASE_BINS) + 1) * bins) // (2 * BASE_BINS)
+    return np.bincount(coarse, weights=base["counts"], minlength=bins).astype(np.int64)
+
+# ==================== PERSISTENCE ====================
+
+def save_base(path: str, base: Optional[dict]) -> None:
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+    if base is None:
+        np.savez(tmp_path, mode=np.array("empty"))
+    else:
+        np.savez(tmp_path, **{k: np.asarray(v) for k, v in base.items()})
+    os.replace(tmp_path, path)
+
+def read_base(path: str) -> Optional[dict]:
+    with np.load(path) as data:
+        mode = str(data["mode"])
+        if mode == "empty":
+            return None
+        base = {"mode": mode, "min": float(data["min"]), "max": float(data["max"]), "total": int(data["total"]),
+                "counts": data["counts"]}
+        if mode == "exact":
+            base["values"] = data["values"]
+        return base
+
+def load_base(table: ColumnarTable, column: str) -> Optional[dict]:
+    """A column's base histogram, read from the column store or built and saved on first use.
+
+    Tables without an on-disk store keep the base in memory for as long as
+    the table itself stays cached.
+    """
+    key = ("histogram", column)
+    if key in table.derived:
+        return table.derived[key]
+
+    path = table.sidecar_path(column, HISTOGRAM_SUFFIX)
+    if path and os.path.exists(path):
+        base = read_base(path)
+    else:
+        base = build_base(table.numeric(column))
+        if path:
+            save_base(path, base)
+
+    table.derived[key] = base
+    return base
+
+def build_histogram_bases(table: ColumnarTable, columns: Optional[List[str]] = None) -> None:
+    """Precompute base histograms, by default for every int and float column"""
+    for name in columns if columns is not None else table.columns:
+        if columns is not None or table.kind(name) in ("int", "float"):
+            load_base(table, name)
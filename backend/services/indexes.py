@@ -0,0 +1,93 @@
+import logging
+from typing import Dict, List
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# ==================== INDEX DECLARATIONS ====================
+
+# Every index the API relies on, per collection. Names are explicit so
+# changing a definition surfaces as a conflict instead of a silent duplicate.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "datasets": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("uploaded_at", DESCENDING), ("id", DESCENDING)], name="uploaded_at_id_desc"),
+        IndexModel([("category", ASCENDING), ("uploaded_at", DESCENDING), ("id", DESCENDING)], name="category_uploaded_at_id"),
+        IndexModel([("source_dataset", ASCENDING)], name="source_dataset"),
+        IndexModel([("sha256", ASCENDING)], name="sha256"),
+        IndexModel([("lineage.source.file_path", ASCENDING), ("file_path", ASCENDING)], name="lineage_source_file_path"),
+    ],
+    "projects": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id_desc"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+        IndexModel([("dataset_id", ASCENDING)], name="dataset_id"),
+    ],
+    "blobs": [
+        IndexModel([("sha256", ASCENDING)], unique=True, name="sha256_unique"),
+    ],
+    "upload_sessions": [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+    ],
+    "analysis_sketches": [
+        IndexModel([("project_id", ASCENDING), ("analysis_id", ASCENDING), ("position", ASCENDING)], name="project_analysis_position"),
+    ],
+}
+
+# Query shapes issued by the routes: (collection, description, filter, sort)
+QUERY_PATTERNS = [
+    ("datasets", "get dataset by id", {"id": ""}, None),
+    ("datasets", "list datasets", {}, [("uploaded_at", DESCENDING), ("id", DESCENDING)]),
+    ("datasets", "list datasets by category", {"category": "csv"}, [("uploaded_at", DESCENDING), ("id", DESCENDING)]),
+    ("datasets", "derived datasets of a source", {"source_dataset": ""}, None),
+    ("datasets", "datasets sharing a blob", {"sha256": ""}, None),
+    ("datasets", "derived datasets replaying a file", {"lineage.source.file_path": "", "file_path": None}, None),
+    ("projects", "get project by id", {"id": ""}, None),
+    ("projects", "list projects", {}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("projects", "list projects by status", {"status": "created"}, [("created_at", DESCENDING), ("id", DESCENDING)]),
+    ("blobs", "get blob by hash", {"sha256": ""}, None),
+    ("upload_sessions", "get upload session by id", {"id": ""}, None),
+    ("analysis_sketches", "column sketches of an analysis", {"project_id": "", "analysis_id": ""}, [("position", ASCENDING)]),
+    ("analysis_sketches", "column sketches of a project", {"project_id": ""}, None),
+]
+
+# ==================== BOOTSTRAP ====================
+
+async def ensure_indexes(db) -> None:
+    """Create any missing indexes; existing ones are left untouched"""
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except Exception as e:
+            # e.g. duplicate ids in old data blocking a unique index
+            logger.warning("Could not create indexes on %s: %s", collection, e)
+
+def plan_stages(plan: dict) -> List[str]:
+    """Flatten the stage names of an explain() plan tree"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+async def audit_query_plans(db) -> List[str]:
+    """Explain each known query pattern and warn about any that still plan as a COLLSCAN"""
+    collscans = []
+    for collection, description, query, sort in QUERY_PATTERNS:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = await cursor.limit(1).explain()
+        except Exception as e:
+            logger.warning("Could not explain '%s' on %s: %s", description, collection, e)
+            continue
+
+        winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in plan_stages(winning):
+            collscans.append(description)
+            logger.warning("Query '%s' on %s plans as a COLLSCAN: filter=%s sort=%s", description, collection, query, sort)
+
+    return collscans
@@ -0,0 +1,181 @@
+import os
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+import pandas as pd
+
+from services.chunked import replay_chunked, use_chunked
+from services.columnar import COLUMNAR_FORMAT, ColumnarTable, open_table, store_format
+from services.export import iter_csv
+from services.operations import apply_operation
+from services.storage import release_blob, retain_blob
+from services.table_cache import table_cache, table_cache_key
+
+# Derived datasets store the preprocessing steps that produce them (see
+# services/operations.py) instead of a file, and are resolved to a table by
+# replaying those steps from the source dataset.
+
+# Large replays are written as column stores here instead of held in memory
+LINEAGE_DIR = os.path.join(os.environ.get("UPLOAD_DIR", "/app/backend/uploads"), "lineage")
+
+# ==================== REPLAYING ====================
+
+def rows_to_table(rows: list, columns: List[str]) -> ColumnarTable:
+    """Encode string rows the way a CSV written from them would be read back"""
+    df = pd.DataFrame.from_records(rows, columns=columns) if rows else pd.DataFrame(columns=columns)
+    return ColumnarTable.from_frame(df.fillna("").astype(str))
+
+def store_dir(dataset_id: str) -> str:
+    """Where the column store of a large derived dataset is kept"""
+    return os.path.join(LINEAGE_DIR, dataset_id)
+
+def replay(table: ColumnarTable, operations: List[dict], dest_dir: Optional[str] = None) -> ColumnarTable:
+    """Apply operations to a table; large ones are streamed into a column store at dest_dir"""
+    if dest_dir and use_chunked(table):
+        return replay_chunked(table, operations, dest_dir)
+    rows, columns = table.records(), table.columns
+    for op in operations:
+        rows, columns = apply_operation(rows, columns, op)
+    return rows_to_table(rows, columns)
+
+# ==================== DERIVED DATASETS ====================
+
+def is_lazy(dataset: dict) -> bool:
+    """Whether a dataset is only an operation log over another dataset"""
+    return bool(dataset.get("lineage")) and not dataset.get("file_path")
+
+def root_source(dataset: dict) -> dict:
+    """The file-backed dataset a derivation chain starts from, as recorded at creation"""
+    if is_lazy(dataset):
+        return dataset["lineage"]["source"]
+    return {
+        "dataset_id": dataset["id"],
+        "file_path": dataset["file_path"],
+        "type": dataset["type"],
+        "sha256": dataset.get("sha256"),
+        "columnar": dataset.get("columnar")
+    }
+
+def derived_lineage(parent: dict, op: dict) -> dict:
+    """Lineage of a dataset made by applying op to parent"""
+    operations = parent["lineage"]["operations"] if is_lazy(parent) else []
+    return {"parent": parent["id"], "source": root_source(parent), "operations": operations + [op]}
+
+async def record_derived(db, parent: dict, op: dict, filename: str, preprocessing: dict) -> dict:
+    """Insert a dataset that stores op on top of parent instead of a processed file.
+
+    A derived dataset takes a reference on its source's blob, so deleting
+    the source dataset keeps the bytes its operations replay from.
+    """
+    lineage = derived_lineage(parent, op)
+    sha256 = lineage["source"].get("sha256")
+    lineage["retains_blob"] = bool(sha256) and await retain_blob(db, sha256)
+
+    derived_doc = {
+        "id": str(uuid.uuid4()),
+        "filename": filename,
+        "stored_filename": None,
+        "file_path": None,
+        "size": 0,
+        "type": ".csv",
+        "category": "csv",
+        "uploaded_at": datetime.now(timezone.utc).isoformat(),
+        "status": "processed",
+        "source_dataset": parent["id"],
+        "preprocessing": preprocessing,
+        "lineage": lineage,
+        "materialized": False
+    }
+    try:
+        await db.datasets.insert_one(derived_doc)
+    except Exception:
+        if lineage["retains_blob"]:
+            await release_blob(db, sha256)
+        raise
+    derived_doc.pop("_id", None)
+    return derived_doc
+
+async def replays_from(db, file_path: str, exclude_id: Optional[str] = None) -> bool:
+    """Whether any unmaterialized derived dataset still reads the given source file"""
+    query = {"lineage.source.file_path": file_path, "file_path": None}
+    if exclude_id:
+        query["id"] = {"$ne": exclude_id}
+    return await db.datasets.find_one(query, {"_id": 0, "id": 1}) is not None
+
+async def file_table(dataset: dict) -> ColumnarTable:
+    return await table_cache.get_or_load(
+        table_cache_key(dataset),
+        lambda: asyncio.to_thread(open_table, dataset)
+    )
+
+async def source_table(db, source: dict) -> ColumnarTable:
+    """Table of a chain's root, preferring the live dataset over the recorded snapshot"""
+    root = await db.datasets.find_one({"id": source["dataset_id"]}, {"_id": 0})
+    if root and root.get("file_path") and os.path.exists(root["file_path"]):
+        return await file_table(root)
+    return await file_table({
+        "id": source["dataset_id"],
+        "file_path": source["file_path"],
+        "type": source["type"],
+        "sha256": source.get("sha256"),
+        "columnar": source.get("columnar")
+    })
+
+async def resolve_table(db, dataset: dict) -> ColumnarTable:
+    """A dataset's table, replaying its operation log if it is derived.
+
+    Replayed tables are cached like file-backed ones, so resolving a chain
+    reuses the deepest cached ancestor and only applies the steps after it.
+    """
+    if not is_lazy(dataset):
+        return await file_table(dataset)
+
+    lineage = dataset["lineage"]
+    source = lineage["source"]
+    key = (dataset["id"], "lineage", source.get("sha256") or source["file_path"], len(lineage["operations"]))
+
+    async def load() -> ColumnarTable:
+        if store_format(store_dir(dataset["id"])) == COLUMNAR_FORMAT:
+            return ColumnarTable.open(store_dir(dataset["id"]))
+
+        parent = await db.datasets.find_one({"id": lineage["parent"]}, {"_id": 0})
+        if parent and (is_lazy(parent) or os.path.exists(parent.get("file_path") or "")):
+            base = await resolve_table(db, parent)
+            operations = lineage["operations"][-1:]
+        else:
+            base = await source_table(db, source)
+            operations = lineage["operations"]
+        return await asyncio.to_thread(replay, base, operations, store_dir(dataset["id"]))
+
+    return await table_cache.get_or_load(key, load)
+
+def write_csv(table: ColumnarTable, path: str) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for chunk in iter_csv(table):
+            f.write(chunk)
+
+async def materialize(db, dataset: dict, dest_dir: str) -> dict:
+    """Write a derived dataset to dest_dir and turn it into a regular file-backed dataset"""
+    table = await resolve_table(db, dataset)
+    filename = f"{dataset['id']}.csv"
+    path = os.path.join(dest_dir, filename)
+    await asyncio.to_thread(write_csv, table, path)
+
+    update = {"stored_filename": filename, "file_path": path, "size": os.path.getsize(path), "materialized": True}
+    if table.path:
+        # A streamed replay already is the column store of the written file
+        update["columnar"] = {
+            "status": "ready",
+            "path": table.path,
+            "format": table.schema["format"],
+            "row_count": table.row_count,
+            "schema": [{"name": c["name"], "kind": c["kind"]} for c in table.schema["columns"]],
+            "built_at": datetime.now(timezone.utc).isoformat()
+        }
+    await db.datasets.update_one({"id": dataset["id"]}, {"$set": update})
+    return {**dataset, **update}
+
+async def load_frame(db, dataset: dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Typed DataFrame for a file-backed or derived dataset"""
+    return (await resolve_table(db, dataset)).to_frame(columns)
@@ -0,0 +1,182 @@
+from collections import Counter
+from typing import List, Optional
+
+# Preprocessing steps as data: fit_* computes an operation's parameters from
+# its input rows and apply_operation replays it, so a derived dataset can be
+# stored as the list of operations that produce it. Fitted maps are stored
+# as [key, value] pairs because column names and cell values are not always
+# valid MongoDB field names.
+
+# ==================== FITTING ====================
+
+def get_numeric_values(rows: list, column: str) -> list:
+    """Extract numeric values from a column"""
+    values = []
+    for row in rows:
+        try:
+            val = float(row.get(column, ""))
+            values.append(val)
+        except (ValueError, TypeError):
+            pass
+    return values
+
+def fit_missing(rows: list, columns: List[str], strategy: str, fill_value: Optional[str] = None) -> dict:
+    """Missing-value operation with the fill value of each target column"""
+    fill_values = {}
+    if strategy in ["fill_mean", "fill_median", "fill_mode"]:
+        for col in columns:
+            numeric_vals = get_numeric_values(rows, col)
+            if strategy == "fill_mean" and numeric_vals:
+                fill_values[col] = sum(numeric_vals) / len(numeric_vals)
+            elif strategy == "fill_median" and numeric_vals:
+                sorted_vals = sorted(numeric_vals)
+                mid = len(sorted_vals) // 2
+                fill_values[col] = sorted_vals[mid] if len(sorted_vals) % 2 else (sorted_vals[mid-1] + sorted_vals[mid]) / 2
+            elif strategy == "fill_mode":
+                vals = Counter(row.get(col, "") for row in rows if row.get(col, "").strip())
+                if vals:
+                    fill_values[col] = vals.most_common(1)[0][0]
+
+    return {
+        "type": "missing_values",
+        "strategy": strategy,
+        "columns": columns,
+        "fill_value": fill_value,
+        "fill_values": [[col, str(val)] for col, val in fill_values.items()]
+    }
+
+def fit_normalization(rows: list, columns: List[str], method: str) -> dict:
+    """Normalization operation with each column's scaling parameters.
+
+    Raises ValueError for a column without numeric values.
+    """
+    norm_params = {}
+    for col in columns:
+        values = get_numeric_values(rows, col)
+        if not values:
+            raise ValueError(f"Column '{col}' has no numeric values")
+
+        if method == "minmax":
+            norm_params[col] = {"min": min(values), "max": max(values)}
+        elif method == "zscore":
+            mean = sum(values) / len(values)
+            std = (sum((x - mean) ** 2 for x in values) / len(values)) ** 0.5
+            norm_params[col] = {"mean": mean, "std": std if std > 0 else 1}
+        elif method == "robust":
+            sorted_vals = sorted(values)
+            q1 = sorted_vals[len(sorted_vals) // 4]
+            q3 = sorted_vals[3 * len(sorted_vals) // 4]
+            median = sorted_vals[len(sorted_vals) // 2]
+            iqr = q3 - q1 if q3 > q1 else 1
+            norm_params[col] = {"median": median, "iqr": iqr}
+
+    return {
+        "type": "normalization",
+        "method": method,
+        "columns": columns,
+        "parameters": [[col, params] for col, params in norm_params.items()]
+    }
+
+def fit_encoding(rows: list, columns: List[str], method: str) -> dict:
+    """Encoding operation with the sorted categories of each column"""
+    return {
+        "type": "encoding",
+        "method": method,
+        "columns": columns,
+        "categories": [[col, sorted(set(row.get(col, "") for row in rows))] for col in columns]
+    }
+
+# ==================== APPLYING ====================
+
+def apply_missing(rows: list, columns: List[str], op: dict) -> tuple:
+    fill_values = dict(op["fill_values"])
+    processed_rows = []
+    for row in rows:
+        has_missing = any(not row.get(col, "").strip() for col in op["columns"])
+        if op["strategy"] == "drop" and has_missing:
+            continue
+
+        new_row = row.copy()
+        for col in op["columns"]:
+            if not new_row.get(col, "").strip():
+                if op["strategy"] == "fill_value":
+                    new_row[col] = op["fill_value"] or ""
+                elif col in fill_values:
+                    new_row[col] = fill_values[col]
+        processed_rows.append(new_row)
+    return processed_rows, columns
+
+def apply_normalization(rows: list, columns: List[str], op: dict) -> tuple:
+    norm_params = dict(op["parameters"])
+    method = op["method"]
+    processed_rows = []
+    for row in rows:
+        new_row = row.copy()
+        for col in op["columns"]:
+            try:
+                val = float(row.get(col, ""))
+                params = norm_params[col]
+
+                if method == "minmax":
+                    range_val = params["max"] - params["min"]
+                    new_val = (val - params["min"]) / range_val if range_val > 0 else 0
+                elif method == "zscore":
+                    new_val = (val - params["mean"]) / params["std"]
+                elif method == "robust":
+                    new_val = (val - params["median"]) / params["iqr"]
+
+                new_row[col] = f"{new_val:.6f}"
+            except (ValueError, TypeError):
+                pass
+        processed_rows.append(new_row)
+    return processed_rows, columns
+
+def encoding_map(op: dict) -> dict:
+    """Response form of an encoding's categories: value -> code, or the one-hot values"""
+    if op["method"] == "onehot":
+        return {col: list(values) for col, values in op["categories"]}
+    return {col: {val: idx for idx, val in enumerate(values)} for col, values in op["categories"]}
+
+def encoded_columns(columns: List[str], op: dict) -> List[str]:
+    """Columns after an encoding: one-hot replaces each encoded column with one per value"""
+    if op["method"] != "onehot":
+        return columns
+    new_columns = list(columns)
+    for col, values in op["categories"]:
+        for val in values:
+            new_col = f"{col}_{val}"
+            if new_col not in new_columns:
+                new_columns.append(new_col)
+    return [c for c in new_columns if c not in op["columns"]]
+
+def apply_encoding(rows: list, columns: List[str], op: dict) -> tuple:
+    encoded = op["columns"]
+    info = encoding_map(op)
+    if op["method"] != "onehot":
+        processed_rows = []
+        for row in rows:
+            new_row = row.copy()
+            for col in encoded:
+                new_row[col] = str(info[col].get(row.get(col, ""), 0))
+            processed_rows.append(new_row)
+        return processed_rows, columns
+
+    processed_rows = []
+    for row in rows:
+        new_row = {k: v for k, v in row.items() if k not in encoded}
+        for col in encoded:
+            val = row.get(col, "")
+            for unique_val in info[col]:
+                new_row[f"{col}_{unique_val}"] = "1" if val == unique_val else "0"
+        processed_rows.append(new_row)
+    return processed_rows, encoded_columns(columns, op)
+
+OPERATIONS = {
+    "missing_values": apply_missing,
+    "normalization": apply_normalization,
+    "encoding": apply_encoding,
+}
+
+def apply_operation(rows: list, columns: List[str], op: dict) -> tuple:
+    """Replay one recorded operation on string rows, returning (rows, columns)"""
+    return OPERATIONS[op["type"]](rows, columns, op)
@@ -0,0 +1,68 @@
+import json
+import base64
+import asyncio
+from typing import Optional
+from pymongo import DESCENDING
+
+# ==================== CURSORS ====================
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    """Opaque cursor pointing just past doc in (sort_field, id) descending order"""
+    payload = json.dumps({"k": doc.get(sort_field), "id": doc["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return {"k": payload["k"], "id": payload["id"]}
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def keyset_filter(query: dict, sort_field: str, cursor: Optional[str]) -> dict:
+    """Restrict query to documents after the cursor in (sort_field, id) descending order"""
+    if not cursor:
+        return query
+    position = decode_cursor(cursor)
+    after = {"$or": [
+        {sort_field: {"$lt": position["k"]}},
+        {sort_field: position["k"], "id": {"$lt": position["id"]}}
+    ]}
+    return {"$and": [query, after]} if query else after
+
+# ==================== LISTING ====================
+
+async def paginate(
+    collection,
+    query: dict,
+    sort_field: str,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    exact_count: bool = True
+) -> dict:
+    """List one page in (sort_field, id) descending order with the total count.
+
+    The page query and the count run concurrently. With exact_count=False the
+    collection's metadata estimate is returned instead of counting matches;
+    for a filtered query it is an upper bound. One extra document is fetched
+    to decide whether a next_cursor exists.
+    """
+    find = collection.find(keyset_filter(query, sort_field, cursor), {"_id": 0})
+    find = find.sort([(sort_field, DESCENDING), ("id", DESCENDING)]).skip(skip).limit(limit + 1)
+
+    if exact_count:
+        count = collection.count_documents(query)
+    else:
+        count = collection.estimated_document_count()
+
+    items, total = await asyncio.gather(find.to_list(limit + 1), count)
+
+    next_cursor = encode_cursor(items[limit - 1], sort_field) if len(items) > limit else None
+    return {
+        "items": items[:limit],
+        "total": total,
+        "total_is_estimate": not exact_count,
+        "next_cursor": next_cursor
+    }
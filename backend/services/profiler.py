@@ -0,0 +1,253 @@
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+from services.chunked import parse_float
+from services.columnar import ColumnarTable
+from services.sketches import DistinctSketch, Moments, QuantileSketch, TopKSketch
+
+# ==================== COLUMN PROFILING ====================
+
+def numeric_summary(values: np.ndarray) -> Dict[str, float]:
+    """min/max/mean/std/quartiles of a non-empty float array without NaNs"""
+    p25, median, p75 = np.percentile(values, [25, 50, 75])
+    return {
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        "p25": float(p25),
+        "median": float(median),
+        "p75": float(p75)
+    }
+
+def float_lookup(dictionary: list, present: np.ndarray) -> Optional[np.ndarray]:
+    """float() of every present dictionary entry (NaN elsewhere, plus one slot for code -1), or None if one fails"""
+    lookup = np.full(len(dictionary) + 1, np.nan)
+    for i in np.flatnonzero(present).tolist():
+        value = parse_float(dictionary[i])
+        if value is None:
+            return None
+        lookup[i] = value
+    return lookup
+
+def profile_string_column(codes: np.ndarray, dictionary: list) -> dict:
+    """Profile a dictionary-encoded column from its code counts.
+
+    Blank and whitespace-only cells count as nulls and a column is numeric
+    when float() accepts every other cell, matching how the per-row
+    profiler treated csv.DictReader values; "NA" and the like are text.
+    """
+    codes = np.asarray(codes)
+    counts = np.bincount(codes[codes >= 0], minlength=len(dictionary))
+    blank = np.fromiter((not d.strip() for d in dictionary), dtype=bool, count=len(dictionary))
+    present = (counts > 0) & ~blank
+
+    non_null_count = int(counts[~blank].sum())
+    stats = {
+        "null_count": len(codes) - non_null_count,
+        "non_null_count": non_null_count,
+        "unique_count": int(present.sum()),
+        "type": "string"
+    }
+
+    lookup = float_lookup(dictionary, present) if non_null_count else None
+    if lookup is not None:
+        stats["type"] = "numeric"
+        values = lookup[codes]
+        values = values[~np.isnan(values)]
+        if len(values):
+            stats.update(numeric_summary(values))
+
+    return stats
+
+def profile_numeric_column(values: np.ndarray) -> dict:
+    """Profile a typed numeric column, NaN marking missing cells"""
+    values = np.asarray(values, dtype=np.float64)
+    present = values[~np.isnan(values)]
+    stats = {
+        "null_count": len(values) - len(present),
+        "non_null_count": len(present),
+        # By bit pattern, so -0.0 and 0.0 stay apart like their texts
+        "unique_count": len(pd.unique(present.view(np.int64))),
+        "type": "numeric" if len(present) else "string"
+    }
+    if len(present):
+        stats.update(numeric_summary(present))
+    return stats
+
+def profile_column(table: ColumnarTable, name: str) -> dict:
+    col = table.column(name)
+    # Columns with source text are profiled from it, like the raw CSV cells
+    text = table.source_text(name)
+    if text is not None:
+        return profile_string_column(text["codes"], text["dictionary"])
+    if col["kind"] in ("int", "float"):
+        return profile_numeric_column(col["values"])
+
+    # bool and datetime cells never parse as plain numbers
+    values = np.asarray(col["values"])
+    present = values[values != np.iinfo(np.int64).min] if col["kind"] == "datetime" else values
+    return {
+        "null_count": len(values) - len(present),
+        "non_null_count": len(present),
+        "unique_count": len(pd.unique(present)),
+        "type": "string"
+    }
+
+def profile_table(table: ColumnarTable) -> dict:
+    """Per-column null, distinct, type and numeric statistics in one vectorized pass per column"""
+    if not table.row_count:
+        return {"row_count": 0, "columns": [], "column_stats": {}}
+
+    return {
+        "row_count": table.row_count,
+        "column_count": len(table.columns),
+        "columns": table.columns,
+        "column_stats": {name: profile_column(table, name) for name in table.columns}
+    }
+
+# ==================== SERIES PROFILING ====================
+
+def linear_quantile(ordered: np.ndarray, q: float) -> float:
+    """Quantile of sorted values, interpolated exactly as numpy's default (linear) method does"""
+    index = (len(ordered) - 1) * q
+    below = int(np.floor(index))
+    above = min(below + 1, len(ordered) - 1)
+    gamma = index - below
+    a, b = ordered[below], ordered[above]
+    if gamma >= 0.5:
+        return float(b - (b - a) * (1 - gamma))
+    return float(a + (b - a) * gamma)
+
+def sorted_numeric_summary(values: np.ndarray) -> dict:
+    """Statistics of a non-empty numeric array without missing values, from a single sort.
+
+    Every figure matches what the corresponding pandas reduction returns on
+    the same values (sum-based ones are taken in the original order, since
+    floating-point sums depend on it); distinct counts, order statistics and
+    IQR outliers are all read off the one sorted copy.
+    """
+    n = len(values)
+    floats = values.astype(np.float64)
+    ordered = np.sort(floats)
+
+    if values.dtype.kind == "f":
+        mean = values.sum() / n
+    else:
+        mean = values.sum(dtype=np.float64) / n
+    average = floats.sum() / n
+    std = float(np.sqrt(((average - floats) ** 2).sum() / (n - 1))) if n > 1 else float("nan")
+
+    mid = n // 2
+    median = ordered[mid] if n % 2 else ordered[mid - 1:mid + 1].mean()
+    q1, q3 = linear_quantile(ordered, 0.25), linear_quantile(ordered, 0.75)
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    below = int(np.searchsorted(ordered, low, side="left")) if low == low else 0
+    above = n - int(np.searchsorted(ordered, high, side="right")) if high == high else 0
+
+    return {
+        "unique_count": int(np.count_nonzero(ordered[1:] != ordered[:-1])) + 1,
+        "min": float(ordered[0]),
+        "max": float(ordered[-1]),
+        "mean": float(mean),
+        "std": std,
+        "median": float(median),
+        "q1": q1,
+        "q3": q3,
+        "outlier_count": below + above
+    }
+
+def distinct_counts(values: np.ndarray) -> tuple:
+    """(distinct non-missing values in order of first appearance, count of each, missing count) from one hash pass"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    present = codes[codes >= 0]
+    return uniques, np.bincount(present, minlength=len(uniques)), len(codes) - len(present)
+
+# ==================== MERGEABLE PROFILES ====================
+
+def sketch_series(series: pd.Series) -> dict:
+    """Mergeable, BSON-safe profile of a column: cell counts plus moments and
+    quantiles (numeric), a min/max range (datetime) or frequent values and
+    text lengths (everything else), and distinct values for all kinds.
+
+    Distinct values are hashed by content, so sketches of different chunks
+    of a column, even with int and float dtypes, count shared values once.
+    """
+    total = len(series)
+    distinct = DistinctSketch()
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy()
+        if values.dtype.kind == "f":
+            values = values[~np.isnan(values)]
+        missing = total - len(values)
+        # -0.0 and 0.0 are one value, as they are to the profiler
+        floats = values.astype(np.float64) + 0.0
+        moments, quantiles = Moments(), QuantileSketch()
+        moments.update(floats)
+        quantiles.update(floats)
+        distinct.update(pd.util.hash_array(floats))
+        sketch = {"kind": "numeric", "moments": moments.to_dict(), "quantiles": quantiles.to_dict()}
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        stamps = series.dropna().to_numpy(dtype="datetime64[ns]").view(np.int64)
+        missing = total - len(stamps)
+        distinct.update(pd.util.hash_array(stamps))
+        sketch = {
+            "kind": "datetime",
+            "min": int(stamps.min()) if len(stamps) else None,
+            "max": int(stamps.max()) if len(stamps) else None
+        }
+    else:
+        uniques, counts, missing = distinct_counts(series.to_numpy())
+        distinct.update(pd.util.hash_array(np.asarray(uniques, dtype=object), categorize=False))
+        top = TopKSketch()
+        top.update(np.asarray(uniques, dtype=object), counts)
+        sketch = {"kind": "other", "top": top.to_dict()}
+        if series.dtype == object:
+            lengths = pd.Series(uniques, dtype=object).astype(str).str.len().to_numpy()
+            sketch["length_sum"] = int((lengths * counts).sum())
+            sketch["length_max"] = int(lengths.max()) if len(lengths) else 0
+
+    sketch.update({"dtype": str(series.dtype), "count": total, "missing": int(missing), "distinct": distinct.to_dict()})
+    return sketch
+
+def merge_sketches(sketch: dict, other: dict) -> dict:
+    """Profile of two chunks of a column from their sketch_series profiles.
+
+    Raises ValueError if the column's type differs between them, except
+    that int and float chunks merge as float, as pandas would concatenate them.
+    """
+    dtype = sketch["dtype"]
+    if other["dtype"] != dtype:
+        if {dtype, other["dtype"]} != {"int64", "float64"}:
+            raise ValueError(f"type changed from {dtype} to {other['dtype']}")
+        dtype = "float64"
+
+    distinct = DistinctSketch.from_dict(sketch["distinct"])
+    distinct.merge(DistinctSketch.from_dict(other["distinct"]))
+    merged = {
+        "kind": sketch["kind"],
+        "dtype": dtype,
+        "count": sketch["count"] + other["count"],
+        "missing": sketch["missing"] + other["missing"],
+        "distinct": distinct.to_dict()
+    }
+
+    if sketch["kind"] == "numeric":
+        moments, quantiles = Moments.from_dict(sketch["moments"]), QuantileSketch.from_dict(sketch["quantiles"])
+        moments.merge(Moments.from_dict(other["moments"]))
+        quantiles.merge(QuantileSketch.from_dict(other["quantiles"]))
+        merged.update({"moments": moments.to_dict(), "quantiles": quantiles.to_dict()})
+    elif sketch["kind"] == "datetime":
+        for stat, pick in (("min", min), ("max", max)):
+            stamps = [s[stat] for s in (sketch, other) if s[stat] is not None]
+            merged[stat] = pick(stamps) if stamps else None
+    else:
+        top = TopKSketch.from_dict(sketch["top"])
+        top.merge(TopKSketch.from_dict(other["top"]))
+        merged["top"] = top.to_dict()
+        if "length_sum" in sketch:
+            merged["length_sum"] = sketch["length_sum"] + other["length_sum"]
+            merged["length_max"] = max(sketch["length_max"], other["length_max"])
+    return merged
@@ -0,0 +1,184 @@
+import os
+import io
+import csv
+from itertools import islice
+from typing import List, Optional
+import numpy as np
+
+# Sidecar index of byte offsets for every ROW_INDEX_STRIDE-th data row of a CSV
+ROW_INDEX_STRIDE = int(os.environ.get("ROW_INDEX_STRIDE", 1000))
+ROW_INDEX_SUFFIX = ".rowidx.npz"
+# Bumped when the scan changes, so indexes built by an older one are rebuilt
+ROW_INDEX_VERSION = 2
+SCAN_CHUNK_SIZE = 8 * 1024 * 1024
+
+QUOTE = ord('"')
+COMMA = ord(",")
+NEWLINE = ord("\n")
+CARRIAGE_RETURN = ord("\r")
+
+# Bytes after which a quote is the first byte of a field and so opens it
+FIELD_BREAKS = np.array([COMMA, NEWLINE, CARRIAGE_RETURN], dtype=np.uint8)
+
+# ==================== BUILDING ====================
+
+def quote_runs(buf: np.ndarray, inside: bool, last_byte: int) -> tuple:
+    """(run starts, whether each run of quotes leaves the scan in a quoted field, final state).
+
+    Read the way csv.reader does: a quote opens a quoted field only as the
+    first byte of a field; inside one, "" is an escaped quote and a lone
+    quote closes it, while quotes inside unquoted fields are plain text.
+    So only runs of odd length move in or out of a quoted field, and one
+    that starts mid-field while outside is text.
+    """
+    quotes = np.flatnonzero(buf == QUOTE)
+    if not len(quotes):
+        return quotes, np.zeros(0, dtype=bool), inside
+
+    first = np.ones(len(quotes), dtype=bool)
+    first[1:] = np.diff(quotes) != 1
+    starts = quotes[first]
+    odd = np.diff(np.append(np.flatnonzero(first), len(quotes))) & 1 == 1
+    before = np.where(starts > 0, buf[np.maximum(starts - 1, 0)], last_byte)
+    opens = np.isin(before, FIELD_BREAKS)
+
+    # Well-formed files: every odd run opens or closes a field
+    after = (np.cumsum(odd) & 1 == 1) ^ inside
+    was_inside = after ^ odd
+    if not (odd & ~opens & ~was_inside).any():
+        return starts, after, bool(after[-1])
+
+    # A stray quote mid-field: walk the runs to keep it from toggling
+    for i in range(len(starts)):
+        if odd[i] and (inside or opens[i]):
+            inside = not inside
+        after[i] = inside
+    return starts, after, inside
+
+def scan_record_starts(f, chunk_size: int = SCAN_CHUNK_SIZE):
+    """Yield arrays of byte offsets where non-blank CSV records start.
+
+    A newline ends a record only when it sits outside a quoted field, as
+    tracked by quote_runs. Blank lines are skipped like csv.DictReader does.
+    """
+    inside = False
+    pos = 0
+    record_start = 0
+    last_byte = NEWLINE
+    held = b""
+
+    while True:
+        chunk = f.read(chunk_size)
+        data = held + chunk
+        if not data:
+            break
+        # A run of quotes at the end of a chunk may go on in the next one
+        keep = len(data.rstrip(b'"')) if chunk else len(data)
+        held = data[keep:]
+        if not keep:
+            continue
+        buf = np.frombuffer(data, dtype=np.uint8, count=keep)
+
+        starts, after, final = quote_runs(buf, inside, last_byte)
+        newlines = np.flatnonzero(buf == NEWLINE)
+        run = np.searchsorted(starts, newlines) - 1
+        quoted = np.where(run >= 0, after[np.maximum(run, 0)] if len(after) else inside, inside)
+        ends = newlines[~quoted]
+
+        if len(ends):
+            record_starts = np.concatenate(([record_start], ends[:-1] + 1 + pos))
+            before = np.where(ends > 0, buf[np.maximum(ends - 1, 0)], last_byte)
+            lengths = ends + pos - record_starts
+            blank = (lengths == 0) | ((lengths == 1) & (before == CARRIAGE_RETURN))
+            yield record_starts[~blank]
+            record_start = int(ends[-1]) + 1 + pos
+
+        inside = final
+        last_byte = int(buf[-1])
+        pos += len(buf)
+
+    # Final record without a trailing newline
+    trailing = pos - record_start
+    if trailing > 1 or (trailing == 1 and last_byte != CARRIAGE_RETURN):
+        yield np.array([record_start], dtype=np.int64)
+
+def build_row_index(file_path: str, stride: int = ROW_INDEX_STRIDE) -> dict:
+    """Scan a CSV once and record the byte offset of every stride-th data row"""
+    checkpoints: List[np.ndarray] = []
+    header_seen = False
+    row_count = 0
+
+    with open(file_path, "rb") as f:
+        for starts in scan_record_starts(f):
+            if not header_seen:
+                header_seen = True
+                starts = starts[1:]
+            row_numbers = row_count + np.arange(len(starts))
+            checkpoints.append(starts[row_numbers % stride == 0])
+            row_count += len(starts)
+
+    stat = os.stat(file_path)
+    return {
+        "stride": stride,
+        "row_count": row_count,
+        "offsets": np.concatenate(checkpoints).astype(np.int64) if checkpoints else np.zeros(0, dtype=np.int64),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "version": ROW_INDEX_VERSION
+    }
+
+# ==================== LOADING ====================
+
+def load_row_index(file_path: str, stride: int = ROW_INDEX_STRIDE) -> dict:
+    """Load the sidecar index for file_path, (re)building it if missing or stale"""
+    index_path = file_path + ROW_INDEX_SUFFIX
+    stat = os.stat(file_path)
+
+    if os.path.exists(index_path):
+        with np.load(index_path) as data:
+            index = {key: data[key] for key in data.files}
+        fresh = int(index["size"]) == stat.st_size and int(index["mtime_ns"]) == stat.st_mtime_ns
+        if fresh and int(index["stride"]) == stride and int(index.get("version", 1)) == ROW_INDEX_VERSION:
+            return {
+                "stride": int(index["stride"]),
+                "row_count": int(index["row_count"]),
+                "offsets": index["offsets"],
+                "size": int(index["size"]),
+                "mtime_ns": int(index["mtime_ns"]),
+                "version": ROW_INDEX_VERSION
+            }
+
+    index = build_row_index(file_path, stride)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **index)
+    os.replace(tmp_path, index_path)
+    return index
+
+# ==================== READING ====================
+
+def read_header(file_path: str) -> List[str]:
+    with open(file_path, "r", encoding="utf-8", newline="") as f:
+        for record in csv.reader(f):
+            if record:
+                return record
+    return []
+
+def read_rows(file_path: str, offset: int, limit: int, index: Optional[dict] = None) -> dict:
+    """Read `limit` data rows starting at row `offset` as csv.DictReader dicts.
+
+    Seeks to the nearest indexed checkpoint and parses at most `stride - 1`
+    rows before the page, so cost is independent of file size.
+    """
+    index = index or load_row_index(file_path)
+    columns = read_header(file_path)
+    rows: List[dict] = []
+
+    if offset < index["row_count"]:
+        checkpoint = offset // index["stride"]
+        with open(file_path, "rb") as raw:
+            raw.seek(int(index["offsets"][checkpoint]))
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8", newline=""), fieldnames=columns)
+            skip = offset - checkpoint * index["stride"]
+            rows = list(islice(reader, skip, skip + limit))
+
+    return {"columns": columns, "rows": rows, "total_rows": index["row_count"]}
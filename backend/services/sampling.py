@@ -0,0 +1,254 @@
+import os
+from statistics import NormalDist
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+
+from services.columnar import ColumnarTable
+
+# Rows read per step; sampling memory is bounded by this plus the sample size
+SAMPLE_CHUNK_ROWS = int(os.environ.get("SAMPLE_CHUNK_ROWS", 1024 * 1024))
+
+# Above this many rows "auto" returns a density grid instead of points
+SCATTER_DENSITY_THRESHOLD = int(os.environ.get("SCATTER_DENSITY_THRESHOLD", 1_000_000))
+
+# Stratified sampling refuses columns with more distinct values than this
+MAX_STRATA = 100
+
+SCATTER_MODES = ["auto", "uniform", "stratified", "density", "head"]
+
+# ==================== CHUNKED READS ====================
+
+def iter_xy(table: ColumnarTable, x_column: str, y_column: str, chunk_rows: int = SAMPLE_CHUNK_ROWS) -> Iterator[tuple]:
+    """Yield (row indices, xs, ys) of the rows where both columns are numeric, a chunk at a time"""
+    for start in range(0, table.row_count, chunk_rows):
+        rows = slice(start, min(start + chunk_rows, table.row_count))
+        xs = table.numeric(x_column, rows)
+        ys = table.numeric(y_column, rows)
+        valid = ~(np.isnan(xs) | np.isnan(ys))
+        yield np.flatnonzero(valid) + start, xs[valid], ys[valid]
+
+def points(table: ColumnarTable, x_column: str, y_column: str, rows: np.ndarray) -> List[dict]:
+    xs = table.numeric(x_column, rows).tolist()
+    ys = table.numeric(y_column, rows).tolist()
+    return [{"x": x, "y": y} for x, y in zip(xs, ys)]
+
+def keep_smallest(keys: np.ndarray, rows: np.ndarray, k: int) -> tuple:
+    if len(keys) <= k:
+        return keys, rows
+    keep = np.argpartition(keys, k - 1)[:k]
+    return keys[keep], rows[keep]
+
+# ==================== SAMPLERS ====================
+
+def head_sample(table: ColumnarTable, x_column: str, y_column: str, limit: int) -> dict:
+    """The first `limit` rows, as the endpoint used to plot"""
+    rows = np.arange(min(limit, table.row_count))
+    xs = table.numeric(x_column, rows)
+    ys = table.numeric(y_column, rows)
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    return {"mode": "head", "data": points(table, x_column, y_column, rows[valid])}
+
+def uniform_sample(table: ColumnarTable, x_column: str, y_column: str, limit: int, seed: int) -> dict:
+    """Uniform sample without replacement of the plottable rows.
+
+    Every candidate row draws a random key and the `limit` smallest keys
+    survive each chunk, so the sample is reservoir-bounded and the same
+    seed always returns the same rows.
+    """
+    rng = np.random.default_rng(seed)
+    keys = np.zeros(0)
+    sample = np.zeros(0, dtype=np.int64)
+    total = 0
+
+    for rows, xs, ys in iter_xy(table, x_column, y_column):
+        total += len(rows)
+        keys, sample = keep_smallest(np.concatenate((keys, rng.random(len(rows)))), np.concatenate((sample, rows)), limit)
+
+    sample = np.sort(sample)
+    return {"mode": "uniform", "seed": seed, "total_points": total, "data": points(table, x_column, y_column, sample)}
+
+def stratum_codes(table: ColumnarTable, column: str, rows: np.ndarray, labels: Dict[str, int]) -> np.ndarray:
+    """Map rows to stratum ids by rendered value, adding new values to labels"""
+    values = table.strings(column, rows)
+    codes, uniques = pd.factorize(values)
+    for value in uniques:
+        if value not in labels:
+            labels[value] = len(labels)
+            if len(labels) > MAX_STRATA:
+                raise ValueError(f"Column '{column}' has more than {MAX_STRATA} distinct values to stratify by")
+    mapping = np.array([labels[value] for value in uniques], dtype=np.int64)
+    return mapping[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+
+def allocate(sizes: np.ndarray, limit: int) -> np.ndarray:
+    """Split limit across strata: one per non-empty stratum, the rest proportionally (largest remainder)"""
+    if sizes.sum() <= limit:
+        return sizes.copy()
+
+    alloc = np.zeros_like(sizes)
+    present = np.flatnonzero(sizes)
+    if len(present) >= limit:
+        alloc[present[np.argsort(-sizes[present], kind="stable")[:limit]]] = 1
+        return alloc
+
+    alloc[present] = 1
+    spare = sizes - alloc
+    quota = spare * (limit - len(present)) / spare.sum()
+    extra = np.floor(quota).astype(np.int64)
+    short = limit - len(present) - int(extra.sum())
+    extra[np.argsort(-(quota - extra), kind="stable")[:short]] += 1
+    return alloc + extra
+
+def stratified_sample(table: ColumnarTable, x_column: str, y_column: str, strata_column: str, limit: int, seed: int) -> dict:
+    """Sample each value of strata_column in proportion to its share of plottable rows.
+
+    A first pass counts the rows per stratum; the second keeps each
+    stratum's smallest random keys, so rare groups still show up and memory
+    stays bounded by one chunk plus the sample.
+    """
+    labels: Dict[str, int] = {}
+    sizes = np.zeros(MAX_STRATA + 1, dtype=np.int64)
+    for rows, xs, ys in iter_xy(table, x_column, y_column):
+        codes = stratum_codes(table, strata_column, rows, labels)
+        sizes += np.bincount(codes, minlength=len(sizes))
+
+    sizes = sizes[:len(labels)]
+    alloc = allocate(sizes, limit)
+
+    rng = np.random.default_rng(seed)
+    keys = np.zeros(0)
+    sample = np.zeros(0, dtype=np.int64)
+    strata = np.zeros(0, dtype=np.int64)
+    for rows, xs, ys in iter_xy(table, x_column, y_column):
+        keys = np.concatenate((keys, rng.random(len(rows))))
+        sample = np.concatenate((sample, rows))
+        strata = np.concatenate((strata, stratum_codes(table, strata_column, rows, labels)))
+
+        # Rank keys within each stratum and keep each stratum's quota
+        order = np.lexsort((keys, strata))
+        keys, sample, strata = keys[order], sample[order], strata[order]
+        first = np.searchsorted(strata, strata, side="left")
+        keep = np.arange(len(strata)) - first < alloc[strata]
+        keys, sample, strata = keys[keep], sample[keep], strata[keep]
+
+    order = np.argsort(sample)
+    sample, strata = sample[order], strata[order]
+    names = np.array(list(labels), dtype=object)
+
+    data = points(table, x_column, y_column, sample)
+    for point, group in zip(data, names[strata].tolist()):
+        point["group"] = group
+
+    return {
+        "mode": "stratified",
+        "seed": seed,
+        "stratify_column": strata_column,
+        "total_points": int(sizes.sum()),
+        "strata": {name: {"total": int(size), "sampled": int(n)} for name, size, n in zip(names.tolist(), sizes, alloc)},
+        "data": data
+    }
+
+def density_grid(table: ColumnarTable, x_column: str, y_column: str, grid_size: int) -> dict:
+    """Counts of plottable points on a grid_size x grid_size grid over their bounding box"""
+    total = 0
+    x_min = y_min = np.inf
+    x_max = y_max = -np.inf
+    for rows, xs, ys in iter_xy(table, x_column, y_column):
+        if len(rows):
+            total += len(rows)
+            x_min, x_max = min(x_min, xs.min()), max(x_max, xs.max())
+            y_min, y_max = min(y_min, ys.min()), max(y_max, ys.max())
+
+    if not total:
+        return {"mode": "density", "total_points": 0, "grid": None, "data": []}
+
+    # Degenerate axes get a unit-wide range so every point still lands in a cell
+    x_edges = np.linspace(x_min, x_max if x_max > x_min else x_min + 1, grid_size + 1)
+    y_edges = np.linspace(y_min, y_max if y_max > y_min else y_min + 1, grid_size + 1)
+    counts = np.zeros((grid_size, grid_size), dtype=np.int64)
+    for rows, xs, ys in iter_xy(table, x_column, y_column):
+        counts += np.histogram2d(xs, ys, bins=(x_edges, y_edges))[0].astype(np.int64)
+
+    x_centers = (x_edges[:-1] + x_edges[1:]) / 2
+    y_centers = (y_edges[:-1] + y_edges[1:]) / 2
+    ix, iy = np.nonzero(counts)
+    data = [
+        {"x": x, "y": y, "count": c}
+        for x, y, c in zip(x_centers[ix].tolist(), y_centers[iy].tolist(), counts[ix, iy].tolist())
+    ]
+
+    return {
+        "mode": "density",
+        "total_points": total,
+        "grid": {
+            "size": grid_size,
+            "x_min": float(x_min), "x_max": float(x_max),
+            "y_min": float(y_min), "y_max": float(y_max),
+            "x_edges": x_edges.tolist(), "y_edges": y_edges.tolist()
+        },
+        "data": data
+    }
+
+def scatter_sample(
+    table: ColumnarTable,
+    x_column: str,
+    y_column: str,
+    mode: str = "auto",
+    limit: int = 500,
+    seed: int = 42,
+    stratify_column: Optional[str] = None,
+    grid_size: int = 50
+) -> dict:
+    """Points (or density cells) representing the whole dataset for a scatter plot.
+
+    "auto" picks stratified when a stratify column is given, a density grid
+    for tables of more than SCATTER_DENSITY_THRESHOLD rows, and a uniform
+    sample otherwise. The choice goes by the stored row count rather than
+    the plottable points, so it costs no pass over the data. Raises
+    ValueError for unusable arguments.
+    """
+    if mode == "auto":
+        if stratify_column:
+            mode = "stratified"
+        elif table.row_count > SCATTER_DENSITY_THRESHOLD:
+            mode = "density"
+        else:
+            mode = "uniform"
+
+    if mode == "head":
+        return head_sample(table, x_column, y_column, limit)
+    if mode == "uniform":
+        return uniform_sample(table, x_column, y_column, limit, seed)
+    if mode == "stratified":
+        if not stratify_column:
+            raise ValueError("Stratified sampling needs stratify_column")
+        return stratified_sample(table, x_column, y_column, stratify_column, limit, seed)
+    if mode == "density":
+        return density_grid(table, x_column, y_column, grid_size)
+    raise ValueError(f"Unknown sampling mode '{mode}'")
+
+# ==================== ROW SAMPLES ====================
+
+def sample_rows(row_count: int, size: int, seed: int) -> np.ndarray:
+    """Sorted indices of a uniform sample of `size` rows without replacement; the same seed gives the same rows"""
+    if size >= row_count:
+        return np.arange(row_count)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(row_count, size=size, replace=False))
+
+def proportion_interval(hits: int, n: int, population: int, level: float = 0.95) -> tuple:
+    """Wilson score interval at a confidence level for a population share estimated from hits out of n sampled rows.
+
+    The finite population correction narrows the interval as the sample
+    approaches the whole population; a census (n == population) gives the
+    observed share on both ends.
+    """
+    if not n:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    p = hits / n
+    fpc = (population - n) / (population - 1) if population > 1 else 0.0
+    z2 = z * z * fpc
+    center = (p + z2 / (2 * n)) / (1 + z2 / n)
+    half = np.sqrt(z2 * (p * (1 - p) / n + z2 / (4 * n * n))) / (1 + z2 / n)
+    return max(0.0, float(center - half)), min(1.0, float(center + half))
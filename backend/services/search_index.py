@@ -0,0 +1,262 @@
+import os
+import json
+import mmap
+import shutil
+import uuid
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+from services.columnar import ColumnarTable
+
+# Per-column trigram indexes live in a directory next to the dataset file
+SEARCH_INDEX_SUFFIX = ".search"
+SEARCH_INDEX_VERSION = 2
+
+# Smaller tables are scanned directly; an index would not pay for itself
+SEARCH_INDEX_MIN_ROWS = int(os.environ.get("SEARCH_INDEX_MIN_ROWS", 50000))
+
+SEPARATOR = b"\x00"
+
+# Candidate texts checked one by one; above this a vectorized scan is cheaper
+VERIFY_LIMIT = 4096
+
+# ==================== DISTINCT VALUES ====================
+
+def distinct_values(table: ColumnarTable, column: str) -> tuple:
+    """(row codes, lowercased distinct cell texts) for a column.
+
+    Every row's code points at a distinct text, missing cells included
+    (as ""), so matches found among distinct texts map straight to rows.
+    Texts are the cells as uploaded wherever the column keeps them.
+    """
+    text = table.source_text(column)
+    if text is not None:
+        codes = np.asarray(text["codes"]).copy()
+        codes[codes < 0] = len(text["dictionary"])
+        return codes, [v.lower() for v in text["dictionary"]] + [""]
+    codes, uniques = pd.factorize(table.strings(column))
+    return codes, [str(v).lower() for v in uniques]
+
+def rows_for_values(codes: np.ndarray, matched: np.ndarray, n_values: int) -> np.ndarray:
+    lookup = np.zeros(n_values, dtype=bool)
+    lookup[matched] = True
+    return np.flatnonzero(lookup[codes])
+
+# ==================== BUILDING ====================
+
+def pack_texts(texts: List[str]) -> tuple:
+    """Join texts as utf-8, each followed by a separator, with start offsets"""
+    encoded = [t.encode("utf-8") for t in texts]
+    starts = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        starts[1:] = np.cumsum([len(b) + 1 for b in encoded])
+    return starts, SEPARATOR.join(encoded) + SEPARATOR if encoded else b""
+
+def text_trigrams(buf: np.ndarray, starts: np.ndarray, first: int, last: int) -> np.ndarray:
+    """Sorted unique (trigram << 32 | text id) pairs for texts first..last-1"""
+    positions = np.arange(starts[first], max(starts[last] - 2, starts[first]))
+    owner = np.searchsorted(starts, positions, side="right") - 1
+    # Keep trigrams that end before their text's separator
+    valid = positions + 2 < starts[owner + 1] - 1
+    positions, owner = positions[valid], owner[valid]
+
+    keys = (buf[positions].astype(np.uint64) << 16) | (buf[positions + 1].astype(np.uint64) << 8) | buf[positions + 2]
+    return np.unique((keys << 32) | owner.astype(np.uint64))
+
+def trigram_postings(text: bytes, starts: np.ndarray, block_size: int = 8 * 1024 * 1024) -> tuple:
+    """CSR map from byte trigram to the ids of the texts containing it.
+
+    Texts are processed in blocks of about block_size bytes to bound the
+    size of the intermediate position arrays.
+    """
+    buf = np.frombuffer(text, dtype=np.uint8)
+    n_texts = len(starts) - 1
+    blocks = []
+    first = 0
+    while first < n_texts:
+        last = int(np.searchsorted(starts, starts[first] + block_size, side="right")) - 1
+        last = min(max(last, first + 1), n_texts)
+        blocks.append(text_trigrams(buf, starts, first, last))
+        first = last
+
+    pairs = np.unique(np.concatenate(blocks)) if blocks else np.zeros(0, dtype=np.uint64)
+    pair_keys = (pairs >> 32).astype(np.uint32)
+    postings = (pairs & 0xFFFFFFFF).astype(np.int32)
+
+    unique_keys, first_at = np.unique(pair_keys, return_index=True)
+    offsets = np.append(first_at, len(pair_keys)).astype(np.int64)
+    return unique_keys, offsets, postings
+
+def build_column_index(table: ColumnarTable, column: str, dest_dir: str, source_stat: os.stat_result) -> None:
+    """Build one column's index in a scratch directory and move it into place"""
+    codes, texts = distinct_values(table, column)
+    starts, text = pack_texts(texts)
+    keys, key_offsets, postings = trigram_postings(text, starts)
+
+    # Rows grouped by distinct text, so a match expands to rows without a full scan
+    order = np.argsort(codes, kind="stable").astype(np.int64)
+    row_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    row_offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(texts)))
+
+    tmp_dir = f"{dest_dir}.tmp-{uuid.uuid4().hex}"
+    os.makedirs(tmp_dir)
+    try:
+        with open(os.path.join(tmp_dir, "text.bin"), "wb") as f:
+            f.write(text)
+        for name, array in (("starts", starts), ("keys", keys), ("key_offsets", key_offsets),
+                            ("postings", postings), ("codes", codes.astype(np.int32)),
+                            ("rows", order), ("row_offsets", row_offsets)):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SEARCH_INDEX_VERSION,
+                "column": column,
+                "size": source_stat.st_size,
+                "mtime_ns": source_stat.st_mtime_ns,
+                "row_count": table.row_count,
+                "distinct": len(texts)
+            }, f)
+
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, dest_dir)
+        except OSError:
+            # A concurrent build of the same column won the race
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+# ==================== QUERYING ====================
+
+class ColumnIndex:
+    """Memory-mapped view of one column's persisted trigram index"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        for name in ("starts", "keys", "key_offsets", "postings", "codes", "rows", "row_offsets"):
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+
+    def candidates(self, needle: bytes) -> Optional[np.ndarray]:
+        """Ids of texts containing every trigram of needle, or None if it has none"""
+        if len(needle) < 3:
+            return None
+        grams = {needle[i:i + 3] for i in range(len(needle) - 2)}
+        lists = []
+        for gram in grams:
+            key = (gram[0] << 16) | (gram[1] << 8) | gram[2]
+            at = int(np.searchsorted(self.keys, key))
+            if at == len(self.keys) or self.keys[at] != key:
+                return np.zeros(0, dtype=np.int32)
+            lists.append(self.postings[self.key_offsets[at]:self.key_offsets[at + 1]])
+
+        lists.sort(key=len)
+        result = np.asarray(lists[0])
+        for other in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def scan(self, needle: bytes) -> np.ndarray:
+        """Ids of the texts containing needle, by comparing it at every byte offset"""
+        if not len(self.starts) > 1 or self.starts[-1] < len(needle):
+            return np.zeros(0, dtype=np.int64)
+        buf = np.memmap(os.path.join(self.path, "text.bin"), dtype=np.uint8, mode="r")
+        n = len(buf) - len(needle) + 1
+        hit = buf[:n] == needle[0]
+        for i in range(1, len(needle)):
+            if not hit.any():
+                break
+            hit &= buf[i:i + n] == needle[i]
+        # The needle never contains the separator, so no hit spans two texts
+        return np.unique(np.searchsorted(self.starts, np.flatnonzero(hit), side="right") - 1)
+
+    def matching_values(self, needle: bytes) -> np.ndarray:
+        """Ids of the distinct texts containing needle"""
+        candidates = self.candidates(needle)
+        if candidates is None or len(candidates) > VERIFY_LIMIT:
+            # Short needles or unselective trigrams
+            return self.scan(needle)
+
+        # A 3-byte needle is its own trigram: every candidate matches
+        if len(needle) == 3 or not len(candidates):
+            return candidates.astype(np.int64)
+
+        starts = self.starts
+        with open(os.path.join(self.path, "text.bin"), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as text:
+                return np.array([
+                    i for i in candidates.tolist()
+                    if text.find(needle, int(starts[i]), int(starts[i + 1]) - 1) >= 0
+                ], dtype=np.int64)
+
+    def matching_rows(self, needle: bytes) -> np.ndarray:
+        """Sorted row indices whose cell contains needle"""
+        matched = self.matching_values(needle)
+        if not len(matched):
+            return np.zeros(0, dtype=np.int64)
+
+        lengths = self.row_offsets[matched + 1] - self.row_offsets[matched]
+        total = int(lengths.sum())
+        if total > len(self.codes) // 8:
+            return rows_for_values(np.asarray(self.codes), matched, len(self.starts) - 1)
+
+        # Gather the row slices of every matched text without a Python loop
+        starts = self.row_offsets[matched]
+        shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return np.sort(np.asarray(self.rows)[np.arange(total) + shift])
+
+def index_dir(file_path: str) -> str:
+    return file_path + SEARCH_INDEX_SUFFIX
+
+def load_column_index(table: ColumnarTable, column: str, file_path: str) -> ColumnIndex:
+    """Open a column's index, (re)building it if missing or stale"""
+    stat = os.stat(file_path)
+    dest_dir = os.path.join(index_dir(file_path), f"c{table.columns.index(column)}")
+    meta_path = os.path.join(dest_dir, "meta.json")
+
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if (meta.get("version") == SEARCH_INDEX_VERSION and meta.get("column") == column
+                and meta.get("size") == stat.st_size and meta.get("mtime_ns") == stat.st_mtime_ns):
+            return ColumnIndex(dest_dir)
+
+    os.makedirs(index_dir(file_path), exist_ok=True)
+    build_column_index(table, column, dest_dir, stat)
+    return ColumnIndex(dest_dir)
+
+# ==================== SEARCH ====================
+
+def scan_rows(table: ColumnarTable, column: str, needle: str) -> np.ndarray:
+    """Unindexed match: test each distinct cell once and map back to rows"""
+    codes, texts = distinct_values(table, column)
+    matched = np.array([i for i, t in enumerate(texts) if needle in t], dtype=np.int64)
+    return rows_for_values(codes, matched, len(texts))
+
+def search_rows(table: ColumnarTable, columns: List[str], q: str, file_path: str, use_index: bool = True) -> np.ndarray:
+    """Sorted indices of rows where any of columns contains q, case-insensitively.
+
+    With use_index, tables of at least SEARCH_INDEX_MIN_ROWS rows get a
+    persisted trigram index per searched column, built on first use.
+    """
+    needle = q.lower()
+    indexed = use_index and table.row_count >= SEARCH_INDEX_MIN_ROWS and SEPARATOR.decode() not in needle
+
+    matches = []
+    for column in columns:
+        if indexed:
+            matches.append(load_column_index(table, column, file_path).matching_rows(needle.encode("utf-8")))
+        else:
+            matches.append(scan_rows(table, column, needle))
+
+    if len(matches) == 1:
+        return matches[0]
+    found = np.zeros(table.row_count, dtype=bool)
+    for rows in matches:
+        found[rows] = True
+    return np.flatnonzero(found)
@@ -0,0 +1,320 @@
+import os
+import math
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+# Items kept by the top level of a quantile sketch; rank error is about 1/k
+QUANTILE_SKETCH_K = int(os.environ.get("QUANTILE_SKETCH_K", 1024))
+
+# Values pushed into a quantile sketch per compaction round
+QUANTILE_SKETCH_BATCH = int(os.environ.get("QUANTILE_SKETCH_BATCH", 64 * 1024))
+
+# A distinct-count sketch has 2**p one-byte registers; standard error is about 1.04 / sqrt(2**p).
+# p must be at least 11, so the bits after the register index fit a float64 exactly
+DISTINCT_SKETCH_PRECISION = int(os.environ.get("DISTINCT_SKETCH_PRECISION", 14))
+
+# Distinct hashes a distinct-count sketch also keeps outright, so small counts are exact
+DISTINCT_SKETCH_EXACT = int(os.environ.get("DISTINCT_SKETCH_EXACT", 2048))
+
+# Labels a top-k sketch keeps counters for
+TOP_K_SKETCH_CAPACITY = int(os.environ.get("TOP_K_SKETCH_CAPACITY", 100))
+
+# ==================== QUANTILES ====================
+
+class QuantileSketch:
+    """Mergeable KLL-style quantile sketch over floats.
+
+    Level h holds items standing for 2**h values each. When a level
+    outgrows its capacity it is sorted and every other item, from a random
+    offset, moves up a level, so memory stays around a few k items for any
+    number of values. Up to k values it is exact.
+    """
+
+    def __init__(self, k: int = QUANTILE_SKETCH_K, seed: int = 0):
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.zeros(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def capacity(self, level: int) -> int:
+        # Lower levels get geometrically smaller capacities
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                items = np.sort(items)
+                # An odd item out stays behind so total weight is preserved
+                keep, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+                promoted = items[int(self.rng.integers(2))::2]
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], promoted))
+                self.levels[level] = keep
+            level += 1
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        self.count += len(values)
+        # In batches, so a large update never sorts more than a batch at a time
+        for start in range(0, len(values), QUANTILE_SKETCH_BATCH):
+            self.levels[0] = np.concatenate((self.levels[0], values[start:start + QUANTILE_SKETCH_BATCH]))
+            self.compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate((self.levels[level], items))
+        self.count += other.count
+        self.compress()
+
+    def sorted_items(self) -> tuple:
+        """(sorted item values, cumulative weights)"""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=np.int64) for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], np.cumsum(weights[order])
+
+    def value_at_rank(self, rank: int) -> float:
+        """The value with (approximately) `rank` values below it in sorted order"""
+        if not self.count:
+            raise ValueError("Quantile of an empty sketch")
+        values, cumulative = self.sorted_items()
+        return float(values[min(int(np.searchsorted(cumulative, rank, side="right")), len(values) - 1)])
+
+    def quantile(self, q: float) -> float:
+        return self.value_at_rank(int(q * self.count))
+
+    def interpolated_quantile(self, q: float) -> float:
+        """Quantile interpolated between neighbouring ranks like numpy's linear method; exact up to k values"""
+        index = (self.count - 1) * q
+        below = int(np.floor(index))
+        a, b = self.value_at_rank(below), self.value_at_rank(min(below + 1, self.count - 1))
+        return a + (b - a) * (index - below)
+
+    def rank(self, value: float, inclusive: bool = False) -> int:
+        """(Approximately) how many values are below value, or at most value if inclusive"""
+        if not self.count:
+            return 0
+        values, cumulative = self.sorted_items()
+        index = int(np.searchsorted(values, value, side="right" if inclusive else "left"))
+        return int(cumulative[index - 1]) if index else 0
+
+    def to_dict(self) -> dict:
+        """BSON-safe state that from_dict turns back into an equivalent sketch"""
+        return {"k": self.k, "count": self.count, "levels": [items.tobytes() for items in self.levels]}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "QuantileSketch":
+        sketch = cls(state["k"], seed=state["count"])
+        sketch.count = state["count"]
+        sketch.levels = [np.frombuffer(items, dtype=np.float64).copy() for items in state["levels"]]
+        return sketch
+
+# ==================== MOMENTS ====================
+
+class Moments:
+    """Count, mean, sum of squared deviations, min and max of a stream of floats.
+
+    Merging combines the partial sums the way Chan et al. do, so any split
+    of the values into chunks gives the same statistics up to rounding.
+    """
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 low: Optional[float] = None, high: Optional[float] = None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.low = low
+        self.high = high
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        if len(values):
+            mean = float(values.mean())
+            chunk = Moments(len(values), mean, float(((values - mean) ** 2).sum()), float(values.min()), float(values.max()))
+            self.merge(chunk)
+
+    def merge(self, other: "Moments") -> None:
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2, self.low, self.high = other.count, other.mean, other.m2, other.low, other.high
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.low, self.high = min(self.low, other.low), max(self.high, other.high)
+
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1), NaN for fewer than two values like pandas"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float("nan")
+
+    def to_dict(self) -> dict:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "min": self.low, "max": self.high}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "Moments":
+        return cls(state["count"], state["mean"], state["m2"], state["min"], state["max"])
+
+# ==================== DISTINCT COUNTS ====================
+
+class DistinctSketch:
+    """HyperLogLog distinct counter over 64-bit hashes.
+
+    The first p bits of a hash pick a register, which keeps the longest run
+    of leading zeros seen in the remaining bits (plus one); merging takes
+    the register-wise maximum. Until more than `exact` distinct hashes have
+    been seen they are kept as well, so small counts are exact.
+    """
+
+    def __init__(self, precision: int = DISTINCT_SKETCH_PRECISION, exact: int = DISTINCT_SKETCH_EXACT):
+        self.precision = precision
+        self.exact = exact
+        self.registers = np.zeros(2 ** precision, dtype=np.uint8)
+        self.hashes: Optional[np.ndarray] = np.zeros(0, dtype=np.uint64)
+
+    def update(self, hashes: np.ndarray) -> None:
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        p = np.uint64(self.precision)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # frexp's exponent is the bit length of each (exactly representable) remainder
+        runs = (64 - self.precision + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.uint8)
+        np.maximum.at(self.registers, (hashes >> (np.uint64(64) - p)).astype(np.int64), runs)
+
+        if self.hashes is not None:
+            # The registers already bound the count; only hash-dedupe when it can still be small
+            if self.hll_estimate() > 2 * self.exact:
+                self.hashes = None
+            else:
+                self.keep(np.concatenate((self.hashes, pd.unique(hashes))))
+
+    def keep(self, hashes: np.ndarray) -> None:
+        hashes = np.unique(hashes)
+        self.hashes = hashes if len(hashes) <= self.exact else None
+
+    def merge(self, other: "DistinctSketch") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+        if self.hashes is not None and other.hashes is not None:
+            self.keep(np.concatenate((self.hashes, other.hashes)))
+        else:
+            self.hashes = None
+
+    def hll_estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            return m * math.log(m / zeros)
+        return raw
+
+    def estimate(self) -> int:
+        if self.hashes is not None:
+            return len(self.hashes)
+        return int(round(self.hll_estimate()))
+
+    def to_dict(self) -> dict:
+        return {
+            "precision": self.precision,
+            "exact": self.exact,
+            "registers": self.registers.tobytes(),
+            "hashes": self.hashes.tobytes() if self.hashes is not None else None
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "DistinctSketch":
+        sketch = cls(state["precision"], state["exact"])
+        sketch.registers = np.frombuffer(state["registers"], dtype=np.uint8).copy()
+        if state["hashes"] is None:
+            sketch.hashes = None
+        else:
+            sketch.hashes = np.frombuffer(state["hashes"], dtype=np.uint64).copy()
+        return sketch
+
+# ==================== FREQUENT VALUES ====================
+
+class TopKSketch:
+    """Mergeable Space-Saving summary of the most frequent labels.
+
+    A kept label's count overestimates its true count by at most its error;
+    a label that is not kept occurs at most `floor` times. Merging credits
+    a label missing from one side with that side's floor, as
+    value_counts.merge_summaries does for a single chunk.
+    """
+
+    def __init__(self, capacity: int = TOP_K_SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.labels: List[str] = []
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.errors = np.zeros(0, dtype=np.int64)
+        self.floor = 0
+
+    def update(self, values: np.ndarray, counts: np.ndarray) -> None:
+        """Fold in the exact counts of a chunk's distinct values"""
+        chunk = TopKSketch(self.capacity)
+        counts = np.asarray(counts, dtype=np.int64)
+        keep = np.arange(len(counts))
+        if len(counts) > self.capacity:
+            keep = np.argpartition(-counts, self.capacity - 1)[:self.capacity]
+            dropped = np.ones(len(counts), dtype=bool)
+            dropped[keep] = False
+            chunk.floor = int(counts[dropped].max())
+        chunk.labels = [str(values[i]) for i in keep.tolist()]
+        chunk.counts = counts[keep]
+        chunk.errors = np.zeros(len(keep), dtype=np.int64)
+        self.merge(chunk)
+
+    def merge(self, other: "TopKSketch") -> None:
+        labels = list(dict.fromkeys(self.labels + other.labels))
+        mine = dict(zip(self.labels, range(len(self.labels))))
+        theirs = dict(zip(other.labels, range(len(other.labels))))
+        counts = np.zeros(len(labels), dtype=np.int64)
+        errors = np.zeros(len(labels), dtype=np.int64)
+        for i, label in enumerate(labels):
+            for sketch, index in ((self, mine), (other, theirs)):
+                if label in index:
+                    counts[i] += sketch.counts[index[label]]
+                    errors[i] += sketch.errors[index[label]]
+                else:
+                    counts[i] += sketch.floor
+                    errors[i] += sketch.floor
+
+        floor = self.floor + other.floor
+        if len(labels) > self.capacity:
+            order = np.argsort(-counts, kind="stable")
+            floor = max(floor, int(counts[order[self.capacity]]))
+            keep = order[:self.capacity]
+            labels, counts, errors = [labels[i] for i in keep.tolist()], counts[keep], errors[keep]
+        self.labels, self.counts, self.errors, self.floor = labels, counts, errors, floor
+
+    def top(self, n: int) -> List[tuple]:
+        """(label, count) of the n largest counters, ties in the order labels were first kept"""
+        order = np.argsort(-self.counts, kind="stable")[:n]
+        return [(self.labels[i], int(self.counts[i])) for i in order.tolist()]
+
+    def to_dict(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "labels": self.labels,
+            "counts": self.counts.tolist(),
+            "errors": self.errors.tolist(),
+            "floor": self.floor
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "TopKSketch":
+        sketch = cls(state["capacity"])
+        sketch.labels = list(state["labels"])
+        sketch.counts = np.array(state["counts"], dtype=np.int64)
+        sketch.errors = np.array(state["errors"], dtype=np.int64)
+        sketch.floor = state["floor"]
+        return sketch
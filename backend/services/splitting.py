@@ -0,0 +1,113 @@
+import os
+import csv
+import hashlib
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+from services.columnar import ColumnarTable
+from services.sampling import MAX_STRATA, stratum_codes
+
+SPLIT_NAMES = ["train", "val", "test"]
+
+# Rows hashed and written per step; memory stays bounded by this
+SPLIT_CHUNK_ROWS = int(os.environ.get("SPLIT_CHUNK_ROWS", 64 * 1024))
+
+# Resolution of the per-class hash histograms used to stratify
+STRATIFY_BUCKETS = 4096
+
+# ==================== HASHING ====================
+
+def seed_key(seed: Optional[int]) -> str:
+    """16-character hash key derived from the split seed"""
+    return hashlib.md5(str(seed).encode("utf-8")).hexdigest()[:16]
+
+def unit_hashes(table: ColumnarTable, rows: slice, key_column: Optional[str], hash_key: str) -> np.ndarray:
+    """A number in [0, 1) per row, from the key column's text or else the whole row's.
+
+    The value depends only on the hashed text and the seed, never on where
+    the row sits in the file.
+    """
+    if key_column:
+        hashes = pd.util.hash_array(table.strings(key_column, rows), hash_key=hash_key, categorize=False)
+    else:
+        frame = pd.DataFrame({i: table.strings(name, rows) for i, name in enumerate(table.columns)})
+        hashes = pd.util.hash_pandas_object(frame, index=False, hash_key=hash_key, categorize=False).to_numpy()
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+def closest_cut(cumulative: np.ndarray, target: float) -> int:
+    """Bucket edge whose count of rows below it is closest to target"""
+    return int(np.argmin(np.abs(cumulative - target)))
+
+def stratified_cuts(table: ColumnarTable, key_column: Optional[str], strata_column: str,
+                    hash_key: str, ratios: tuple, labels: Dict[str, int]) -> np.ndarray:
+    """Per-class (train, val) cut points on the row hashes.
+
+    A first pass histograms each class's hashes, and each class gets the
+    bucket edges that put the closest counts to its ratios below them, so
+    even small classes land in every split in about the right proportion.
+    The cuts depend on every row of a class: reordering keeps them, adding
+    rows can move them.
+    """
+    hist = np.zeros((MAX_STRATA + 1) * STRATIFY_BUCKETS, dtype=np.int64)
+    for start in range(0, table.row_count, SPLIT_CHUNK_ROWS):
+        rows = slice(start, min(start + SPLIT_CHUNK_ROWS, table.row_count))
+        codes = stratum_codes(table, strata_column, np.arange(rows.start, rows.stop), labels)
+        buckets = (unit_hashes(table, rows, key_column, hash_key) * STRATIFY_BUCKETS).astype(np.int64)
+        hist += np.bincount(codes * STRATIFY_BUCKETS + buckets, minlength=len(hist))
+
+    hist = hist.reshape(MAX_STRATA + 1, STRATIFY_BUCKETS)[:len(labels)]
+    cuts = np.zeros((len(labels), 2))
+    for code, counts in enumerate(hist):
+        cumulative = np.concatenate(([0], np.cumsum(counts)))
+        train_cut = closest_cut(cumulative, counts.sum() * ratios[0])
+        val_cut = max(closest_cut(cumulative, counts.sum() * (ratios[0] + ratios[1])), train_cut)
+        cuts[code] = (train_cut / STRATIFY_BUCKETS, val_cut / STRATIFY_BUCKETS)
+    return cuts
+
+# ==================== SPLITTING ====================
+
+def hash_split(table: ColumnarTable, paths: Dict[str, str], ratios: tuple, seed: Optional[int],
+               key_column: Optional[str] = None, strata_column: Optional[str] = None) -> Dict[str, int]:
+    """Write train/val/test CSVs by hashing each row, returning the row count of each.
+
+    A row's split depends only on its key (or content) and the seed, so
+    reordering rows never moves them between splits, and without
+    strata_column neither does appending rows. Stratified cuts are fitted
+    to the data (see stratified_cuts), so appended rows can shift them and
+    move existing rows that hash close to a cut. Cells are written as
+    uploaded. All three files are written in one pass a chunk at a time.
+    Raises ValueError when strata_column has more than MAX_STRATA values.
+    """
+    hash_key = seed_key(seed)
+    labels: Dict[str, int] = {}
+    if strata_column:
+        cuts = stratified_cuts(table, key_column, strata_column, hash_key, ratios, labels)
+    else:
+        cuts = np.array([[ratios[0], ratios[0] + ratios[1]]])
+
+    counts = {name: 0 for name in SPLIT_NAMES}
+    files = {name: open(paths[name], "w", encoding="utf-8", newline="") for name in SPLIT_NAMES}
+    try:
+        writers = {name: csv.writer(f) for name, f in files.items()}
+        for writer in writers.values():
+            writer.writerow(table.columns)
+
+        for start in range(0, table.row_count, SPLIT_CHUNK_ROWS):
+            rows = slice(start, min(start + SPLIT_CHUNK_ROWS, table.row_count))
+            u = unit_hashes(table, rows, key_column, hash_key)
+            if strata_column:
+                row_cuts = cuts[stratum_codes(table, strata_column, np.arange(rows.start, rows.stop), labels)]
+            else:
+                row_cuts = np.broadcast_to(cuts, (len(u), 2))
+            assignment = (u >= row_cuts[:, 0]).astype(np.int64) + (u >= row_cuts[:, 1])
+
+            for i, name in enumerate(SPLIT_NAMES):
+                selected = np.flatnonzero(assignment == i) + start
+                if len(selected):
+                    writers[name].writerows(zip(*[table.strings(c, selected).tolist() for c in table.columns]))
+                    counts[name] += len(selected)
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
@@ -0,0 +1,188 @@
+import os
+import uuid
+import hashlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional, Tuple
+import aiofiles
+from pymongo import ReturnDocument
+
+# Size of each read/write while streaming an upload to disk
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1MB
+
+
+class FileTooLargeError(Exception):
+    """Raised when a streamed upload exceeds the configured size limit"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File too large. Maximum size is {max_size // (1024*1024)}MB")
+
+
+async def iter_upload_chunks(file, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield an UploadFile's content in fixed-size chunks"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def stream_to_disk(
+    chunks: AsyncIterator[bytes],
+    dest_path: str,
+    max_size: Optional[int] = None
+) -> dict:
+    """Write chunks to dest_path, enforcing max_size and hashing as bytes arrive.
+
+    Peak memory is bounded by a single chunk. On any failure the partial file
+    is removed before the exception propagates.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(dest_path, 'wb') as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLargeError(max_size)
+                sha256.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+
+    return {"size": size, "sha256": sha256.hexdigest()}
+
+
+class ChunkSizeMismatchError(Exception):
+    """Raised when a resumable-upload chunk is not the length the session expects"""
+
+
+async def preallocate_file(path: str, size: int) -> None:
+    """Create (or resize) a sparse file of the given size for out-of-order chunk writes"""
+    async with aiofiles.open(path, 'ab') as f:
+        await f.truncate(size)
+
+
+async def write_at_offset(
+    chunks: AsyncIterator[bytes],
+    path: str,
+    offset: int,
+    expected_size: int
+) -> dict:
+    """Stream chunks into an existing file starting at offset.
+
+    Writing stops with ChunkSizeMismatchError as soon as more than
+    expected_size bytes arrive, or if fewer arrive by the end of the body.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(path, 'r+b') as f:
+        await f.seek(offset)
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > expected_size:
+                raise ChunkSizeMismatchError(f"Chunk larger than expected {expected_size} bytes")
+            sha256.update(chunk)
+            await f.write(chunk)
+    if size != expected_size:
+        raise ChunkSizeMismatchError(f"Chunk has {size} bytes, expected {expected_size}")
+    return {"size": size, "sha256": sha256.hexdigest()}
+
+
+async def hash_file(path: str, chunk_size: int = UPLOAD_CHUNK_SIZE) -> str:
+    """Compute the SHA-256 of a file on disk without loading it into memory"""
+    sha256 = hashlib.sha256()
+    async with aiofiles.open(path, 'rb') as f:
+        while True:
+            chunk = await f.read(chunk_size)
+            if not chunk:
+                break
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+# ==================== CONTENT-ADDRESSED BLOBS ====================
+
+def blob_path(blob_dir: str, sha256: str, ext: str) -> str:
+    """Location of a blob, fanned out by the first two hex digits of its hash"""
+    return os.path.join(blob_dir, sha256[:2], f"{sha256}{ext}")
+
+
+async def store_blob(db, blob_dir: str, tmp_path: str, sha256: str, size: int, ext: str) -> Tuple[str, bool]:
+    """Move a fully written upload into the blob store, or drop it if the content already exists.
+
+    Each call takes one reference on the blob in db.blobs. The reference is
+    taken before looking at the blob's file, so a concurrent release_blob
+    either sees it and keeps the file or has already moved the file away,
+    in which case it is restored from the upload. Returns the blob's path
+    and whether the upload was a duplicate of an existing blob.
+    """
+    blob = await db.blobs.find_one_and_update(
+        {"sha256": sha256},
+        {
+            "$inc": {"ref_count": 1},
+            "$setOnInsert": {
+                "path": blob_path(blob_dir, sha256, ext),
+                "size": size,
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }
+        },
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    path = blob["path"]
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return path, blob["ref_count"] > 1
+
+    path = blob_path(blob_dir, sha256, ext)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Identical content, so replacing a concurrently stored copy is harmless
+    os.replace(tmp_path, path)
+    if path != blob["path"]:
+        await db.blobs.update_one({"sha256": sha256}, {"$set": {"path": path}})
+    return path, False
+
+
+async def retain_blob(db, sha256: str) -> bool:
+    """Take one more reference on a stored blob; False if the hash is not in the blob store"""
+    result = await db.blobs.update_one({"sha256": sha256}, {"$inc": {"ref_count": 1}})
+    return bool(result.matched_count)
+
+
+async def release_blob(db, sha256: str) -> Optional[bool]:
+    """Drop one reference to a blob, deleting it from disk when none remain.
+
+    Returns None if the hash is not in the blob store (legacy uploads), else
+    whether the blob was removed.
+    """
+    blob = await db.blobs.find_one_and_update(
+        {"sha256": sha256},
+        {"$inc": {"ref_count": -1}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not blob:
+        return None
+    if blob["ref_count"] > 0:
+        return False
+
+    result = await db.blobs.delete_one({"sha256": sha256, "ref_count": {"$lte": 0}})
+    if not result.deleted_count or not os.path.exists(blob["path"]):
+        return bool(result.deleted_count)
+
+    # Move the file aside before deleting it: a store_blob that took a new
+    # reference in the meantime gets it back
+    doomed_path = f"{blob['path']}.{uuid.uuid4().hex}.deleting"
+    try:
+        os.rename(blob["path"], doomed_path)
+    except FileNotFoundError:
+        return True
+    if await db.blobs.find_one({"sha256": sha256}, {"_id": 0, "sha256": 1}):
+        os.replace(doomed_path, blob["path"])
+        return False
+    os.remove(doomed_path)
+    return True
@@ -0,0 +1,134 @@
+import os
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+from services.columnar import ColumnarTable
+
+# Memory budget for parsed tables shared by the exploration endpoints
+TABLE_CACHE_BYTES = int(os.environ.get("TABLE_CACHE_BYTES", 512 * 1024 * 1024))
+
+# ==================== KEYS ====================
+
+def table_cache_key(dataset: dict) -> tuple:
+    """Identify the exact bytes a table was parsed from.
+
+    The file's size and mtime catch in-place rewrites, and the column store's
+    build time makes a table parsed before ingest finished get replaced by the
+    memory-mapped store once it is ready.
+    """
+    stat = os.stat(dataset["file_path"])
+    columnar = dataset.get("columnar") or {}
+    return (
+        dataset["id"],
+        dataset.get("sha256"),
+        stat.st_size,
+        stat.st_mtime_ns,
+        columnar.get("built_at") if columnar.get("status") == "ready" else None
+    )
+
+# ==================== CACHE ====================
+
+class TableCache:
+    """Process-wide LRU of ColumnarTables bounded by approximate heap bytes.
+
+    Tables load their columns lazily after being handed out, so entry sizes
+    are re-measured whenever the cache is touched and the least recently
+    used tables are evicted until the total fits the budget again.
+    """
+
+    def __init__(self, max_bytes: int = TABLE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, ColumnarTable]" = OrderedDict()
+        self._loading: Dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Optional[ColumnarTable]:
+        with self._lock:
+            table = self._entries.get(key)
+            if table is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            self._evict()
+            return table
+
+    def put(self, key: tuple, table: ColumnarTable) -> None:
+        with self._lock:
+            # Older versions of the same dataset can never be hit again
+            for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+                del self._entries[stale]
+                self.invalidations += 1
+            self._entries[key] = table
+            self._entries.move_to_end(key)
+            self._evict()
+
+    async def get_or_load(self, key: tuple, loader: Callable[[], Awaitable[ColumnarTable]]) -> ColumnarTable:
+        """Return the cached table for key, loading it at most once for concurrent callers"""
+        table = self.get(key)
+        if table is not None:
+            return table
+
+        pending = self._loading.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            table = await loader()
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't warn about an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            self._loading.pop(key, None)
+
+        self.put(key, table)
+        future.set_result(table)
+        return table
+
+    def invalidate(self, dataset_id: str) -> int:
+        """Drop every cached version of a dataset"""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == dataset_id]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def _evict(self) -> None:
+        sizes = {key: table.memory_usage() for key, table in self._entries.items()}
+        total = sum(sizes.values())
+        while self._entries and total > self.max_bytes:
+            key, _ = self._entries.popitem(last=False)
+            total -= sizes[key]
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(table.memory_usage() for table in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+table_cache = TableCache()
@@ -0,0 +1,210 @@
+import os
+import heapq
+import uuid
+from typing import List, Optional
+import numpy as np
+
+from services.columnar import ColumnarTable, decode_dictionary, encode_dictionary
+
+VALUE_COUNTS_SUFFIX = ".counts.npz"
+
+# Bar charts switch to the approximate top-k on tables larger than this
+# when a column's exact counts have not been computed yet
+APPROX_MIN_ROWS = int(os.environ.get("APPROX_MIN_ROWS", 10_000_000))
+
+# Counters kept per requested item by the Space-Saving summary
+SPACE_SAVING_FACTOR = 20
+SPACE_SAVING_CHUNK_ROWS = 1024 * 1024
+
+# ==================== EXACT COUNTS ====================
+
+def blank_code(col: dict) -> int:
+    """Dictionary code of the "" entry, which missing cells render as too"""
+    if col["kind"] == "string" and "" in col["dictionary"]:
+        return col["dictionary"].index("")
+    return -1
+
+def row_keys(col: dict, chunk: np.ndarray, blank: int = -1) -> np.ndarray:
+    """Integer key per row such that equal keys always render to the same text.
+
+    String columns use their dictionary codes, with missing cells folded
+    into the "" entry they render as; floats use their bit patterns with a
+    single NaN, so -0.0 and 0.0 stay apart like their renderings.
+    """
+    chunk = np.asarray(chunk)
+    if col["kind"] == "string":
+        return np.where(chunk < 0, blank, chunk).astype(np.int64)
+    if chunk.dtype.kind == "f":
+        # Float columns, and int columns with missing cells stored as NaN,
+        # where -0.0 renders as "0" like 0.0 does
+        if col["kind"] == "int":
+            chunk = chunk + 0.0
+        return np.where(np.isnan(chunk), np.nan, chunk).view(np.int64)
+    return chunk.astype(np.int64)
+
+def keyed_column(table: ColumnarTable, column: str) -> tuple:
+    """(column, per-row array to key on): the source text's codes where the column keeps it"""
+    text = table.source_text(column)
+    if text is not None:
+        return {"kind": "string", **text}, text["codes"]
+    col = table.column(column)
+    return col, col["values"]
+
+def text_value_counts(codes: np.ndarray, dictionary: List[str]) -> dict:
+    """Counts of dictionary-coded texts, missing cells counted as "".
+
+    Codes are numbered in order of first appearance, so the dictionary is
+    already in that order; only the "" bucket may move up to where the
+    first missing cell is.
+    """
+    codes = np.asarray(codes)
+    labels = list(dictionary)
+    blank = labels.index("") if "" in labels else len(labels)
+    missing = codes < 0
+    if missing.any() and blank == len(labels):
+        labels.append("")
+    counts = np.bincount(np.where(missing, blank, codes), minlength=len(labels)).astype(np.int64)
+
+    if missing.any():
+        first = int(np.argmax(missing))
+        at = int(codes[:first].max()) + 1 if first else 0
+        if at < blank:
+            labels.insert(at, labels.pop(blank))
+            counts = np.insert(np.delete(counts, blank), at, counts[blank])
+    return {"labels": labels, "counts": counts}
+
+def compute_value_counts(table: ColumnarTable, column: str) -> dict:
+    """Exact counts of every rendered value of a column, in first-appearance order"""
+    text = table.source_text(column)
+    if text is not None:
+        return text_value_counts(text["codes"], text["dictionary"])
+
+    col = table.column(column)
+    keys = row_keys(col, col["values"])
+    _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.argsort(first, kind="stable")
+    return {"labels": table.strings(column, first[order]).tolist(), "counts": counts[order].astype(np.int64)}
+
+def save_value_counts(path: str, value_counts: dict) -> None:
+    offsets, blob = encode_dictionary(value_counts["labels"])
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+    np.savez(tmp_path, offsets=offsets, blob=np.frombuffer(blob, dtype=np.uint8), counts=value_counts["counts"])
+    os.replace(tmp_path, path)
+
+def read_value_counts(path: str) -> dict:
+    with np.load(path) as data:
+        return {"labels": decode_dictionary(data["offsets"], data["blob"].tobytes()), "counts": data["counts"]}
+
+def has_value_counts(table: ColumnarTable, column: str) -> bool:
+    path = table.sidecar_path(column, VALUE_COUNTS_SUFFIX)
+    return ("value_counts", column) in table.derived or bool(path and os.path.exists(path))
+
+def load_value_counts(table: ColumnarTable, column: str) -> dict:
+    """A column's exact value counts, computed once and kept next to the column store"""
+    key = ("value_counts", column)
+    if key in table.derived:
+        return table.derived[key]
+
+    path = table.sidecar_path(column, VALUE_COUNTS_SUFFIX)
+    if path and os.path.exists(path):
+        value_counts = read_value_counts(path)
+    else:
+        value_counts = compute_value_counts(table, column)
+        if path:
+            save_value_counts(path, value_counts)
+
+    table.derived[key] = value_counts
+    return value_counts
+
+def relabel_blank(value_counts: dict, blank_label: str) -> dict:
+    """Show "" as blank_label, merging with a literal blank_label value if there is one"""
+    labels = list(value_counts["labels"])
+    counts = np.array(value_counts["counts"])
+    if "" not in labels:
+        return value_counts
+
+    labels[labels.index("")] = blank_label
+    same = [i for i, label in enumerate(labels) if label == blank_label]
+    if len(same) > 1:
+        first, other = same
+        counts[first] += counts[other]
+        del labels[other]
+        counts = np.delete(counts, other)
+    return {"labels": labels, "counts": counts}
+
+def top_values(value_counts: dict, n: int) -> List[tuple]:
+    """(label, count) of the n most frequent values, ties in first-appearance order"""
+    counts = value_counts["counts"]
+    top = np.argsort(-counts, kind="stable")[:n]
+    return [(value_counts["labels"][i], int(counts[i])) for i in top.tolist()]
+
+def smallest_labels(value_counts: dict, n: int) -> List[str]:
+    return heapq.nsmallest(n, value_counts["labels"])
+
+# ==================== APPROXIMATE TOP-K ====================
+
+def merge_summaries(keys: np.ndarray, counts: np.ndarray, errors: np.ndarray, floor: int,
+                    chunk_keys: np.ndarray, chunk_counts: np.ndarray, capacity: int) -> tuple:
+    """Fold a chunk's exact counts into a Space-Saving summary of at most `capacity` counters.
+
+    Keys new to the summary may have been evicted before, so they inherit
+    the current floor (the smallest retained count) as both count and error.
+    """
+    merged, inverse = np.unique(np.concatenate((keys, chunk_keys)), return_inverse=True)
+    old, new = inverse[:len(keys)], inverse[len(keys):]
+
+    total = np.full(len(merged), floor, dtype=np.int64)
+    error = np.full(len(merged), floor, dtype=np.int64)
+    total[old] = counts
+    error[old] = errors
+    total[new] += chunk_counts
+
+    if len(merged) > capacity:
+        keep = np.argpartition(-total, capacity - 1)[:capacity]
+        merged, total, error = merged[keep], total[keep], error[keep]
+        floor = int(total.min())
+    return merged, total, error, floor
+
+def space_saving_top(table: ColumnarTable, column: str, n: int, capacity: Optional[int] = None,
+                     blank_label: Optional[str] = None) -> dict:
+    """Approximate top-n values in one bounded-memory pass (Space-Saving).
+
+    Each reported count is an upper bound that overestimates the true count
+    by at most its "error"; no value missing from the result occurs more
+    than "error_bound" times, which is at most rows / capacity. With
+    blank_label, "" is reported under that name like relabel_blank does.
+    """
+    capacity = capacity or n * SPACE_SAVING_FACTOR
+    col, source = keyed_column(table, column)
+    blank = blank_code(col)
+
+    keys = np.zeros(0, dtype=np.int64)
+    counts = np.zeros(0, dtype=np.int64)
+    errors = np.zeros(0, dtype=np.int64)
+    rows = np.zeros(0, dtype=np.int64)
+    floor = 0
+    for start in range(0, table.row_count, SPACE_SAVING_CHUNK_ROWS):
+        chunk = row_keys(col, source[start:start + SPACE_SAVING_CHUNK_ROWS], blank)
+        chunk_keys, first, chunk_counts = np.unique(chunk, return_index=True, return_counts=True)
+
+        known = dict(zip(keys.tolist(), rows.tolist()))
+        keys, counts, errors, floor = merge_summaries(keys, counts, errors, floor, chunk_keys, chunk_counts, capacity)
+        # Remember one row per counter so its value can be rendered at the end
+        seen = dict(zip(chunk_keys.tolist(), (first + start).tolist()))
+        rows = np.array([known[k] if k in known else seen[k] for k in keys.tolist()], dtype=np.int64)
+
+    order = np.lexsort((rows, -counts))
+    labels = table.strings(column, rows[order]).tolist() if len(order) else []
+    items = {}
+    for label, c, e in zip(labels, counts[order].tolist(), errors[order].tolist()):
+        if blank_label is not None and label == "":
+            label = blank_label
+        item = items.setdefault(label, {"name": label, "count": 0, "error": 0})
+        item["count"] += c
+        item["error"] += e
+
+    return {
+        "data": sorted(items.values(), key=lambda item: item["count"], reverse=True)[:n],
+        "error_bound": floor,
+        "capacity": capacity
+    }
@@ -6,6 +6,7 @@ Tests dataset storage, listing, preview, statistics, deletion, exploration, char
 
 import requests
 import os
+import csv
 import tempfile
 import json
 from pathlib import Path
@@ -275,6 +276,125 @@ def test_csv_preview():
         print(f"❌ CSV preview error: {str(e)}")
         return False
 
+def create_numeric_text_csv():
+    """Create a CSV whose numeric-looking cells are not in canonical number form"""
+    csv_content = """id,code,price,amount
+a,007,1.50,1e3
+b,12,2.0,NA
+c,,3,2"""
+    
+    temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False)
+    temp_file.write(csv_content)
+    temp_file.close()
+    return temp_file.name, csv_content
+
+def test_numeric_text_round_trip():
+    """Test that leading zeros, trailing zeros and exponent forms come back as uploaded"""
+    print("\n=== PART 4: Testing Numeric Text Round Trip ===")
+    
+    csv_file, csv_content = create_numeric_text_csv()
+    dataset_id = None
+    
+    try:
+        with open(csv_file, 'rb') as f:
+            files = {'file': ('numeric_text.csv', f, 'text/csv')}
+            response = requests.post(f"{API_BASE}/datasets/upload", files=files, timeout=30)
+        
+        if response.status_code != 200:
+            print(f"❌ Failed to upload numeric text CSV: {response.text}")
+            return False
+        
+        dataset_id = response.json()['id']
+        lines = csv_content.split("\n")
+        header = lines[0].split(",")
+        expected = [dict(zip(header, line.split(","))) for line in lines[1:]]
+        
+        # A filter matching every row returns each cell as rendered from the typed columns
+        filters = [{"column": "id", "operator": "ne", "value": "zzz"}]
+        response = requests.post(f"{API_BASE}/datasets/{dataset_id}/filter", json=filters, timeout=10)
+        if response.status_code != 200:
+            print(f"❌ Filter failed: {response.text}")
+            return False
+        
+        rows = response.json()['rows']
+        if rows != expected:
+            print(f"❌ Cells changed: expected {expected}, got {rows}")
+            return False
+        print("✅ Filtered rows match the uploaded cells")
+        
+        response = requests.get(f"{API_BASE}/datasets/{dataset_id}/search?q=007&column=code", timeout=10)
+        if response.status_code != 200 or response.json()['match_count'] != 1:
+            print(f"❌ Search for '007' failed: {response.text}")
+            return False
+        print("✅ Search finds '007' as uploaded")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Numeric text round trip error: {str(e)}")
+        return False
+    finally:
+        os.unlink(csv_file)
+        if dataset_id:
+            try:
+                requests.delete(f"{API_BASE}/datasets/{dataset_id}")
+            except:
+                pass
+
+def create_stray_quote_csv():
+    """Create a CSV with an inch mark inside an unquoted cell"""
+    csv_content = """a,b
+1,5" pipe
+2,x
+3,y
+"""
+    
+    temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False)
+    temp_file.write(csv_content)
+    temp_file.close()
+    return temp_file.name
+
+def test_csv_preview_stray_quote():
+    """Test that a quote in the middle of an unquoted cell does not hide later rows from preview pages"""
+    print("\n=== PART 4: Testing CSV Preview With A Stray Quote ===")
+    
+    csv_file = create_stray_quote_csv()
+    dataset_id = None
+    
+    try:
+        with open(csv_file, 'rb') as f:
+            files = {'file': ('stray_quote.csv', f, 'text/csv')}
+            response = requests.post(f"{API_BASE}/datasets/upload", files=files, timeout=30)
+        
+        if response.status_code != 200:
+            print(f"❌ Failed to upload stray quote CSV: {response.text}")
+            return False
+        
+        dataset_id = response.json()['id']
+        
+        response = requests.get(f"{API_BASE}/datasets/{dataset_id}/preview/csv?rows=10&offset=1", timeout=10)
+        if response.status_code != 200:
+            print(f"❌ CSV preview failed: {response.text}")
+            return False
+        
+        data = response.json()
+        expected = [{"a": "2", "b": "x"}, {"a": "3", "b": "y"}]
+        if data['total_rows'] != 3 or data['rows'] != expected:
+            print(f"❌ Expected 3 rows and page {expected}, got {data['total_rows']} rows and page {data['rows']}")
+            return False
+        print("✅ Rows after a stray quote are counted and paged")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Stray quote preview error: {str(e)}")
+        return False
+    finally:
+        os.unlink(csv_file)
+        if dataset_id:
+            try:
+                requests.delete(f"{API_BASE}/datasets/{dataset_id}")
+            except:
+                pass
+
 # ==================== PART 5: IMAGE PREVIEW TESTS ====================
 
 def test_image_preview():
@@ -506,6 +626,73 @@ def test_dataset_statistics():
     
     return all(results.values()), results
 
+def create_missing_token_csv():
+    """Create a CSV mixing blank cells with "NA"-like text"""
+    csv_content = """id,score,note
+1,10,a
+2,NA,c
+3,,NA
+4,5,b"""
+    
+    temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False)
+    temp_file.write(csv_content)
+    temp_file.close()
+    return temp_file.name
+
+def test_missing_token_statistics():
+    """Test that only blank cells count as missing and "NA" stays text"""
+    print("\n=== PART 7: Testing Missing Token Statistics ===")
+    
+    csv_file = create_missing_token_csv()
+    csv_id = None
+    
+    try:
+        with open(csv_file, 'rb') as f:
+            files = {'file': ('missing_tokens.csv', f, 'text/csv')}
+            response = requests.post(f"{API_BASE}/datasets/upload", files=files, timeout=30)
+        
+        if response.status_code != 200:
+            print(f"❌ Failed to upload missing token CSV: {response.text}")
+            return False
+        
+        csv_id = response.json()['id']
+        response = requests.get(f"{API_BASE}/datasets/{csv_id}/stats?refresh=true", timeout=10)
+        if response.status_code != 200:
+            print(f"❌ Stats failed: {response.text}")
+            return False
+        
+        column_stats = response.json()['column_stats']
+        expected = {
+            'id': {'null_count': 0, 'non_null_count': 4, 'unique_count': 4, 'type': 'numeric'},
+            'score': {'null_count': 1, 'non_null_count': 3, 'unique_count': 3, 'type': 'string'},
+            'note': {'null_count': 0, 'non_null_count': 4, 'unique_count': 4, 'type': 'string'}
+        }
+        for column, fields in expected.items():
+            actual = {key: column_stats[column].get(key) for key in fields}
+            if actual != fields:
+                print(f"❌ Stats for '{column}': expected {fields}, got {actual}")
+                return False
+        print("✅ Blank cells are missing, 'NA' is counted as text")
+        
+        missing_data = {"strategy": "drop", "columns": ["score", "note"]}
+        response = requests.post(f"{API_BASE}/datasets/{csv_id}/preprocess/missing", json=missing_data, timeout=10)
+        if response.status_code != 200 or response.json()['removed_rows'] != 1:
+            print(f"❌ Drop missing should remove 1 row: {response.text}")
+            return False
+        print("✅ Drop missing removes only the row with a blank cell")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Missing token statistics error: {str(e)}")
+        return False
+    finally:
+        os.unlink(csv_file)
+        if csv_id:
+            try:
+                requests.delete(f"{API_BASE}/datasets/{csv_id}")
+            except:
+                pass
+
 # ==================== DELETE FUNCTIONALITY TESTS ====================
 
 def test_dataset_deletion():
@@ -1159,6 +1346,57 @@ def test_data_export():
         print(f"❌ Data export setup error: {str(e)}")
         return False, {}
 
+def test_export_round_trip():
+    """Test that exporting an untouched dataset gives back its original cells"""
+    print("\n=== PART 15: Testing Export Round Trip ===")
+    
+    csv_file, csv_content = create_numeric_text_csv()
+    dataset_id = None
+    
+    try:
+        with open(csv_file, 'rb') as f:
+            files = {'file': ('export_round_trip.csv', f, 'text/csv')}
+            response = requests.post(f"{API_BASE}/datasets/upload", files=files, timeout=30)
+        
+        if response.status_code != 200:
+            print(f"❌ Failed to upload CSV for export round trip: {response.text}")
+            return False
+        
+        dataset_id = response.json()['id']
+        lines = csv_content.split("\n")
+        header = lines[0].split(",")
+        expected = [dict(zip(header, line.split(","))) for line in lines[1:]]
+        
+        results = {}
+        
+        response = requests.get(f"{API_BASE}/datasets/{dataset_id}/export?format=json", timeout=10)
+        results['json'] = response.status_code == 200 and json.loads(response.content) == expected
+        
+        response = requests.get(f"{API_BASE}/datasets/{dataset_id}/export?format=ndjson", timeout=10)
+        results['ndjson'] = response.status_code == 200 and [
+            json.loads(line) for line in response.text.splitlines()
+        ] == expected
+        
+        # Filtered exports are rendered from the typed columns rather than sent as the stored file
+        params = {"column": "id", "operator": "ne", "value": "zzz", "format": "csv"}
+        response = requests.get(f"{API_BASE}/datasets/{dataset_id}/export/filtered", params=params, timeout=10)
+        results['filtered_csv'] = response.status_code == 200 and list(csv.DictReader(io.StringIO(response.text))) == expected
+        
+        for name, ok in results.items():
+            print(f"{'✅' if ok else '❌'} {name} export {'keeps' if ok else 'changes'} the uploaded cells")
+        return all(results.values()), results
+        
+    except Exception as e:
+        print(f"❌ Export round trip error: {str(e)}")
+        return False, {}
+    finally:
+        os.unlink(csv_file)
+        if dataset_id:
+            try:
+                requests.delete(f"{API_BASE}/datasets/{dataset_id}")
+            except:
+                pass
+
 # ==================== PART 7: PREPROCESSING CONFIGURATION TESTS ====================
 
 def create_housing_csv():
@@ -1559,6 +1797,12 @@ def main():
     # Part 4: CSV Preview
     results['csv_preview'] = test_csv_preview()
     
+    # Part 4: Numeric Text Round Trip
+    results['numeric_text_round_trip'] = test_numeric_text_round_trip()
+    
+    # Part 4: CSV Preview With A Stray Quote
+    results['csv_preview_stray_quote'] = test_csv_preview_stray_quote()
+    
     # Part 5: Image Preview
     results['image_preview'] = test_image_preview()
     
@@ -1568,6 +1812,9 @@ def main():
     # Part 7: Dataset Statistics
     results['dataset_statistics'], stats_details = test_dataset_statistics()
     
+    # Part 7: Missing Token Statistics
+    results['missing_token_statistics'] = test_missing_token_statistics()
+    
     # Delete functionality test
     results['dataset_deletion'] = test_dataset_deletion()
     
@@ -1592,6 +1839,9 @@ def main():
     # Part 15: Data Export
     results['data_export'], export_details = test_data_export()
     
+    # Part 15: Export Round Trip
+    results['export_round_trip'], round_trip_details = test_export_round_trip()
+    
     # Part 7: Preprocessing Configuration UI
     results['preprocessing_config'] = test_preprocessing_configuration()
     
@@ -1609,9 +1859,12 @@ def main():
         'dataset_storage': 'Part 2: Dataset Storage (MongoDB)',
         'dataset_listing': 'Part 3: Dataset Listing & Filtering',
         'csv_preview': 'Part 4: CSV Preview',
+        'numeric_text_round_trip': 'Part 4: Numeric Text Round Trip',
+        'csv_preview_stray_quote': 'Part 4: CSV Preview With A Stray Quote',
         'image_preview': 'Part 5: Image Preview',
         'json_preview': 'Part 6: JSON Preview',
         'dataset_statistics': 'Part 7: Dataset Statistics',
+        'missing_token_statistics': 'Part 7: Missing Token Statistics',
         'dataset_deletion': 'Dataset Deletion',
         'data_exploration': 'Part 9: Data Exploration (Filter/Search/Unique)',
         'chart_data': 'Part 10: Chart Data (Histogram/Bar/Scatter)',
@@ -1620,6 +1873,7 @@ def main():
         'encoding': 'Part 13: Categorical Encoding',
         'data_split': 'Part 14: Train/Val/Test Split',
         'data_export': 'Part 15: Data Export (CSV/JSON)',
+        'export_round_trip': 'Part 15: Export Round Trip',
         'preprocessing_config': 'Part 7: Preprocessing Configuration UI'
     }
     